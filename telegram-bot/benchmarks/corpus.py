@@ -0,0 +1,120 @@
+"""Realistic driver message corpus shared by the benchmarks.
+
+Mixes English, Uzbek (Latin and Cyrillic) and Russian, emoji, noise that Layer 1
+should dismiss, issues it should catch, and text it can't decide (falls to AI).
+"""
+
+from __future__ import annotations
+
+import random
+
+ISSUES_EN = [
+    "truck broke down on I-40 mile marker 212",
+    "engine overheating, pulled over at exit 87 on I-81",
+    "flat tire on the trailer, need road service",
+    "blowout on the steer tire!!",
+    "ELD not connecting, can't log my hours",
+    "dot inspection at the scale, they want the registration",
+    "brake failure light is on, stopping now",
+    "out of fuel near Amarillo",
+    "got into an accident, nobody hurt",
+    "check engine light came on and truck lost power",
+    "permit for NY expired, need a new one",
+    "coolant leak under the cab",
+    "reefer unit alarm going off",
+    "trailer lights out, DOT will pull me over",
+    "transmission slipping going uphill",
+]
+
+ISSUES_UZ = [
+    "motor ishlamayapti",
+    "balon yorildi, yordam kerak",
+    "yoqilg'i tugadi",
+    "mashina buzildi trassada",
+    "tormoz ishlamayapti",
+    "мотор ишламаяпти",
+    "балон ёрилди",
+]
+
+ISSUES_RU = [
+    "двигатель не заводится",
+    "пробил колесо на трассе",
+    "сломался грузовик, стою на обочине",
+    "не работает ELD, не могу залогиниться",
+    "попал в аварию",
+    "тормоза отказали",
+    "закончилось топливо",
+]
+
+NOISE = [
+    "ok", "thanks", "thank you", "👍", "hello", "good morning", "yes", "lol",
+    "salom", "rahmat", "спасибо", "привет", "доброе утро", "))", "haha", "+1", "...",
+]
+
+UNDECIDED = [
+    "can someone call me back when you get a chance",
+    "where should I park tonight",
+    "what is the address for the next pickup",
+    "I will be late for delivery tomorrow",
+    "my truck is making a weird noise",
+    "qachon yuklaymiz",
+    "куда ехать после разгрузки",
+    "can you send me the rate confirmation",
+    "the receiver says they cannot take me until monday",
+]
+
+# Mass events many drivers in one group report within minutes, each in their own words
+MASS_EVENTS = [
+    ("ELD is down, can't log in", ["again", "anyone else?", "app keeps crashing", "help"]),
+    ("I-80 closed at exit 310 because of snow", ["stuck in line", "how long?", "any detour"]),
+    ("fuel card declined at Pilot", ["again", "need approval", "what do I do"]),
+    ("не работает ELD, не могу залогиниться", ["опять", "у кого еще так?", "помогите"]),
+]
+EMOJI = ["🚚", "🔥", "😡", "🙏", "⚠️", "🛞", "⛽"]
+
+
+def long_paste(rng: random.Random) -> str:
+    """A forwarded load confirmation / long paste (a few KB of text)."""
+    lines = [
+        f"Load #{rng.randint(100000, 999999)} "
+        f"PU: {rng.choice(['Dallas TX', 'Memphis TN', 'Joliet IL'])}"
+        f" DEL: {rng.choice(['Atlanta GA', 'Columbus OH', 'Laredo TX'])} "
+        f"rate ${rng.randint(800, 4000)} weight {rng.randint(10000, 44000)} lbs"
+        for _ in range(rng.randint(20, 60))
+    ]
+    return "\n".join(lines)
+
+
+def sample_text(rng: random.Random) -> str:
+    """One message text, weighted roughly like production traffic."""
+    roll = rng.random()
+    if roll < 0.30:
+        text = rng.choice(NOISE)
+    elif roll < 0.55:
+        text = rng.choice(ISSUES_EN)
+    elif roll < 0.65:
+        text = rng.choice(ISSUES_UZ)
+    elif roll < 0.75:
+        text = rng.choice(ISSUES_RU)
+    elif roll < 0.97:
+        text = rng.choice(UNDECIDED)
+    else:
+        return long_paste(rng)
+    if rng.random() < 0.1:
+        text = f"{text} {rng.choice(EMOJI)}"
+    return text
+
+
+def mass_event_report(event: tuple[str, list[str]], rng: random.Random) -> str:
+    """One driver's wording of a mass event: the report, maybe with a remark added."""
+    text, remarks = event
+    if rng.random() < 0.3:
+        text = text.lower()
+    if rng.random() < 0.6:
+        text = f"{text} {rng.choice(remarks)}"
+    return text
+
+
+def build_corpus(size: int, seed: int = 42) -> list[str]:
+    rng = random.Random(seed)
+    return [sample_text(rng) for _ in range(size)]
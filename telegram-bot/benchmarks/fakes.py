@@ -0,0 +1,379 @@
+"""In-process stand-ins for PostgREST (Supabase), OpenAI and the Telegram Bot API.
+
+Each fake is a small FastAPI app served by uvicorn on a background thread, so the
+real SDK clients (supabase-py, openai, python-telegram-bot) talk to them over
+loopback HTTP exactly as they would in production. PostgREST and OpenAI fakes
+support configurable latency and error injection, and count every call.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import socket
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from io import BytesIO
+from urllib.parse import parse_qsl
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from starlette.requests import ClientDisconnect
+
+# --- Serving ---
+
+
+def serve_in_thread(app: FastAPI) -> tuple[str, uvicorn.Server]:
+    """Start ``app`` on a free loopback port. Returns (base_url, server)."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off")
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}", server
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+# --- PostgREST ---
+
+
+def _split_top_level(expr: str) -> list[str]:
+    parts, depth, quoted, current = [], 0, False, []
+    for ch in expr:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and ch == ",":
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(ch)
+    parts.append("".join(current))
+    return parts
+
+
+def _as_text(value: object) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _compare(value: object, arg: str) -> int:
+    if value is None:
+        return -1
+    try:
+        left, right = float(value), float(arg)  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        left, right = _as_text(value), arg  # type: ignore[assignment]
+    return (left > right) - (left < right)
+
+
+def _match(value: object, op: str, arg: str) -> bool:
+    arg = arg.strip('"')
+    if op == "eq":
+        return _as_text(value) == arg
+    if op == "neq":
+        return _as_text(value) != arg
+    if op == "is":
+        return _as_text(value) == arg
+    if op == "in":
+        items = [a.strip('"') for a in _split_top_level(arg.strip("()"))]
+        return _as_text(value) in items
+    if op in ("gt", "gte", "lt", "lte"):
+        if value is None:
+            return False
+        c = _compare(value, arg)
+        return {"gt": c > 0, "gte": c >= 0, "lt": c < 0, "lte": c <= 0}[op]
+    raise ValueError(f"unsupported operator {op}")
+
+
+def _eval_logic(row: dict, expr: str, combine: str) -> bool:
+    results = []
+    for term in _split_top_level(expr):
+        if term.startswith(("and(", "or(")):
+            name, _, inner = term.partition("(")
+            results.append(_eval_logic(row, inner[:-1], name))
+        else:
+            column, op, arg = term.split(".", 2)
+            results.append(_match(row.get(column), op, arg))
+    return all(results) if combine == "and" else any(results)
+
+
+_RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+
+class FakePostgREST:
+    """Enough of PostgREST for SupabaseStorage: filters, order, limit, count, upsert."""
+
+    def __init__(self, latency_ms: float = 0.0, error_rate: float = 0.0, seed: int = 1) -> None:
+        self.tables: dict[str, list[dict]] = defaultdict(list)
+        self.latency = latency_ms / 1000
+        self.error_rate = error_rate
+        self.calls: Counter[str] = Counter()
+        self._rng = random.Random(seed)
+        self._display_seq = 0
+        self.app = FastAPI()
+        self.app.add_api_route(
+            "/rest/v1/{table}", self._handle, methods=["GET", "HEAD", "POST", "PATCH", "DELETE"]
+        )
+
+    def seed_connections(self, groups: list[int], business_connections: list[str]) -> None:
+        for chat_id in groups:
+            self._insert("telegram_connections", {
+                "connection_type": "group", "chat_id": chat_id,
+                "display_name": f"Group {chat_id}", "is_active": True,
+            })
+        for bcid in business_connections:
+            self._insert("telegram_connections", {
+                "connection_type": "business_account", "business_connection_id": bcid,
+                "display_name": f"DM: {bcid}", "is_active": True,
+            })
+
+    def _insert(self, table: str, row: dict) -> dict:
+        now = _now()
+        row = {"id": str(uuid.uuid4()), "created_at": now, **row}
+        if table == "tickets":
+            self._display_seq += 1
+            row.setdefault("display_id", f"TKT-{self._display_seq:04d}")
+            row.setdefault("updated_at", now)
+        self.tables[table].append(row)
+        return row
+
+    def _filter(self, table: str, request: Request) -> list[dict]:
+        rows = self.tables[table]
+        for key, value in request.query_params.multi_items():
+            if key in _RESERVED_PARAMS:
+                continue
+            if key in ("or", "and"):
+                rows = [r for r in rows if _eval_logic(r, value[1:-1], key)]
+                continue
+            op, _, arg = value.partition(".")
+            rows = [r for r in rows if _match(r.get(key), op, arg)]
+        return rows
+
+    @staticmethod
+    def _order_and_page(rows: list[dict], request: Request) -> list[dict]:
+        order = request.query_params.get("order")
+        if order:
+            for spec in reversed(order.split(",")):
+                column, _, direction = spec.partition(".")
+                rows = sorted(
+                    rows,
+                    key=lambda r: (r.get(column) is None, _as_text(r.get(column))),
+                    reverse=direction.startswith("desc"),
+                )
+        offset = int(request.query_params.get("offset", 0))
+        limit = request.query_params.get("limit")
+        return rows[offset : offset + int(limit)] if limit else rows[offset:]
+
+    @staticmethod
+    def _project(rows: list[dict], request: Request) -> list[dict]:
+        select = request.query_params.get("select", "*")
+        if select.strip() == "*":
+            return [dict(r) for r in rows]
+        columns = [c.strip() for c in select.split(",")]
+        return [{c: r.get(c) for c in columns} for r in rows]
+
+    async def _handle(self, table: str, request: Request) -> Response:
+        self.calls[f"{request.method} {table}"] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and self._rng.random() < self.error_rate:
+            return Response(
+                json.dumps({"message": "injected failure", "code": "XX000"}),
+                status_code=503,
+                media_type="application/json",
+            )
+
+        prefer = request.headers.get("prefer", "")
+        headers: dict[str, str] = {}
+
+        if request.method in ("GET", "HEAD"):
+            matched = self._filter(table, request)
+            page = self._order_and_page(matched, request)
+            if "count=" in prefer:
+                headers["content-range"] = f"0-{max(len(page) - 1, 0)}/{len(matched)}"
+            body = self._project(page, request)
+        elif request.method == "POST":
+            payload = await request.json()
+            rows = payload if isinstance(payload, list) else [payload]
+            body = []
+            conflict = request.query_params.get("on_conflict")
+            for row in rows:
+                existing = None
+                if "merge-duplicates" in prefer:
+                    key = conflict or "id"
+                    existing = next(
+                        (r for r in self.tables[table] if key in row and r.get(key) == row[key]),
+                        None,
+                    )
+                if existing is not None:
+                    existing.update(row)
+                    body.append(dict(existing))
+                else:
+                    body.append(dict(self._insert(table, row)))
+        elif request.method == "PATCH":
+            payload = await request.json()
+            body = []
+            for row in self._filter(table, request):
+                row.update(payload)
+                body.append(dict(row))
+        else:  # DELETE
+            doomed = self._filter(table, request)
+            self.tables[table] = [r for r in self.tables[table] if r not in doomed]
+            body = doomed
+
+        if "return=minimal" in prefer:
+            return Response(status_code=204, headers=headers)
+        status = 201 if request.method == "POST" else 200
+        return Response(json.dumps(body), status_code=status, headers=headers,
+                         media_type="application/json")
+
+
+# --- OpenAI ---
+
+
+class FakeOpenAI:
+    """Chat completions stand-in that answers each FleetRelay prompt with valid JSON."""
+
+    def __init__(self, latency_ms: float = 0.0, error_rate: float = 0.0, seed: int = 2) -> None:
+        self.latency = latency_ms / 1000
+        self.error_rate = error_rate
+        self.calls: Counter[str] = Counter()
+        self._rng = random.Random(seed)
+        self.app = FastAPI()
+        self.app.add_api_route("/v1/chat/completions", self._completions, methods=["POST"])
+        self.app.add_api_route("/v1/models/{model}", self._model, methods=["GET"])
+
+    def _content(self, kind: str) -> dict:
+        rng = self._rng
+        if kind == "classify":
+            return {"is_ticket": rng.random() < 0.7, "confidence": rng.randint(1, 5),
+                    "category": rng.choice(["mechanical", "eld", "documentation", "other"]),
+                    "urgency": rng.randint(1, 5)}
+        if kind == "image":
+            return {"category": rng.choice(["mechanical", "accident", "document", "road"]),
+                    "description": "synthetic image description"}
+        return {"urgency": rng.randint(1, 5), "category": "mechanical",
+                "location": "", "summary": "synthetic summary"}
+
+    async def _model(self, model: str) -> dict:
+        return {"id": model, "object": "model", "created": 0, "owned_by": "system"}
+
+    async def _completions(self, request: Request) -> Response:
+        try:
+            payload = await request.json()
+        except ClientDisconnect:  # a speculative call cancelled before its body arrived
+            return Response(status_code=499)
+        system = payload["messages"][0]["content"]
+        if "classifier" in system:
+            kind = "classify"
+        elif "image" in system:
+            kind = "image"
+        else:
+            kind = "enrich"
+        self.calls[kind] += 1
+
+        if self.latency:
+            await asyncio.sleep(self.latency * self._rng.uniform(0.5, 1.5))
+        if self.error_rate and self._rng.random() < self.error_rate:
+            return Response(
+                json.dumps({"error": {"message": "injected failure", "type": "server_error"}}),
+                status_code=500,
+                media_type="application/json",
+            )
+
+        return Response(json.dumps({
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "gpt-4o-mini"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps(self._content(kind))},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 50, "completion_tokens": 20, "total_tokens": 70},
+        }), media_type="application/json")
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+
+# --- Telegram Bot API ---
+
+
+def _tiny_jpeg(seed: str) -> bytes:
+    try:
+        from PIL import Image
+    except ImportError:
+        return b"\xff\xd8\xff\xe0" + seed.encode() * 64 + b"\xff\xd9"
+    rng = random.Random(seed)
+    img = Image.new("RGB", (64, 48), tuple(rng.randrange(256) for _ in range(3)))
+    buf = BytesIO()
+    img.save(buf, "JPEG")
+    return buf.getvalue()
+
+
+class FakeTelegram:
+    """getMe/getFile/setWebhook/sendMessage plus file downloads."""
+
+    def __init__(self) -> None:
+        self.calls: Counter[str] = Counter()
+        self._message_id = 900000
+        self.app = FastAPI()
+        self.app.add_api_route("/bot{token}/{method}", self._method, methods=["GET", "POST"])
+        self.app.add_api_route("/file/bot{token}/{path:path}", self._file, methods=["GET"])
+
+    @staticmethod
+    async def _params(request: Request) -> dict:
+        params = dict(request.query_params)
+        body = await request.body()
+        if not body:
+            return params
+        if request.headers.get("content-type", "").startswith("application/json"):
+            params.update(json.loads(body))
+        else:
+            params.update(parse_qsl(body.decode()))
+        return params
+
+    async def _method(self, token: str, method: str, request: Request) -> Response:
+        self.calls[method] += 1
+        form = await self._params(request)
+        if method == "getMe":
+            result: object = {
+                "id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"
+            }
+        elif method == "getFile":
+            file_id = str(form.get("file_id", "unknown"))
+            result = {"file_id": file_id, "file_unique_id": f"u-{file_id}",
+                      "file_size": 2048, "file_path": f"photos/{file_id}.jpg"}
+        elif method == "sendMessage":
+            self._message_id += 1
+            result = {"message_id": self._message_id, "date": int(time.time()),
+                      "chat": {"id": int(form.get("chat_id", 0)), "type": "private"},
+                      "text": form.get("text", "")}
+        else:
+            result = True
+        return Response(json.dumps({"ok": True, "result": result}), media_type="application/json")
+
+    async def _file(self, token: str, path: str) -> Response:
+        self.calls["file_download"] += 1
+        return Response(_tiny_jpeg(path), media_type="image/jpeg")
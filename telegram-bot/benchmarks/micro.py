@@ -0,0 +1,237 @@
+"""Microbenchmarks for the Layer-1 hot paths that run on every update.
+
+Times classify_deterministic, _should_dismiss, _match_keywords, _is_gratitude,
+_extract_message, extract_text_location and the Russian/Uzbek normalization
+(fold, detect_language) over a large fixed-seed corpus from corpus.py (English,
+Uzbek, Russian, emoji, long pastes), reported as ns per call. Comparisons use
+each case's cost relative to a fixed reference loop timed interleaved with it,
+so a uniformly slower or throttled machine doesn't read as a regression::
+
+    python -m benchmarks.micro                      # print timings
+    python -m benchmarks.micro --save               # record baselines/micro.json
+    python -m benchmarks.micro --compare            # exit 1 on regressions > 20%
+    python -m benchmarks.micro --compare --threshold 0.25 -k dismiss
+
+Baselines are machine-specific; re-save them when moving to different hardware.
+Run from the telegram-bot directory.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from benchmarks.corpus import build_corpus
+from benchmarks.traffic import TrafficProfile, generate_updates
+
+# Layer 1 needs no credentials, but importing src.* builds Settings.
+os.environ.setdefault("BOT_TOKEN", "123456:BENCHMARK")
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+BASELINE_PATH = Path(__file__).parent / "baselines" / "micro.json"
+
+
+def _build_cases(corpus_size: int, seed: int) -> dict[str, tuple[Callable, list]]:
+    """name -> (function, inputs). Each input is passed as the single argument."""
+    from telegram import Update
+
+    from src.bot import _extract_message, _is_gratitude
+    from src.classifier import (
+        _match_keywords,
+        _should_dismiss,
+        classify_deterministic,
+    )
+    from src.location import extract_text_location
+    from src.models import Message, MessageSource
+    from src.normalize import detect_language, fold
+
+    texts = build_corpus(corpus_size, seed=seed)
+    # Plain-text messages, so classify_deterministic exercises the text rules
+    # rather than returning early on attachments.
+    messages = [
+        Message(
+            telegram_message_id=i,
+            telegram_chat_id=-1001,
+            telegram_user_id=500000,
+            driver_id="",
+            text=text,
+            source=MessageSource.GROUP,
+        )
+        for i, text in enumerate(texts)
+    ]
+    updates = [
+        Update.de_json(u, None)
+        for u in generate_updates(TrafficProfile(updates=corpus_size, seed=seed))
+    ]
+
+    return {
+        "classify_deterministic": (classify_deterministic, messages),
+        "should_dismiss": (_should_dismiss, texts),
+        "match_keywords": (_match_keywords, texts),
+        "is_gratitude": (_is_gratitude, texts),
+        "extract_message": (_extract_message, updates),
+        "extract_text_location": (extract_text_location, texts),
+        "fold": (fold, texts),
+        "detect_language": (detect_language, texts),
+    }
+
+
+_REFERENCE_WORDS = "truck broke down on the highway near the exit".split() * 4
+
+
+def _reference(_: object) -> int:
+    """Fixed pure-Python work used to factor machine speed out of comparisons."""
+    return sum(len(w.lower()) for w in _REFERENCE_WORDS if "e" in w)
+
+
+def _single_pass(func: Callable, batch: list) -> int:
+    start = time.perf_counter_ns()
+    for item in batch:
+        func(item)
+    return time.perf_counter_ns() - start
+
+
+def _time_case(func: Callable, inputs: list, repeat: int, chunk: int = 500) -> tuple[float, float]:
+    """(ns per call, cost relative to the reference loop).
+
+    Each chunk of inputs keeps its fastest of ``repeat`` passes, so one burst of
+    interference from another process stays out of the result. The reference
+    loop runs interleaved with every pass and goes through the same min-filter;
+    the ratio of the two is what --compare checks, since it holds steady when
+    the whole machine slows down.
+    """
+    reference_batch = [None] * 50
+    total = reference_total = 0
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for offset in range(0, len(inputs), chunk):
+            batch = inputs[offset : offset + chunk]
+            best = best_reference = None
+            for _ in range(repeat):
+                elapsed = _single_pass(func, batch)
+                reference = _single_pass(_reference, reference_batch)
+                best = elapsed if best is None else min(best, elapsed)
+                if best_reference is None or reference < best_reference:
+                    best_reference = reference
+            total += best
+            reference_total += best_reference * len(batch) / len(reference_batch)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return total / len(inputs), total / reference_total
+
+
+def run(corpus_size: int, seed: int, repeat: int, select: str = "") -> dict[str, dict[str, float]]:
+    """name -> {"ns_per_call", "relative"} for every selected case."""
+    cases = _build_cases(corpus_size, seed)
+    results: dict[str, dict[str, float]] = {}
+    for name, (func, inputs) in cases.items():
+        if select and select not in name:
+            continue
+        func(inputs[0])  # warm up regex caches and lazy imports
+        ns, relative = _time_case(func, inputs, repeat)
+        results[name] = {"ns_per_call": round(ns, 1), "relative": round(relative, 4)}
+    return results
+
+
+def _environment() -> dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+    }
+
+
+def save_baseline(results: dict[str, dict[str, float]], path: Path, meta: dict) -> None:
+    cases = {}
+    if path.exists():
+        # Keep baselines for cases not selected in this run.
+        cases = json.loads(path.read_text()).get("cases", {})
+    cases.update(results)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"meta": meta, "cases": cases}, indent=2, sort_keys=True) + "\n")
+
+
+def compare(
+    results: dict[str, dict[str, float]], path: Path, threshold: float, meta: dict
+) -> list[str]:
+    """Print current vs baseline and return the names of regressed cases."""
+    baseline = json.loads(path.read_text())
+    if baseline["meta"].get("environment") != meta["environment"]:
+        print("warning: baseline was recorded on a different environment:", file=sys.stderr)
+        print(f"  baseline: {baseline['meta'].get('environment')}", file=sys.stderr)
+        print(f"  current:  {meta['environment']}", file=sys.stderr)
+    if baseline["meta"].get("corpus_size") != meta["corpus_size"]:
+        print("warning: baseline used a different corpus size", file=sys.stderr)
+
+    regressions: list[str] = []
+    print(f"{'case':<26} {'baseline ns':>12} {'current ns':>12} {'relative':>10}")
+    for name, current in results.items():
+        base = baseline["cases"].get(name)
+        if base is None:
+            print(f"{name:<26} {'-':>12} {current['ns_per_call']:>12.1f} {'new':>10}")
+            continue
+        change = current["relative"] / base["relative"] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(
+            f"{name:<26} {base['ns_per_call']:>12.1f} {current['ns_per_call']:>12.1f} "
+            f"{change:>+9.1%}{flag}"
+        )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="FleetRelay Layer-1 microbenchmarks")
+    parser.add_argument("--corpus-size", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("-k", dest="select", default="", help="only cases containing this")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--save", action="store_true", help="write results as the baseline")
+    mode.add_argument("--compare", action="store_true", help="compare against the baseline")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.20,
+        help="allowed slowdown before failing (0.20 = 20%%)",
+    )
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    results = run(args.corpus_size, args.seed, args.repeat, args.select)
+    meta = {"environment": _environment(), "corpus_size": args.corpus_size, "seed": args.seed}
+
+    if args.compare:
+        if not args.baseline.exists():
+            raise SystemExit(f"No baseline at {args.baseline}; run with --save first")
+        regressions = compare(results, args.baseline, args.threshold, meta)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) slower than baseline by more than "
+                  f"{args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        return
+
+    print(f"{'case':<26} {'ns/call':>12} {'calls/s':>14}")
+    for name, r in results.items():
+        print(f"{name:<26} {r['ns_per_call']:>12.1f} {1e9 / r['ns_per_call']:>14,.0f}")
+    if args.save:
+        save_baseline(results, args.baseline, meta)
+        print(f"\nBaseline written to {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""End-to-end replay benchmark for the webhook pipeline.
+
+Generates synthetic driver traffic, posts each Telegram update through the real
+FastAPI ``/webhook`` route, and points supabase-py, openai and python-telegram-bot
+at in-process fakes (see fakes.py). Reports throughput, per-stage latency
+percentiles and OpenAI calls per 1,000 messages::
+
+    python -m benchmarks.replay --updates 2000 --concurrency 32 \\
+        --openai-latency-ms 400 --openai-error-rate 0.02 --db-latency-ms 3
+
+Run from the telegram-bot directory.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import functools
+import inspect
+import json
+import os
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+
+import httpx
+
+from benchmarks.fakes import FakeOpenAI, FakePostgREST, FakeTelegram, serve_in_thread
+from benchmarks.traffic import TrafficProfile, generate_updates
+
+BOT_TOKEN = "123456:BENCHMARK"
+
+
+class StageRecorder:
+    def __init__(self) -> None:
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    def wrap(self, owner: object, name: str, stage: str) -> None:
+        """Replace ``owner.name`` with a timing wrapper recorded under ``stage``."""
+        original = getattr(owner, name)
+
+        if inspect.iscoroutinefunction(original):
+            @functools.wraps(original)
+            async def timed_async(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await original(*args, **kwargs)
+                except Exception:
+                    self.errors[stage] += 1
+                    raise
+                finally:
+                    self.samples[stage].append(time.perf_counter() - start)
+
+            setattr(owner, name, timed_async)
+        else:
+            @functools.wraps(original)
+            def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    self.samples[stage].append(time.perf_counter() - start)
+
+            setattr(owner, name, timed)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        out = {}
+        for stage, values in sorted(self.samples.items()):
+            ordered = sorted(values)
+            if len(ordered) > 1:
+                q = statistics.quantiles(ordered, n=100, method="inclusive")
+            else:
+                q = ordered * 99
+            out[stage] = {
+                "count": len(ordered),
+                "p50_ms": q[49] * 1000,
+                "p95_ms": q[94] * 1000,
+                "p99_ms": q[98] * 1000,
+                "errors": self.errors.get(stage, 0),
+            }
+        return out
+
+
+def _configure_env(supabase_url: str, openai_url: str, telegram_url: str, tmpdir: str) -> None:
+    os.environ.update(
+        {
+            "BOT_TOKEN": BOT_TOKEN,
+            "OPENAI_API_KEY": "sk-benchmark",
+            "OPENAI_BASE_URL": f"{openai_url}/v1",
+            "SUPABASE_URL": supabase_url,
+            "SUPABASE_SERVICE_KEY": "bench.service.key",
+            "TELEGRAM_BASE_URL": telegram_url,
+            "WEBHOOK_URL": "",
+            "WEBHOOK_SECRET": "",
+            "LOG_LEVEL": "WARNING",
+            "IMAGE_CACHE_PATH": os.path.join(tmpdir, "image_cache.sqlite3"),
+            "SNAPSHOT_PATH": os.path.join(tmpdir, "state_snapshot.json"),
+            "MEDIA_GROUP_WINDOW_SECONDS": "0.2",
+            "BURST_QUIET_SECONDS": "0.2",
+            "BURST_MAX_QUIET_SECONDS": "0.5",
+            "OVERLOAD_RECOVER_SECONDS": "2",
+        }
+    )
+
+
+def _instrument(recorder: StageRecorder) -> None:
+    import src.bot as bot
+    import src.classifier as classifier
+    import src.image_cache as image_cache
+    from src.storage import storage
+
+    for name, member in inspect.getmembers(type(storage), inspect.iscoroutinefunction):
+        if not name.startswith("_"):
+            recorder.wrap(storage, name, f"storage.{name}")
+    recorder.wrap(classifier, "classify_deterministic", "classify.layer1")
+    recorder.wrap(classifier, "classify_ai", "openai.classify")
+    recorder.wrap(bot, "classify_message", "classify.total")
+    recorder.wrap(bot, "classify_online", "classify.layer2")
+    recorder.wrap(bot, "enrich_ticket", "openai.enrich")
+    recorder.wrap(image_cache, "classify_image", "openai.vision")
+
+
+async def _drain_background_tasks(timeout: float) -> list[str]:
+    """Wait for enrichment/media/album/burst tasks. Returns names of tasks still pending."""
+    import src.main as main
+
+    deadline = time.monotonic() + timeout
+    current = asyncio.current_task()
+    pending: list[asyncio.Task] = []
+    while time.monotonic() < deadline:
+        # Loops started by main.startup() never "drain"
+        pending = [
+            t
+            for t in asyncio.all_tasks()
+            if t is not current and not t.done() and t not in main._background
+        ]
+        if not pending:
+            return []
+        await asyncio.sleep(0.05)
+    return sorted(t.get_coro().__qualname__ for t in pending)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    postgrest = FakePostgREST(latency_ms=args.db_latency_ms, error_rate=args.db_error_rate)
+    openai_fake = FakeOpenAI(latency_ms=args.openai_latency_ms, error_rate=args.openai_error_rate)
+    telegram = FakeTelegram()
+
+    profile = TrafficProfile(updates=args.updates, drivers=args.drivers, seed=args.seed)
+    postgrest.seed_connections(profile.groups, profile.business_connections)
+
+    servers = []
+    supabase_url, server = serve_in_thread(postgrest.app)
+    servers.append(server)
+    openai_url, server = serve_in_thread(openai_fake.app)
+    servers.append(server)
+    telegram_url, server = serve_in_thread(telegram.app)
+    servers.append(server)
+
+    tmpdir = tempfile.mkdtemp(prefix="fleetrelay-bench-")
+    _configure_env(supabase_url, openai_url, telegram_url, tmpdir)
+    if args.storage == "sqlite":
+        os.environ["STORAGE_BACKEND"] = "sqlite"
+        os.environ["SQLITE_PATH"] = os.path.join(tmpdir, "fleetrelay.sqlite3")
+        os.environ["SQLITE_MEDIA_DIR"] = os.path.join(tmpdir, "media")
+
+    from src import main
+
+    recorder = StageRecorder()
+    _instrument(recorder)
+    if args.storage == "sqlite":
+        from src.storage import storage
+
+        for chat_id in profile.groups:
+            storage.add_connection(f"Group {chat_id}", chat_id=chat_id)
+        for bcid in profile.business_connections:
+            storage.add_connection(f"DM: {bcid}", business_connection_id=bcid)
+    updates = generate_updates(profile)
+
+    await main.startup()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    transport = httpx.ASGITransport(app=main.app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def send(update: dict) -> None:
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post("/webhook", json=update)
+                recorder.samples["webhook"].append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    recorder.errors["webhook"] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(send(u) for u in updates))
+        ingest_seconds = time.perf_counter() - started
+        undrained = await _drain_background_tasks(args.drain_timeout)
+        total_seconds = time.perf_counter() - started
+
+    await main.shutdown()
+    from src.metrics import (
+        AI_BUDGET_THROTTLED_TOTAL,
+        ENRICHMENT_REUSED_TOTAL,
+        INCIDENT_REPORTS_TOTAL,
+        SHED_TOTAL,
+    )
+
+    shed = {
+        action: int(SHED_TOTAL.value(action))
+        for action in ("enrichment_deferred", "audit_batched", "ai_skipped")
+    }
+    throttled = {
+        scope: int(AI_BUDGET_THROTTLED_TOTAL.value(scope)) for scope in ("driver", "chat")
+    }
+    incident_reports = {
+        outcome: int(INCIDENT_REPORTS_TOTAL.value(outcome))
+        for outcome in ("new", "clustered", "skipped")
+    }
+    for server in servers:
+        server.should_exit = True
+
+    if args.storage == "sqlite":
+        from src.storage import storage
+
+        counts = {
+            table: storage._one(f"SELECT COUNT(*) AS n FROM {table}")["n"]
+            for table in ("tickets", "ticket_messages", "raw_messages")
+        }
+    else:
+        counts = {table: len(postgrest.tables[table])
+                  for table in ("tickets", "ticket_messages", "raw_messages")}
+
+    return {
+        "updates": len(updates),
+        "storage": args.storage,
+        "concurrency": args.concurrency,
+        "ingest_seconds": ingest_seconds,
+        "total_seconds": total_seconds,
+        "updates_per_sec": len(updates) / ingest_seconds,
+        "openai_calls": dict(openai_fake.calls),
+        "openai_calls_per_1k": openai_fake.total_calls / len(updates) * 1000,
+        "db_requests": sum(postgrest.calls.values()),
+        "db_requests_per_update": sum(postgrest.calls.values()) / len(updates),
+        "tickets_created": counts["tickets"],
+        "ticket_messages": counts["ticket_messages"],
+        "raw_messages": counts["raw_messages"],
+        "shed": shed,
+        "ai_budget_throttled": throttled,
+        "incident_reports": incident_reports,
+        "enrichment_reused": int(ENRICHMENT_REUSED_TOTAL.value()),
+        "undrained_tasks": undrained,
+        "stages": recorder.summary(),
+    }
+
+
+def _print_report(report: dict) -> None:
+    print(f"updates:              {report['updates']} (concurrency {report['concurrency']}, "
+          f"{report['storage']} storage)")
+    print(f"ingest time:          {report['ingest_seconds']:.2f}s "
+          f"(+ background drain: {report['total_seconds']:.2f}s total)")
+    print(f"throughput:           {report['updates_per_sec']:.1f} updates/s")
+    print(f"OpenAI calls / 1k:    {report['openai_calls_per_1k']:.1f}  {report['openai_calls']}")
+    print(f"DB requests / update: {report['db_requests_per_update']:.2f}")
+    print(f"tickets / ticket_messages / raw_messages: {report['tickets_created']} / "
+          f"{report['ticket_messages']} / {report['raw_messages']}")
+    if any(report["shed"].values()):
+        print(f"load shed:            {report['shed']}")
+    reports = report["incident_reports"]
+    if reports["new"] + reports["clustered"]:
+        rate = reports["clustered"] / (reports["new"] + reports["clustered"])
+        print(f"incident duplicates:  {rate:.1%} of {reports['new'] + reports['clustered']} "
+              f"tickets, {report['enrichment_reused']} enrichment calls reused")
+    if any(report["ai_budget_throttled"].values()):
+        print(f"AI budget throttled:  {report['ai_budget_throttled']}")
+    if report["undrained_tasks"]:
+        print(f"still pending after drain timeout: {report['undrained_tasks']}")
+    print()
+    print(f"{'stage':<48} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'err':>5}")
+    for stage, s in report["stages"].items():
+        print(f"{stage:<48} {s['count']:>7} {s['p50_ms']:>9.2f} {s['p95_ms']:>9.2f} "
+              f"{s['p99_ms']:>9.2f} {s['errors']:>5}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="FleetRelay end-to-end replay benchmark")
+    parser.add_argument("--updates", type=int, default=1000)
+    parser.add_argument("--drivers", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--storage", choices=("supabase", "sqlite"), default="supabase")
+    parser.add_argument("--db-latency-ms", type=float, default=2.0)
+    parser.add_argument("--db-error-rate", type=float, default=0.0)
+    parser.add_argument("--openai-latency-ms", type=float, default=300.0)
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    parser.add_argument("--drain-timeout", type=float, default=60.0)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    _print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
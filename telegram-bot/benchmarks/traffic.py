@@ -0,0 +1,195 @@
+"""Synthetic driver traffic as raw Telegram Bot API update payloads.
+
+Produces the JSON the webhook receives: business DMs, group messages, replies to
+earlier group messages, photo albums (shared media_group_id), location shares,
+rapid-fire bursts from one driver, mass events (many drivers in one group
+reporting the same outage), and multilingual text from corpus.py.
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from dataclasses import dataclass, field
+
+from benchmarks.corpus import MASS_EVENTS, mass_event_report, sample_text
+
+
+@dataclass
+class TrafficProfile:
+    updates: int = 1000
+    drivers: int = 200
+    groups: list[int] = field(default_factory=lambda: [-1001, -1002, -1003])
+    business_connections: list[str] = field(
+        default_factory=lambda: ["bc-dispatch-1", "bc-dispatch-2"]
+    )
+    dm_share: float = 0.4
+    reply_share: float = 0.1
+    album_share: float = 0.04
+    photo_share: float = 0.06
+    location_share: float = 0.02
+    burst_share: float = 0.1
+    mass_event_share: float = 0.01  # each starts 5-10 drivers reporting one event
+    resend_photo_share: float = 0.3  # fraction of photos that re-send an earlier file
+    seed: int = 7
+
+
+class TrafficGenerator:
+    def __init__(self, profile: TrafficProfile) -> None:
+        self.profile = profile
+        self.rng = random.Random(profile.seed)
+        self._update_id = 0
+        self._message_id = 1000
+        self._sent_photos: list[list[dict]] = []
+        self._group_history: dict[int, list[int]] = {g: [] for g in profile.groups}
+        self._now = int(time.time())
+
+    # --- Payload pieces ---
+
+    def _next_message_id(self) -> int:
+        self._message_id += 1
+        return self._message_id
+
+    def _user(self, driver: int) -> dict:
+        return {
+            "id": 500000 + driver,
+            "is_bot": False,
+            "first_name": f"Driver{driver}",
+            "username": f"driver{driver}",
+        }
+
+    def _photo(self) -> list[dict]:
+        if self._sent_photos and self.rng.random() < self.profile.resend_photo_share:
+            return self.rng.choice(self._sent_photos)
+        n = len(self._sent_photos)
+        sizes = [
+            {"file_id": f"photo{n}-{w}", "file_unique_id": f"uq{n}-{w}", "width": w,
+             "height": w * 3 // 4, "file_size": w * 60}
+            for w in (90, 320, 800, 1280)
+        ]
+        self._sent_photos.append(sizes)
+        return sizes
+
+    def _base_message(self, driver: int, dm: bool) -> tuple[dict, str]:
+        profile = self.profile
+        msg: dict = {
+            "message_id": self._next_message_id(),
+            "date": self._now,
+            "from": self._user(driver),
+        }
+        if dm:
+            msg["chat"] = {
+                "id": 500000 + driver, "type": "private", "first_name": f"Driver{driver}"
+            }
+            msg["business_connection_id"] = self.rng.choice(profile.business_connections)
+            return msg, "business_message"
+        group = self.rng.choice(profile.groups)
+        msg["chat"] = {"id": group, "type": "supergroup", "title": f"Support {group}"}
+        return msg, "message"
+
+    def _wrap(self, key: str, msg: dict) -> dict:
+        self._update_id += 1
+        if msg["chat"]["type"] == "supergroup":
+            self._group_history[msg["chat"]["id"]].append(msg["message_id"])
+        return {"update_id": self._update_id, key: msg}
+
+    # --- Update kinds ---
+
+    def text_update(self, driver: int, dm: bool) -> dict:
+        msg, key = self._base_message(driver, dm)
+        msg["text"] = sample_text(self.rng)
+        return self._wrap(key, msg)
+
+    def reply_update(self, driver: int) -> dict:
+        msg, key = self._base_message(driver, dm=False)
+        history = self._group_history[msg["chat"]["id"]]
+        msg["text"] = sample_text(self.rng)
+        if history:
+            target = self.rng.choice(history[-50:])
+            msg["reply_to_message"] = {
+                "message_id": target,
+                "date": self._now,
+                "chat": msg["chat"],
+            }
+        return self._wrap(key, msg)
+
+    def photo_update(self, driver: int, dm: bool) -> dict:
+        msg, key = self._base_message(driver, dm)
+        msg["photo"] = self._photo()
+        if self.rng.random() < 0.5:
+            msg["caption"] = sample_text(self.rng)
+        return self._wrap(key, msg)
+
+    def location_update(self, driver: int, dm: bool) -> dict:
+        msg, key = self._base_message(driver, dm)
+        msg["location"] = {
+            "latitude": 35.2 + self.rng.uniform(-2, 2),
+            "longitude": -101.8 + self.rng.uniform(-5, 5),
+        }
+        return self._wrap(key, msg)
+
+    def album_updates(self, driver: int, dm: bool) -> list[dict]:
+        size = self.rng.randint(2, 6)
+        group_id = f"album{self._update_id}"
+        first, key = self._base_message(driver, dm)
+        updates = []
+        for i in range(size):
+            msg = dict(first, message_id=self._next_message_id() if i else first["message_id"])
+            msg["media_group_id"] = group_id
+            msg["photo"] = self._photo()
+            if i == 0:
+                msg["caption"] = sample_text(self.rng)
+            updates.append(self._wrap(key, msg))
+        return updates
+
+    def burst_updates(self, driver: int, dm: bool) -> list[dict]:
+        first, key = self._base_message(driver, dm)
+        updates = []
+        for i in range(self.rng.randint(3, 5)):
+            msg = dict(first, message_id=self._next_message_id() if i else first["message_id"])
+            msg["text"] = sample_text(self.rng)
+            updates.append(self._wrap(key, msg))
+        return updates
+
+    def mass_event_updates(self) -> list[dict]:
+        event = self.rng.choice(MASS_EVENTS)
+        group = self.rng.choice(self.profile.groups)
+        drivers = self.rng.sample(range(self.profile.drivers), self.rng.randint(5, 10))
+        updates = []
+        for driver in drivers:
+            msg, key = self._base_message(driver, dm=False)
+            msg["chat"] = {"id": group, "type": "supergroup", "title": f"Support {group}"}
+            msg["text"] = mass_event_report(event, self.rng)
+            updates.append(self._wrap(key, msg))
+        return updates
+
+    def generate(self) -> list[dict]:
+        profile = self.profile
+        updates: list[dict] = []
+        while len(updates) < profile.updates:
+            driver = self.rng.randrange(profile.drivers)
+            dm = self.rng.random() < profile.dm_share
+            if self.rng.random() < profile.mass_event_share:
+                updates.extend(self.mass_event_updates())
+                continue
+            roll = self.rng.random()
+            if roll < profile.album_share:
+                updates.extend(self.album_updates(driver, dm))
+            elif roll < profile.album_share + profile.burst_share:
+                updates.extend(self.burst_updates(driver, dm))
+            elif roll < profile.album_share + profile.burst_share + profile.photo_share:
+                updates.append(self.photo_update(driver, dm))
+            elif roll < (
+                profile.album_share + profile.burst_share + profile.photo_share
+                + profile.location_share
+            ):
+                updates.append(self.location_update(driver, dm))
+            elif not dm and self.rng.random() < profile.reply_share:
+                updates.append(self.reply_update(driver))
+            else:
+                updates.append(self.text_update(driver, dm))
+        return updates[: profile.updates]
+
+
+def generate_updates(profile: TrafficProfile | None = None) -> list[dict]:
+    return TrafficGenerator(profile or TrafficProfile()).generate()
@@ -0,0 +1,4 @@
+import time
+
+# When the first src module was imported; main.startup() reports import time from it.
+IMPORT_STARTED = time.perf_counter()
@@ -14,33 +14,237 @@ V2 notes:
 from __future__ import annotations
 
 import asyncio
+import heapq
+import itertools
 import logging
 import re
+from collections import defaultdict
+from collections.abc import Callable, Coroutine
 from datetime import datetime, timedelta, timezone
 
-from telegram import Update
+from telegram import Update, User
 from telegram.ext import (
     Application,
     ContextTypes,
     MessageHandler,
     filters,
 )
-
-from src.classifier import classify_message, enrich_ticket
+from telegram.request import HTTPXRequest
+
+from src.budget import ai_budget
+from src.classifier import (
+    classify_deterministic,
+    classify_message,
+    classify_offline_in_thread,
+    classify_online,
+    detect_urgent,
+    enrich_location,
+    enrich_ticket,
+    reclassify_edit,
+)
 from src.config import settings
+from src.incidents import Incident, incidents
+from src.location import extract_location
+from src.media import init_media, process_ticket_media
+from src.metrics import (
+    ENRICHMENT_REUSED_TOTAL,
+    EVENT_LOOP_LAG_LAST,
+    INCIDENT_REPORTS_TOTAL,
+    SHED_TOTAL,
+    SPECULATIVE_LEGS_TOTAL,
+    STAGE_SECONDS,
+)
 from src.models import (
     BufferedMessage,
     ClassificationResult,
     Driver,
+    EnrichmentResult,
     Message,
     MessageSource,
     Ticket,
     TicketCategory,
 )
-from src.supabase_storage import storage
+from src.overload import OverloadLevel, overload
+from src.storage import AuditGroup, storage
+from src.tracing import trace
+from src.transport import get_async_transport
 
 logger = logging.getLogger(__name__)
 
+# --- Background tasks ---
+
+# The event loop only keeps weak references to tasks, so fire-and-forget work is
+# held here until it finishes. Grouped by kind so /health can report queue depths.
+_background_tasks: dict[str, set[asyncio.Task]] = defaultdict(set)
+
+
+def _spawn(kind: str, coro: Coroutine) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    tasks = _background_tasks[kind]
+    tasks.add(task)
+    task.add_done_callback(tasks.discard)
+    return task
+
+
+async def _deferred(what: str, coro: Coroutine) -> None:
+    """Run non-essential work after the response-critical part; failures are only logged."""
+    try:
+        await coro
+    except Exception as e:
+        logger.error("Deferred %s failed: %s", what, e)
+
+
+def runtime_state() -> dict:
+    """In-memory pipeline state for /health: pending albums and bursts, background work."""
+    return {
+        "pending_albums": len(_media_groups),
+        "pending_bursts": len(_bursts),
+        "background_tasks": {kind: len(tasks) for kind, tasks in _background_tasks.items()},
+        "ingest": _ingest_gate.stats(),
+        "ai_budget_buckets": ai_budget.stats(),
+        "incidents": incidents.stats(),
+        "overload": {
+            **overload.stats(),
+            "deferred_enrichment": len(_deferred_enrichment),
+            "batched_audit": len(_audit_batch),
+        },
+    }
+
+
+# --- Ingest admission ---
+
+
+class _PriorityGate:
+    """Caps concurrent pipeline runs. When full, urgent updates are admitted before normal ones.
+
+    Waiters are kept in a heap ordered by (priority, arrival). A released slot is
+    handed straight to the next waiter, so a burst of normal traffic cannot
+    starve an urgent update that arrived after it.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self._limit = limit
+        self._active = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+
+    async def acquire(self, urgent: bool = False) -> None:
+        priority = 0 if urgent else 1
+        if self._active < self._limit and not self._waiters:
+            self._active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # slot was handed over just as we were cancelled
+            raise
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)  # hand the slot over; _active is unchanged
+                return
+        self._active -= 1
+
+    def stats(self) -> dict:
+        return {"active": self._active, "waiting": len(self._waiters)}
+
+
+_ingest_gate = _PriorityGate(settings.ingest_max_concurrency)
+
+
+# --- Load shedding (see src/overload.py) ---
+
+# Enrichment AI calls held back while overloaded, each a function that starts one
+_deferred_enrichment: list[Callable[[], Coroutine]] = []
+# Deferred enrichments started per monitor tick once back to normal
+_ENRICHMENT_RELEASE_PER_TICK = 8
+_OVERLOAD_CHECK_SECONDS = 0.5
+
+_audit_batch: list[AuditGroup] = []
+
+
+async def monitor_overload() -> None:
+    """Feed the overload controller; release deferred enrichment once back to normal."""
+    loop = asyncio.get_running_loop()
+    while True:
+        level = overload.observe(
+            _ingest_gate.stats()["waiting"], EVENT_LOOP_LAG_LAST.value(), loop.time()
+        )
+        if level == OverloadLevel.NORMAL and _deferred_enrichment:
+            release = _deferred_enrichment[:_ENRICHMENT_RELEASE_PER_TICK]
+            del _deferred_enrichment[:_ENRICHMENT_RELEASE_PER_TICK]
+            for start in release:
+                _spawn("enrichment", start())
+        await asyncio.sleep(_OVERLOAD_CHECK_SECONDS)
+
+
+def _schedule_enrichment(
+    ticket_id: str, texts: list[str], include_location: bool, incident: Incident | None = None
+) -> None:
+    _spawn_or_defer(lambda: _enrich_ticket_async(ticket_id, texts, include_location, incident))
+
+
+def _spawn_or_defer(start: Callable[[], Coroutine]) -> None:
+    """Start an enrichment AI call now, or hold it back until overload clears."""
+    if overload.level >= OverloadLevel.DEFER_ENRICHMENT:
+        SHED_TOTAL.inc("enrichment_deferred")
+        _deferred_enrichment.append(start)
+        return
+    _spawn("enrichment", start())
+
+
+async def _audit(
+    messages: list[Message],
+    classification_result: str,
+    classification_source: str,
+    ticket_id: str | None = None,
+    defer: bool = False,
+) -> None:
+    """Write raw_messages audit rows: inline, deferred, or batched while overloaded."""
+    if overload.level >= OverloadLevel.BATCH_AUDIT:
+        SHED_TOTAL.inc("audit_batched")
+        if not _audit_batch:
+            _spawn("audit", _flush_audit_batch(settings.overload_audit_flush_seconds))
+        _audit_batch.append((messages, classification_result, classification_source, ticket_id))
+        return
+    audit = storage.log_raw_messages(
+        messages=messages,
+        classification_result=classification_result,
+        classification_source=classification_source,
+        ticket_id=ticket_id,
+    )
+    if defer:
+        _spawn("deferred", _deferred("audit log", audit))
+    else:
+        with STAGE_SECONDS.time("audit_log"):
+            await audit
+
+
+async def _flush_audit_batch(delay: float = 0.0) -> None:
+    await asyncio.sleep(delay)
+    if not _audit_batch:
+        return
+    groups = _audit_batch[:]
+    _audit_batch.clear()
+    await _deferred("audit batch", storage.log_raw_message_groups(groups))
+
+
+async def flush_shed_work() -> None:
+    """Shutdown: write batched audit rows now. Deferred enrichment is dropped, not saved."""
+    await _flush_audit_batch()
+    if _deferred_enrichment:
+        logger.warning(
+            "Dropping %d deferred enrichments; those tickets keep no AI summary or location",
+            len(_deferred_enrichment),
+        )
+        _deferred_enrichment.clear()
+
+
 # --- Gratitude patterns ---
 
 GRATITUDE_PATTERNS = [
@@ -60,7 +264,12 @@ def _is_gratitude(text: str) -> bool:
 
 
 def _extract_message(update: Update) -> Message | None:
-    tg_msg = update.message or update.edited_message
+    tg_msg = (
+        update.message
+        or update.business_message
+        or update.edited_message
+        or update.edited_business_message
+    )
     if tg_msg is None or tg_msg.from_user is None:
         return None
 
@@ -86,23 +295,75 @@ def _extract_message(update: Update) -> Message | None:
         has_document=bool(tg_msg.document),
         source=source,
         business_connection_id=business_connection_id,
-        raw_data={},
+        media_group_id=tg_msg.media_group_id or "",
+        raw_data=_attachment_info(tg_msg),
     )
 
 
+def _file_info(media: object) -> dict:
+    side = getattr(media, "length", 0)  # video notes are square
+    return {
+        "file_id": media.file_id,
+        "file_unique_id": media.file_unique_id,
+        "file_size": media.file_size or 0,
+        "width": getattr(media, "width", side) or side,
+        "height": getattr(media, "height", side) or side,
+    }
+
+
+def _attachment_info(tg_msg: object) -> dict:
+    """Attachment details kept for later stages (media downloads, location lookup)."""
+    info: dict = {}
+    if tg_msg.location:
+        info["location"] = {
+            "latitude": tg_msg.location.latitude,
+            "longitude": tg_msg.location.longitude,
+        }
+    if tg_msg.photo:
+        info["photo"] = [_file_info(p) for p in tg_msg.photo]
+    video = tg_msg.video or tg_msg.video_note
+    if video:
+        info["video"] = _file_info(video)
+        info["video"]["mime_type"] = getattr(video, "mime_type", None) or "video/mp4"
+        if video.thumbnail:
+            info["video"]["thumbnail"] = _file_info(video.thumbnail)
+    return info
+
+
 # --- Ticket creation ---
 
 
+def _most_informative(messages: list[Message], default: Message) -> Message:
+    """The message to audit as "created" for a batch: the one the ticket is about.
+
+    A burst often opens with filler ("hey", "truck"), and "created" rows are the
+    local model's positive examples. So this is the first text that Layer 1 alone
+    calls a ticket, else the longest text, else ``default``.
+    """
+    texts = [m for m in messages if m.text.strip()]
+    for m in texts:
+        result = classify_deterministic(m)
+        if result is not None and result.is_ticket:
+            return m
+    if texts:
+        return max(texts, key=lambda m: len(m.text.strip()))
+    return default
+
+
 async def _create_ticket_from_message(
     message: Message,
     classification: ClassificationResult,
     driver: Driver,
     source_name: str = "",
     extra_messages: list[Message] | None = None,
+    audit_messages: list[Message] | None = None,
+    defer_audit: bool = False,
 ) -> Ticket:
     all_messages = [message]
     if extra_messages:
         all_messages.extend(extra_messages)
+    if audit_messages is None:
+        audit_messages = all_messages
 
     message_ids = [m.id for m in all_messages]
 
@@ -121,15 +382,17 @@ async def _create_ticket_from_message(
         priority=priority,
         message_ids=message_ids,
         classification=classification,
+        ai_location=extract_location(all_messages),
     )
-    ticket_id = await storage.create_ticket(ticket)
-    ticket.id = ticket_id
+    with STAGE_SECONDS.time("ticket_create"):
+        ticket_id = await storage.create_ticket(ticket)
+        ticket.id = ticket_id
 
-    await storage.save_message_as_ticket_message(
-        message=message,
-        ticket_id=ticket_id,
-        driver_name=driver.display_name,
-    )
+        rows = await storage.save_messages_as_ticket_messages(
+            messages=all_messages,
+            ticket_id=ticket_id,
+            driver_name=driver.display_name,
+        )
 
     logger.info(
         "Ticket %s created — driver=%s ai_category=%s ai_urgency=%d confidence=%d",
@@ -140,33 +403,190 @@ async def _create_ticket_from_message(
         classification.confidence,
     )
 
-    await storage.log_raw_message(
-        message=message,
-        classification_result="created",
-        classification_source=classification.layer,
-        ticket_id=ticket_id,
-    )
+    # One message carries the classification; the rest of a burst or album rode along
+    primary = _most_informative(audit_messages, message)
+    created = [m for m in audit_messages if m is primary]
+    appended = [m for m in audit_messages if m is not primary]
+    if created:
+        await _audit(created, "created", classification.layer, ticket_id, defer=defer_audit)
+    if appended:
+        await _audit(appended, "appended", classification.layer, ticket_id, defer=defer_audit)
 
     texts = [m.text for m in all_messages if m.text]
     if texts:
-        asyncio.create_task(_enrich_ticket_async(ticket_id, texts))
+        _enrich_new_ticket(message, ticket_id, texts, include_location=not ticket.ai_location)
+
+    _schedule_media(
+        ticket_id,
+        all_messages,
+        rows,
+        update_category=not texts and classification.category == TicketCategory.UNCLASSIFIED,
+    )
 
     return ticket
 
 
-async def _enrich_ticket_async(ticket_id: str, texts: list[str]) -> None:
+def _enrich_new_ticket(
+    message: Message, ticket_id: str, texts: list[str], include_location: bool
+) -> None:
+    """Enrich a new ticket, or reuse the enrichment of the incident it clusters into."""
+    incident = None
+    if settings.incident_clustering:
+        filed = incidents.observe(
+            message.business_connection_id or str(message.telegram_chat_id),
+            "\n".join(texts),
+            ticket_id,
+            asyncio.get_running_loop().time(),
+        )
+        if filed is None:
+            INCIDENT_REPORTS_TOTAL.inc("skipped")
+        else:
+            incident, is_new = filed
+            INCIDENT_REPORTS_TOTAL.inc("new" if is_new else "clustered")
+            if not is_new:
+                logger.info(
+                    "Ticket %s joins incident %d (%d tickets)",
+                    ticket_id,
+                    incident.id,
+                    len(incident.ticket_ids),
+                )
+                if incident.enrichment is not None:
+                    _spawn(
+                        "enrichment",
+                        _apply_incident_enrichment(ticket_id, texts, incident, include_location),
+                    )
+                    return
+                if not incident.enrichment_failed:
+                    incident.waiting.append((ticket_id, texts, include_location))
+                    return
+                # The first report's enrichment failed: this one tries, and shares if it works
+    _schedule_enrichment(ticket_id, texts, include_location, incident)
+
+
+async def _enrich_ticket_async(
+    ticket_id: str,
+    texts: list[str],
+    include_location: bool = True,
+    incident: Incident | None = None,
+) -> None:
+    enrichment = None
+    try:
+        enrichment = await enrich_ticket(texts, include_location=include_location)
+        updates: dict = {
+            "urgency": enrichment.urgency,
+            "category": enrichment.category,
+            "summary": enrichment.summary,
+        }
+        if include_location:
+            updates["location"] = enrichment.location
+        await storage.update_ticket(ticket_id, **updates)
+        logger.info("Ticket %s enriched — %s", ticket_id, enrichment.summary[:80])
+    except Exception as e:
+        logger.error("Enrichment failed for ticket %s: %s", ticket_id, e)
+    if incident is not None:
+        _share_enrichment(incident, enrichment)
+
+
+def _share_enrichment(incident: Incident, enrichment: EnrichmentResult | None) -> None:
+    """Hand an incident's enrichment to the tickets that joined it while it ran."""
+    waiting, incident.waiting = incident.waiting, []
+    if enrichment is None or not enrichment.summary:
+        # enrich_ticket returns an empty result on failure; don't copy that around
+        incident.enrichment_failed = True
+        for ticket_id, texts, include_location in waiting:
+            _schedule_enrichment(ticket_id, texts, include_location)
+        return
+    incident.enrichment = enrichment
+    incident.enrichment_failed = False
+    for ticket_id, texts, include_location in waiting:
+        _spawn(
+            "enrichment",
+            _apply_incident_enrichment(ticket_id, texts, incident, include_location),
+        )
+
+
+# Longest ai_summary built from a clustered ticket's own text
+_OWN_SUMMARY_CHARS = 200
+
+
+def _own_summary(texts: list[str]) -> str:
+    """The driver's own words as a ticket summary, cut at a word boundary."""
+    text = " ".join(" ".join(texts).split())
+    if len(text) <= _OWN_SUMMARY_CHARS:
+        return text
+    return text[:_OWN_SUMMARY_CHARS].rsplit(" ", 1)[0] + "…"
+
+
+async def _apply_incident_enrichment(
+    ticket_id: str, texts: list[str], incident: Incident, include_location: bool = False
+) -> None:
+    """Copy urgency and category from the incident.
+
+    The incident's summary describes the first driver's report, so it stays on the
+    Incident; this ticket's ai_summary is its own text. Location stays per driver:
+    with ``include_location`` (none was found in the text) a location-only AI call
+    extracts it from this ticket's messages, deferred like any enrichment call.
+    """
+    enrichment = incident.enrichment
+    ENRICHMENT_REUSED_TOTAL.inc()
     try:
-        enrichment = await enrich_ticket(texts)
         await storage.update_ticket(
             ticket_id,
             urgency=enrichment.urgency,
             category=enrichment.category,
-            location=enrichment.location,
-            summary=enrichment.summary,
+            summary=_own_summary(texts),
         )
-        logger.info("Ticket %s enriched — %s", ticket_id, enrichment.summary[:80])
+        logger.info("Ticket %s enriched from incident %d", ticket_id, incident.id)
     except Exception as e:
         logger.error("Enrichment failed for ticket %s: %s", ticket_id, e)
+    if include_location:
+        _spawn_or_defer(lambda: _enrich_location_async(ticket_id, texts))
+
+
+async def _enrich_location_async(ticket_id: str, texts: list[str]) -> None:
+    location = await enrich_location(texts)
+    if not location:
+        return
+    try:
+        await storage.update_ticket(ticket_id, location=location)
+    except Exception as e:
+        logger.error("Location update failed for ticket %s: %s", ticket_id, e)
+
+
+def _schedule_media(
+    ticket_id: str,
+    messages: list[Message],
+    rows: list[dict],
+    update_category: bool = False,
+) -> None:
+    if any("photo" in m.raw_data or "video" in m.raw_data for m in messages):
+        _spawn(
+            "media",
+            process_ticket_media(ticket_id, messages, rows, update_category=update_category),
+        )
+
+
+async def _append_to_ticket(
+    ticket_id: str,
+    batch: list[Message],
+    driver: Driver,
+    classification_source: str,
+    defer_audit: bool = False,
+) -> None:
+    """Append messages to an existing ticket, then kick off media and location updates."""
+    with STAGE_SECONDS.time("ticket_append"):
+        rows = await storage.append_messages_to_ticket(
+            ticket_id=ticket_id,
+            messages=batch,
+            driver_name=driver.display_name,
+        )
+        _schedule_media(ticket_id, batch, rows)
+
+        location = extract_location(batch)
+        if location:
+            await storage.update_ticket(ticket_id, location=location)
+
+    await _audit(batch, "appended", classification_source, ticket_id, defer=defer_audit)
 
 
 # --- Buffer management ---
@@ -177,8 +597,10 @@ async def _handle_buffered(
     classification: ClassificationResult,
     driver: Driver,
     source_name: str = "",
+    extra_messages: list[Message] | None = None,
 ) -> None:
     user_id = driver.telegram_user_id
+    extra_messages = extra_messages or []
 
     existing = await storage.get_buffered(user_id)
     if existing is not None:
@@ -191,8 +613,14 @@ async def _handle_buffered(
             layer="buffer_merge",
             reason="follow_up_received",
         )
+        # The buffered messages were already audited as "buffered"; only log the new ones.
         await _create_ticket_from_message(
-            message, merged, driver, source_name=source_name, extra_messages=[existing.message]
+            message,
+            merged,
+            driver,
+            source_name=source_name,
+            extra_messages=[*extra_messages, existing.message, *existing.extra_messages],
+            audit_messages=[message, *extra_messages],
         )
         return
 
@@ -201,6 +629,7 @@ async def _handle_buffered(
         message=message,
         classification=classification,
         expires_at=expires_at,
+        extra_messages=extra_messages,
     )
     await storage.buffer_message(user_id, entry)
     logger.info(
@@ -211,45 +640,118 @@ async def _handle_buffered(
     )
 
 
+# --- Pipeline legs ---
+
+
+class _Legs:
+    """Independent steps of one pipeline run, started together and consumed in precedence order.
+
+    Reply-thread, window and gratitude lookups and Layer 1/1.5 classification need
+    nothing from each other, so they run concurrently. The handler still reads them
+    in the order that decides routing (reply thread > window > gratitude >
+    classification); once one routes the message, cancel() drops the rest. Legs
+    never started are skipped.
+    """
+
+    def __init__(self) -> None:
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    def start(self, name: str, coro: Coroutine) -> None:
+        self._tasks[name] = asyncio.create_task(coro)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tasks
+
+    async def result(self, name: str) -> object:
+        task = self._tasks.pop(name)
+        SPECULATIVE_LEGS_TOTAL.inc(name, "used")
+        return await task
+
+    def cancel(self) -> None:
+        for name, task in self._tasks.items():
+            if task.done():
+                if not task.cancelled():
+                    task.exception()  # retrieved, so a failure is not logged as unhandled
+                SPECULATIVE_LEGS_TOTAL.inc(name, "discarded")
+            else:
+                task.cancel()
+                SPECULATIVE_LEGS_TOTAL.inc(name, "cancelled")
+        self._tasks.clear()
+
+
+def _classification_input(message: Message, extra_messages: list[Message] | None = None) -> Message:
+    """What the classifier sees for a batch: the primary, with every text in the batch joined.
+
+    Only the classifier sees the joined text. Each message is still stored on its
+    own, with its own telegram_message_id.
+    """
+    texts = [m.text for m in [message, *(extra_messages or [])] if m.text]
+    if len(texts) <= 1:
+        return message
+    return message.model_copy(update={"text": "\n".join(texts)})
+
+
+async def _classification(
+    message: Message, legs: _Legs, extra_messages: list[Message] | None = None
+) -> ClassificationResult:
+    """Classify after the lookups missed, reusing the speculative Layer 1/1.5 result if any.
+
+    Layer 2 (AI) only starts here, so a follow-up that joins an open ticket never
+    costs an AI call or draws from the AI budget.
+    """
+    classified = _classification_input(message, extra_messages)
+    with STAGE_SECONDS.time("classify"):
+        if "classify" not in legs:
+            return await classify_message(classified, ai_budget)
+        result = await legs.result("classify")
+        if result is None:
+            result = await classify_online(classified, ai_budget)
+        return result
+
+
 # --- DM Pipeline ---
 
 
-async def _handle_dm(message: Message, driver: Driver, source_name: str, update: Update) -> None:
+async def _handle_dm(
+    message: Message,
+    driver: Driver,
+    source_name: str,
+    update: Update,
+    legs: _Legs,
+    extra_messages: list[Message] | None = None,
+) -> None:
     bcid = message.business_connection_id
+    batch = [message, *(extra_messages or [])]
 
-    open_ticket = await storage.find_open_ticket_for_driver(
-        driver_id=message.driver_id,
-        source_type="business_dm",
-        source_identifier=bcid,
-        hours=4,
+    legs.start(
+        "window",
+        storage.find_open_ticket_for_driver(
+            driver_id=message.driver_id,
+            source_type="business_dm",
+            source_identifier=bcid,
+            hours=4,
+        ),
     )
+    if not extra_messages and _is_gratitude(message.text):
+        legs.start(
+            "gratitude",
+            storage.find_recently_resolved_ticket(driver_id=message.driver_id, hours=24),
+        )
+
+    with STAGE_SECONDS.time("window_lookup"):
+        open_ticket = await legs.result("window")
     if open_ticket is not None:
+        legs.cancel()
         tid = open_ticket["id"]
-        await storage.append_message_to_ticket(
-            ticket_id=tid,
-            message=message,
-            driver_name=driver.display_name,
-        )
-        await storage.log_raw_message(
-            message=message,
-            classification_result="appended",
-            classification_source="window_match",
-            ticket_id=tid,
-        )
+        await _append_to_ticket(tid, batch, driver, "window_match")
         logger.info("Appended DM to existing ticket %s for driver %s", tid, message.driver_id)
         return
 
-    if _is_gratitude(message.text):
-        recent_resolved = await storage.find_recently_resolved_ticket(
-            driver_id=message.driver_id,
-            hours=24,
-        )
+    if "gratitude" in legs:
+        recent_resolved = await legs.result("gratitude")
         if recent_resolved is not None:
-            await storage.log_raw_message(
-                message=message,
-                classification_result="dismissed",
-                classification_source="gratitude_after_resolve",
-            )
+            legs.cancel()
+            await _audit([message], "dismissed", "gratitude_after_resolve")
             logger.info(
                 "Dismissed gratitude message from driver %s (resolved ticket %s)",
                 message.driver_id,
@@ -257,7 +759,7 @@ async def _handle_dm(message: Message, driver: Driver, source_name: str, update:
             )
             return
 
-    classification = await classify_message(message)
+    classification = await _classification(message, legs, extra_messages)
 
     logger.debug(
         "DM classification for driver %s: is_ticket=%s confidence=%d category=%s",
@@ -267,51 +769,50 @@ async def _handle_dm(message: Message, driver: Driver, source_name: str, update:
         classification.category,
     )
 
-    if not classification.is_ticket:
-        await storage.log_raw_message(
-            message=message,
-            classification_result="dismissed",
-            classification_source=classification.layer,
-        )
-        return
-
-    if classification.confidence <= 2:
-        await storage.log_raw_message(
-            message=message,
-            classification_result="buffered",
-            classification_source=classification.layer,
-        )
-        await _handle_buffered(message, classification, driver, source_name=source_name)
-        return
-
-    await _create_ticket_from_message(message, classification, driver, source_name=source_name)
+    await _route_classified(
+        message, classification, driver, source_name, extra_messages=extra_messages
+    )
 
 
 # --- Group Pipeline ---
 
 
-async def _handle_group(message: Message, driver: Driver, source_name: str, update: Update) -> None:
+async def _handle_group(
+    message: Message,
+    driver: Driver,
+    source_name: str,
+    update: Update,
+    legs: _Legs,
+    extra_messages: list[Message] | None = None,
+) -> None:
     tg_msg = update.message
+    batch = [message, *(extra_messages or [])]
 
     if tg_msg and tg_msg.reply_to_message:
-        replied_msg_id = tg_msg.reply_to_message.message_id
-        tracked_ticket = await storage.find_ticket_by_message_telegram_id(
-            chat_id=message.telegram_chat_id,
-            telegram_message_id=replied_msg_id,
+        legs.start(
+            "reply",
+            storage.find_ticket_by_message_telegram_id(
+                chat_id=message.telegram_chat_id,
+                telegram_message_id=tg_msg.reply_to_message.message_id,
+            ),
         )
+    legs.start(
+        "window",
+        storage.find_open_ticket_for_driver(
+            driver_id=message.driver_id,
+            source_type="group",
+            source_identifier=message.telegram_chat_id,
+            hours=4,
+        ),
+    )
+
+    if "reply" in legs:
+        with STAGE_SECONDS.time("reply_lookup"):
+            tracked_ticket = await legs.result("reply")
         if tracked_ticket is not None:
+            legs.cancel()
             tid = tracked_ticket["id"]
-            await storage.append_message_to_ticket(
-                ticket_id=tid,
-                message=message,
-                driver_name=driver.display_name,
-            )
-            await storage.log_raw_message(
-                message=message,
-                classification_result="appended",
-                classification_source="reply_thread",
-                ticket_id=tid,
-            )
+            await _append_to_ticket(tid, batch, driver, "reply_thread")
             logger.info(
                 "Appended reply to ticket %s in group %d",
                 tid,
@@ -319,25 +820,12 @@ async def _handle_group(message: Message, driver: Driver, source_name: str, upda
             )
             return
 
-    open_ticket = await storage.find_open_ticket_for_driver(
-        driver_id=message.driver_id,
-        source_type="group",
-        source_identifier=message.telegram_chat_id,
-        hours=4,
-    )
+    with STAGE_SECONDS.time("window_lookup"):
+        open_ticket = await legs.result("window")
     if open_ticket is not None:
+        legs.cancel()
         tid = open_ticket["id"]
-        await storage.append_message_to_ticket(
-            ticket_id=tid,
-            message=message,
-            driver_name=driver.display_name,
-        )
-        await storage.log_raw_message(
-            message=message,
-            classification_result="appended",
-            classification_source="window_match",
-            ticket_id=tid,
-        )
+        await _append_to_ticket(tid, batch, driver, "window_match")
         logger.info(
             "Appended group message to existing ticket %s for driver %s",
             tid,
@@ -345,7 +833,7 @@ async def _handle_group(message: Message, driver: Driver, source_name: str, upda
         )
         return
 
-    classification = await classify_message(message)
+    classification = await _classification(message, legs, extra_messages)
 
     logger.debug(
         "Group classification for driver %s: is_ticket=%s confidence=%d category=%s",
@@ -355,59 +843,334 @@ async def _handle_group(message: Message, driver: Driver, source_name: str, upda
         classification.category,
     )
 
+    await _route_classified(
+        message, classification, driver, source_name, extra_messages=extra_messages
+    )
+
+
+async def _route_classified(
+    message: Message,
+    classification: ClassificationResult,
+    driver: Driver,
+    source_name: str,
+    extra_messages: list[Message] | None = None,
+) -> None:
+    """Dismiss, buffer or create a ticket from a classified message (shared by DM/group)."""
+    batch = [message, *(extra_messages or [])]
+
     if not classification.is_ticket:
-        await storage.log_raw_message(
-            message=message,
-            classification_result="dismissed",
-            classification_source=classification.layer,
+        await _audit(batch, "dismissed", classification.layer)
+        return
+
+    # A shed classification (overload, no AI call) is never buffered: fail open to a ticket.
+    # A burst is judged on its joined text, so a run of filler is buffered like one message.
+    if classification.confidence <= 2 and classification.layer != "shed":
+        await _audit(batch, "buffered", classification.layer)
+        await _handle_buffered(
+            message, classification, driver, source_name=source_name, extra_messages=extra_messages
         )
         return
 
-    if classification.confidence <= 2:
-        await storage.log_raw_message(
-            message=message,
-            classification_result="buffered",
-            classification_source=classification.layer,
+    await _create_ticket_from_message(
+        message, classification, driver, source_name=source_name, extra_messages=extra_messages
+    )
+
+
+# --- Media group (album) coalescing ---
+
+
+class _PendingMediaGroup:
+    """Updates of one Telegram album collected during the coalescing window."""
+
+    def __init__(self, message: Message, update: Update) -> None:
+        self.messages: list[Message] = [message]
+        self.update = update
+        self.last_seen = asyncio.get_running_loop().time()
+
+
+_media_groups: dict[str, _PendingMediaGroup] = {}
+
+
+def _coalesce_media_group(message: Message, update: Update) -> None:
+    """Collect an album item; the first item schedules a single pipeline run for the group."""
+    group_key = f"{message.telegram_chat_id}:{message.media_group_id}"
+    pending = _media_groups.get(group_key)
+    if pending is not None:
+        pending.messages.append(message)
+        pending.last_seen = asyncio.get_running_loop().time()
+        return
+
+    _media_groups[group_key] = _PendingMediaGroup(message, update)
+    _spawn("album", _flush_media_group(group_key))
+
+
+def export_pending_albums() -> list[tuple[str, list[Message], Update]]:
+    """Take every album still in its window, for the shutdown snapshot (src/snapshot.py).
+
+    Their flush tasks find the entry gone and return, so nothing is processed twice.
+    """
+    albums = [(key, pending.messages, pending.update) for key, pending in _media_groups.items()]
+    _media_groups.clear()
+    return albums
+
+
+def restore_pending_albums(albums: list[tuple[str, list[Message], Update]]) -> None:
+    """Re-open restored albums; each gets a fresh window for late items."""
+    for group_key, messages, update in albums:
+        if group_key in _media_groups or not messages:
+            continue
+        pending = _PendingMediaGroup(messages[0], update)
+        pending.messages = list(messages)
+        _media_groups[group_key] = pending
+        _spawn("album", _flush_media_group(group_key))
+
+
+async def _flush_media_group(group_key: str) -> None:
+    window = settings.media_group_window_seconds
+    loop = asyncio.get_running_loop()
+    pending = _media_groups[group_key]
+    while True:
+        remaining = pending.last_seen + window - loop.time()
+        if remaining <= 0:
+            break
+        await asyncio.sleep(remaining)
+    if _media_groups.pop(group_key, None) is None:
+        return  # taken by the shutdown snapshot
+
+    # The captioned item carries the album's text, so it drives classification.
+    messages = sorted(pending.messages, key=lambda m: m.telegram_message_id)
+    primary = next((m for m in messages if m.text), messages[0])
+    extras = [m for m in messages if m is not primary]
+    logger.info(
+        "Coalesced album %s — %d items into one pipeline run", group_key, len(messages)
+    )
+    try:
+        with trace("album", f"{group_key} items={len(messages)}"):
+            await _process_message(primary, pending.update, extra_messages=extras)
+    except Exception as e:
+        logger.error("Album processing failed for %s: %s", group_key, e)
+
+
+# --- Text-burst coalescing ---
+
+
+class _PendingBurst:
+    """Consecutive text messages from one driver in one chat, waiting for a quiet period.
+
+    The quiet period starts at BURST_QUIET_SECONDS and follows the driver's pace:
+    after each message it becomes 1.5x the gap that preceded it, capped at
+    BURST_MAX_QUIET_SECONDS, so a slow typist is not cut off mid-report.
+    """
+
+    def __init__(self, message: Message, update: Update) -> None:
+        self.messages: list[Message] = [message]
+        self.update = update
+        self.started = self.last_seen = asyncio.get_running_loop().time()
+        self.quiet = settings.burst_quiet_seconds
+        self.flush = asyncio.Event()
+
+    def add(self, message: Message) -> None:
+        now = asyncio.get_running_loop().time()
+        gap = now - self.last_seen
+        self.quiet = min(
+            max(settings.burst_quiet_seconds, 1.5 * gap), settings.burst_max_quiet_seconds
+        )
+        self.messages.append(message)
+        self.last_seen = now
+
+    def complete(self) -> bool:
+        """Stop waiting: size cap reached, urgent text, or a confident Layer 1 ticket."""
+        if len(self.messages) >= settings.burst_max_messages:
+            return True
+        merged = _classification_input(self.messages[0], self.messages[1:])
+        if detect_urgent(merged) is not None:
+            return True
+        result = classify_deterministic(merged)
+        return (
+            result is not None
+            and result.is_ticket
+            and result.confidence >= settings.min_confidence_for_ticket
         )
-        await _handle_buffered(message, classification, driver, source_name=source_name)
+
+
+_bursts: dict[str, _PendingBurst] = {}
+
+
+def _burst_key(message: Message) -> str:
+    return f"{message.telegram_chat_id}:{message.business_connection_id}:{message.telegram_user_id}"
+
+
+def _burstable(message: Message, update: Update) -> bool:
+    """Plain text that is not a reply. Replies route by their thread, so they run alone."""
+    if settings.burst_quiet_seconds <= 0 or not message.text:
+        return False
+    if (
+        message.has_photo
+        or message.has_video
+        or message.has_voice
+        or message.has_location
+        or message.has_document
+    ):
+        return False
+    tg_msg = update.message or update.business_message
+    return not (tg_msg and tg_msg.reply_to_message)
+
+
+def _coalesce_text(message: Message, update: Update) -> None:
+    """Add a text message to its driver's burst; the first one schedules the pipeline run."""
+    key = _burst_key(message)
+    pending = _bursts.get(key)
+    if pending is None:
+        pending = _bursts[key] = _PendingBurst(message, update)
+        _spawn("burst", _flush_burst(key, pending))
+    else:
+        pending.add(message)
+    if pending.complete():
+        pending.flush.set()
+
+
+def export_pending_bursts() -> list[tuple[str, list[Message], Update]]:
+    """Take every burst still waiting, for the shutdown snapshot (src/snapshot.py)."""
+    bursts = [(key, pending.messages, pending.update) for key, pending in _bursts.items()]
+    for pending in _bursts.values():
+        pending.flush.set()
+    _bursts.clear()
+    return bursts
+
+
+def restore_pending_bursts(bursts: list[tuple[str, list[Message], Update]]) -> None:
+    """Re-open restored bursts; each gets a fresh quiet period."""
+    for key, messages, update in bursts:
+        if key in _bursts or not messages:
+            continue
+        pending = _PendingBurst(messages[0], update)
+        pending.messages = list(messages)
+        _bursts[key] = pending
+        _spawn("burst", _flush_burst(key, pending))
+
+
+async def _flush_burst(key: str, pending: _PendingBurst) -> None:
+    loop = asyncio.get_running_loop()
+    deadline = pending.started + settings.burst_max_seconds
+    while not pending.flush.is_set():
+        remaining = min(pending.last_seen + pending.quiet, deadline) - loop.time()
+        if remaining <= 0:
+            break
+        try:
+            await asyncio.wait_for(pending.flush.wait(), remaining)
+        except TimeoutError:
+            pass
+    if _bursts.get(key) is not pending:
+        return  # run by _flush_burst_now, or taken by the shutdown snapshot
+    del _bursts[key]
+    await _run_burst(key, pending)
+
+
+async def _flush_burst_now(key: str) -> None:
+    """Run the driver's pending burst, if any, before their next non-text message."""
+    pending = _bursts.pop(key, None)
+    if pending is None:
         return
+    pending.flush.set()
+    await _run_burst(key, pending)
+
+
+async def _run_burst(key: str, pending: _PendingBurst) -> None:
+    messages = pending.messages
+    if len(messages) > 1:
+        logger.info(
+            "Coalesced text burst %s — %d messages into one pipeline run", key, len(messages)
+        )
+    try:
+        with trace("burst", f"{key} messages={len(messages)}"):
+            await _process_message(messages[0], pending.update, extra_messages=messages[1:])
+    except Exception as e:
+        logger.error("Burst processing failed for %s: %s", key, e)
 
-    await _create_ticket_from_message(message, classification, driver, source_name=source_name)
+
+def _edit_pending_burst(message: Message) -> bool:
+    """Apply an edit to a message still waiting in a burst. False if it is not in one."""
+    pending = _bursts.get(_burst_key(message))
+    for i, waiting in enumerate(pending.messages if pending else []):
+        if waiting.telegram_message_id == message.telegram_message_id:
+            pending.messages[i] = waiting.model_copy(update={"text": message.text})
+            return True
+    return False
 
 
 # --- Core message handler ---
 
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    message = _extract_message(update)
-    if message is None:
-        return
+    with trace("update", f"update_id={update.update_id}"):
+        with STAGE_SECONDS.time("extract"):
+            message = _extract_message(update)
+        if message is None:
+            return
 
-    tg_user = update.message.from_user if update.message else None
-    if tg_user is None:
-        return
+        tg_user = update.effective_user
+        if tg_user is None:
+            return
 
-    if tg_user.is_bot:
-        return
+        if tg_user.is_bot:
+            return
+
+        if message.media_group_id:
+            _coalesce_media_group(message, update)
+            return
+
+        if _burstable(message, update):
+            _coalesce_text(message, update)
+            return
+
+        # Anything else from a driver mid-burst runs after the burst, keeping their order.
+        await _flush_burst_now(_burst_key(message))
+        await _process_message(message, update)
+
+
+async def _process_message(
+    message: Message,
+    update: Update,
+    extra_messages: list[Message] | None = None,
+) -> None:
+    urgent = detect_urgent(_classification_input(message, extra_messages))
+    with STAGE_SECONDS.time("ingest_wait"):
+        await _ingest_gate.acquire(urgent=urgent is not None)
+    try:
+        if urgent is not None:
+            await _process_urgent(message, update, urgent, extra_messages)
+        else:
+            await _process_normal(message, update, extra_messages)
+    finally:
+        _ingest_gate.release()
+
+
+async def _process_normal(
+    message: Message,
+    update: Update,
+    extra_messages: list[Message] | None = None,
+) -> None:
+    tg_user = update.effective_user
 
     # Validate the connection is registered
     is_valid = False
     source_name = ""
 
-    if message.source == MessageSource.DM and message.business_connection_id:
-        is_valid = await storage.validate_business_connection(
-            message.business_connection_id
-        )
-        if is_valid:
-            source_name = await storage.get_connection_display_name(
-                business_connection_id=message.business_connection_id
-            )
-    elif message.source == MessageSource.GROUP:
-        is_valid = await storage.validate_group_connection(message.telegram_chat_id)
-        if is_valid:
-            source_name = await storage.get_connection_display_name(
-                chat_id=message.telegram_chat_id
+    with STAGE_SECONDS.time("validate_connection"):
+        if message.source == MessageSource.DM and message.business_connection_id:
+            is_valid = await storage.validate_business_connection(
+                message.business_connection_id
             )
+            if is_valid:
+                source_name = await storage.get_connection_display_name(
+                    business_connection_id=message.business_connection_id
+                )
+        elif message.source == MessageSource.GROUP:
+            is_valid = await storage.validate_group_connection(message.telegram_chat_id)
+            if is_valid:
+                source_name = await storage.get_connection_display_name(
+                    chat_id=message.telegram_chat_id
+                )
 
     if not is_valid:
         logger.warning(
@@ -418,20 +1181,323 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         )
         return
 
-    # Upsert driver profile (no company_id in V2)
-    driver = await storage.upsert_driver(
+    # Layers 1 and 1.5 need only the message, so they run on a worker thread while
+    # the driver upsert and the ticket lookups wait on storage. The AI is not called here.
+    legs = _Legs()
+    if settings.speculative_classification:
+        legs.start(
+            "classify",
+            classify_offline_in_thread(_classification_input(message, extra_messages)),
+        )
+    try:
+        # Upsert driver profile (no company_id in V2)
+        with STAGE_SECONDS.time("upsert_driver"):
+            driver = await _upsert_driver(tg_user)
+        message.driver_id = driver.id
+        for extra in extra_messages or []:
+            extra.driver_id = driver.id
+
+        # Route to appropriate pipeline
+        if message.source == MessageSource.DM:
+            await _handle_dm(message, driver, source_name, update, legs, extra_messages)
+        elif message.source == MessageSource.GROUP:
+            await _handle_group(message, driver, source_name, update, legs, extra_messages)
+    finally:
+        legs.cancel()
+
+
+async def _upsert_driver(tg_user: User) -> Driver:
+    return await storage.upsert_driver(
         telegram_user_id=tg_user.id,
         first_name=tg_user.first_name or "",
         last_name=tg_user.last_name or "",
         username=tg_user.username or "",
     )
+
+
+async def _active_connection_name(message: Message) -> str | None:
+    """Validate the source and fetch its display name in one query; None if unregistered."""
+    if message.source == MessageSource.DM and message.business_connection_id:
+        return await storage.get_active_connection_name(
+            business_connection_id=message.business_connection_id
+        )
+    if message.source == MessageSource.GROUP:
+        return await storage.get_active_connection_name(chat_id=message.telegram_chat_id)
+    return None
+
+
+async def _find_open_ticket(
+    message: Message, thread_message_id: int | None = None
+) -> dict | None:
+    """Open ticket holding ``thread_message_id`` in this chat, else the driver's 4-hour window."""
+    if thread_message_id is not None:
+        with STAGE_SECONDS.time("reply_lookup"):
+            ticket = await storage.find_ticket_by_message_telegram_id(
+                chat_id=message.telegram_chat_id,
+                telegram_message_id=thread_message_id,
+            )
+        if ticket is not None:
+            return ticket
+    with STAGE_SECONDS.time("window_lookup"):
+        return await storage.find_open_ticket_for_driver(
+            driver_id=message.driver_id,
+            source_type=message.source.value,
+            source_identifier=(
+                message.business_connection_id
+                if message.source == MessageSource.DM
+                else message.telegram_chat_id
+            ),
+            hours=4,
+        )
+
+
+# --- Urgent fast path ---
+
+
+async def _process_urgent(
+    message: Message,
+    update: Update,
+    classification: ClassificationResult,
+    extra_messages: list[Message] | None = None,
+) -> None:
+    """Urgency >= 4 (detect_urgent): get a ticket in front of operators first.
+
+    Differences from the normal pipeline:
+    - one query validates the connection and fetches its display name;
+    - a known driver is read, not upserted. The last_seen_at/name update runs
+      after the ticket exists;
+    - no gratitude check, local model or AI call. The keyword result is final
+      until enrichment runs;
+    - the raw_messages audit rows are written after the ticket exists.
+    Reply-thread and 4-hour window lookups still run, so an urgent follow-up
+    joins (and escalates) the driver's open ticket instead of duplicating it.
+    """
+    tg_user = update.effective_user
+
+    with STAGE_SECONDS.time("validate_connection"):
+        source_name = await _active_connection_name(message)
+    if source_name is None:
+        logger.warning(
+            "Unknown source — no active connection found for %s chat_id=%d bcid=%s. Skipping.",
+            message.source,
+            message.telegram_chat_id,
+            message.business_connection_id,
+        )
+        return
+
+    with STAGE_SECONDS.time("driver_lookup"):
+        driver = await storage.get_driver_by_telegram_id(tg_user.id)
+        if driver is None:
+            driver = await _upsert_driver(tg_user)
+        else:
+            _spawn("deferred", _deferred("driver upsert", _upsert_driver(tg_user)))
+    message.driver_id = driver.id
+    batch = [message, *(extra_messages or [])]
+    for extra in batch[1:]:
+        extra.driver_id = driver.id
+
+    logger.info(
+        "Urgent fast path — driver=%s urgency=%d reason=%s",
+        driver.id,
+        classification.urgency,
+        classification.reason,
+    )
+
+    tg_msg = update.message
+    reply_to = None
+    if message.source == MessageSource.GROUP and tg_msg and tg_msg.reply_to_message:
+        reply_to = tg_msg.reply_to_message.message_id
+    open_ticket = await _find_open_ticket(message, reply_to)
+
+    if open_ticket is None:
+        await _create_ticket_from_message(
+            message,
+            classification,
+            driver,
+            source_name=source_name,
+            extra_messages=extra_messages,
+            defer_audit=True,
+        )
+        return
+
+    tid = open_ticket["id"]
+    if classification.urgency > (open_ticket.get("ai_urgency") or 0):
+        await storage.update_ticket(tid, urgency=classification.urgency)
+    await _append_to_ticket(tid, batch, driver, "urgent_append", defer_audit=True)
+    logger.info("Appended urgent message to open ticket %s for driver %s", tid, driver.id)
+
+
+# --- Edited messages ---
+
+
+async def handle_edited_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Reconcile a text/caption edit with what the original produced, updating rows in place.
+
+    The original is found by its raw_messages row (chat_id, telegram_message_id).
+    Edits never add audit rows or open a second ticket for the same message:
+    - already on a ticket: the ticket_messages text is rewritten, and an edit
+      that makes the message urgent escalates the ticket;
+    - dismissed or buffered: re-classified only if the edit could flip the
+      outcome (classifier.reclassify_edit). A flip to a ticket joins the open
+      ticket or opens one, and the audit row records the new outcome.
+    """
+    with trace("edit", f"update_id={update.update_id}"):
+        message = _extract_message(update)
+        tg_user = update.effective_user
+        if message is None or tg_user is None or tg_user.is_bot:
+            return
+
+        if _edit_pending_burst(message):
+            return
+
+        with STAGE_SECONDS.time("edit_lookup"):
+            original = await storage.find_raw_message(
+                message.telegram_chat_id, message.telegram_message_id
+            )
+        if original is None:
+            # Unregistered source, or the original is still in flight (album window).
+            logger.debug(
+                "Edit of unknown message %d in chat %d ignored",
+                message.telegram_message_id,
+                message.telegram_chat_id,
+            )
+            return
+        if message.text[:2000] == (original.get("content_text") or ""):
+            return
+
+        if original.get("ticket_id"):
+            await _apply_edit_to_ticket(original, message)
+        else:
+            await _reclassify_edited(original, message, tg_user)
+
+
+async def _apply_edit_to_ticket(original: dict, message: Message) -> None:
+    ticket_id = original["ticket_id"]
+    with STAGE_SECONDS.time("edit_apply"):
+        await storage.update_ticket_message_text(ticket_id, message)
+        await storage.update_raw_message(original["id"], content_text=message.text[:2000] or None)
+
+    urgent = detect_urgent(message)
+    if urgent is not None:
+        tickets = await storage.get_tickets_by_ids([ticket_id], "id, ai_urgency")
+        if tickets and urgent.urgency > (tickets[0].get("ai_urgency") or 0):
+            await storage.update_ticket(ticket_id, urgency=urgent.urgency)
+            logger.info("Edit escalated ticket %s to urgency %d", ticket_id, urgent.urgency)
+    logger.info("Edit of message %d applied to ticket %s", message.telegram_message_id, ticket_id)
+
+
+def _same_message(a: Message, b: Message) -> bool:
+    return (
+        a.telegram_chat_id == b.telegram_chat_id
+        and a.telegram_message_id == b.telegram_message_id
+    )
+
+
+async def _reclassify_edited(original: dict, message: Message, tg_user: User) -> None:
+    with STAGE_SECONDS.time("classify"):
+        classification = await reclassify_edit(
+            message,
+            original.get("content_text") or "",
+            original.get("classification_source") or "",
+            ai_budget,
+        )
+
+    buffered = await storage.get_buffered(tg_user.id)
+    if buffered is not None and not _same_message(buffered.message, message):
+        rider = next((m for m in buffered.extra_messages if _same_message(m, message)), None)
+        if rider is not None:
+            # Part of a buffered burst: the burst's classification stands
+            rider.text = message.text
+            await storage.update_raw_message(
+                original["id"], content_text=message.text[:2000] or None
+            )
+            return
+        buffered = None  # the buffer holds a different message from this driver
+
+    fields: dict = {"content_text": message.text[:2000] or None}
+    if classification is None:
+        # Small edit to an AI/local-model decision: the outcome stands.
+        if buffered is not None:
+            buffered.message.text = message.text
+        await storage.update_raw_message(original["id"], **fields)
+        return
+
+    fields["classification_source"] = classification.layer
+    if not classification.is_ticket:
+        if buffered is not None:
+            await storage.pop_buffered(tg_user.id)
+        fields["classification_result"] = "dismissed"
+    elif classification.confidence <= 2:
+        if buffered is not None:
+            buffered.message.text = message.text
+            buffered.classification = classification
+        elif original.get("classification_result") == "dismissed":
+            driver = await storage.get_driver_by_telegram_id(tg_user.id)
+            message.driver_id = driver.id if driver else ""
+            await storage.buffer_message(
+                tg_user.id,
+                BufferedMessage(
+                    message=message,
+                    classification=classification,
+                    expires_at=datetime.now(timezone.utc)
+                    + timedelta(seconds=settings.buffer_timeout_seconds),
+                ),
+            )
+        fields["classification_result"] = "buffered"
+    else:
+        if buffered is not None:
+            await storage.pop_buffered(tg_user.id)
+        placed = await _ticket_for_edit(message, classification, tg_user)
+        if placed is not None:
+            fields["ticket_id"], fields["classification_result"] = placed
+
+    await storage.update_raw_message(original["id"], **fields)
+    logger.info(
+        "Edit of message %d reclassified: %s -> %s (%s)",
+        message.telegram_message_id,
+        original.get("classification_result"),
+        fields.get("classification_result", original.get("classification_result")),
+        classification.layer,
+    )
+
+
+async def _ticket_for_edit(
+    message: Message, classification: ClassificationResult, tg_user: User
+) -> tuple[str, str] | None:
+    """Put an edited message that is now a ticket on one. Returns (ticket_id, outcome)."""
+    with STAGE_SECONDS.time("validate_connection"):
+        source_name = await _active_connection_name(message)
+    if source_name is None:
+        return None
+    with STAGE_SECONDS.time("driver_lookup"):
+        driver = await storage.get_driver_by_telegram_id(tg_user.id)
+        if driver is None:
+            driver = await _upsert_driver(tg_user)
     message.driver_id = driver.id
 
-    # Route to appropriate pipeline
-    if message.source == MessageSource.DM:
-        await _handle_dm(message, driver, source_name, update)
-    elif message.source == MessageSource.GROUP:
-        await _handle_group(message, driver, source_name, update)
+    # A buffered message merged into a ticket keeps its "buffered" audit row,
+    # so check whether the message is already on a ticket before adding it.
+    with STAGE_SECONDS.time("reply_lookup"):
+        holding = await storage.find_ticket_by_message_telegram_id(
+            chat_id=message.telegram_chat_id,
+            telegram_message_id=message.telegram_message_id,
+        )
+    if holding is not None:
+        await storage.update_ticket_message_text(holding["id"], message)
+        return holding["id"], "appended"
+
+    open_ticket = await _find_open_ticket(message)
+    if open_ticket is not None:
+        with STAGE_SECONDS.time("ticket_append"):
+            await storage.append_messages_to_ticket(
+                open_ticket["id"], [message], driver_name=driver.display_name
+            )
+        return open_ticket["id"], "appended"
+
+    ticket = await _create_ticket_from_message(
+        message, classification, driver, source_name=source_name, audit_messages=[]
+    )
+    return ticket.id, "created"
 
 
 # --- Business message handler ---
@@ -464,19 +1530,40 @@ async def flush_expired_buffers() -> None:
 
 
 def create_bot_application() -> Application:
-    app = Application.builder().token(settings.bot_token).build()
+    builder = Application.builder().token(settings.bot_token)
+    # Pool size, HTTP/2 and keep-alive come from the shared transport (src/transport.py).
+    builder = builder.request(
+        HTTPXRequest(httpx_kwargs={"transport": get_async_transport("telegram")})
+    )
+    if settings.telegram_base_url:
+        # Local Bot API server (or the benchmark's stand-in)
+        base = settings.telegram_base_url.rstrip("/")
+        builder = builder.base_url(f"{base}/bot").base_file_url(f"{base}/file/bot")
+    app = builder.build()
+    init_media(app.bot)
 
     app.add_handler(
         MessageHandler(
-            filters.TEXT
-            | filters.PHOTO
-            | filters.VIDEO
-            | filters.VOICE
-            | filters.LOCATION
-            | filters.DOCUMENT
-            | filters.CAPTION,
+            (
+                filters.TEXT
+                | filters.PHOTO
+                | filters.VIDEO
+                | filters.VIDEO_NOTE
+                | filters.VOICE
+                | filters.LOCATION
+                | filters.Document.ALL
+                | filters.CAPTION
+            )
+            & ~filters.UpdateType.EDITED,
             handle_message,
         )
     )
+    # Live location updates also arrive as edits; only text/caption edits matter.
+    app.add_handler(
+        MessageHandler(
+            filters.UpdateType.EDITED & (filters.TEXT | filters.CAPTION),
+            handle_edited_message,
+        )
+    )
 
     return app
@@ -0,0 +1,102 @@
+"""Layer-2 (AI) budgets per driver and per chat.
+
+One driver pasting line after line, or a chatty group member, would otherwise
+turn every message Layer 1 cannot decide into a classify_ai call, eating the
+shared OpenAI rate limit. Each driver (telegram_user_id) and each chat gets a
+token bucket: AI_BUDGET_*_BURST calls up front, refilled at AI_BUDGET_*_PER_HOUR.
+A call needs a token from both buckets.
+
+Over budget, the AI is skipped (layer ``budget``). A driver out of budget is
+the flood itself, so the message is classified as not a ticket. It can still
+join a ticket that is already open: the reply-thread and 4-hour window lookups
+come before classification and need no AI call. When only the chat is out of
+budget, another member caused it, so the message takes the cheap path instead:
+a low-confidence "other" ticket, which is buffered until a follow-up arrives.
+
+AI_BUDGET_OVERRIDES scales both budgets for one connection, keyed by the group
+chat_id or the business_connection_id. Only the live pipeline passes a budget to
+the classifier; the reclassify CLI is never throttled.
+"""
+
+from __future__ import annotations
+
+from src.config import settings
+from src.metrics import AI_BUDGET_THROTTLED_TOTAL
+from src.models import Message
+from src.outbound import TokenBucket
+
+# Past this many tracked buckets, full (idle) ones are dropped
+_PRUNE_AT = 10_000
+
+
+class AIBudget:
+    def __init__(
+        self,
+        driver_per_hour: float,
+        driver_burst: int,
+        chat_per_hour: float,
+        chat_burst: int,
+        overrides: dict[str, float],
+    ) -> None:
+        self._limits = {
+            "driver": (driver_per_hour / 3600, driver_burst),
+            "chat": (chat_per_hour / 3600, chat_burst),
+        }
+        self._overrides = overrides
+        self._buckets: dict[str, dict[int, TokenBucket]] = {"driver": {}, "chat": {}}
+
+    def allow(self, message: Message, now: float) -> str | None:
+        """Take one AI call from the driver's and the chat's budget.
+
+        Returns None if allowed, else the exhausted scope ("driver" or "chat");
+        nothing is taken then.
+        """
+        connection = message.business_connection_id or str(message.telegram_chat_id)
+        scale = self._overrides.get(connection, 1.0)
+        keys = {"driver": message.telegram_user_id, "chat": message.telegram_chat_id}
+        buckets = []
+        for scope, key in keys.items():
+            rate, burst = self._limits[scope]
+            if rate <= 0:
+                continue  # this scope is unlimited
+            if scale <= 0:
+                AI_BUDGET_THROTTLED_TOTAL.inc(scope)
+                return scope
+            bucket = self._bucket(scope, key, rate * scale, burst * scale, now)
+            if bucket.delay(now) > 0:
+                AI_BUDGET_THROTTLED_TOTAL.inc(scope)
+                return scope
+            buckets.append(bucket)
+        for bucket in buckets:
+            bucket.take(now)
+        return None
+
+    def _bucket(
+        self, scope: str, key: int, rate: float, capacity: float, now: float
+    ) -> TokenBucket:
+        buckets = self._buckets[scope]
+        bucket = buckets.get(key)
+        if bucket is None:
+            if len(buckets) >= _PRUNE_AT:
+                self._prune(buckets, now)
+            bucket = buckets[key] = TokenBucket(rate, max(1.0, capacity), now)
+        return bucket
+
+    @staticmethod
+    def _prune(buckets: dict[int, TokenBucket], now: float) -> None:
+        for key, bucket in list(buckets.items()):
+            bucket.delay(now)  # refill
+            if bucket.tokens >= bucket.capacity:
+                del buckets[key]
+
+    def stats(self) -> dict:
+        return {scope: len(buckets) for scope, buckets in self._buckets.items()}
+
+
+ai_budget = AIBudget(
+    settings.ai_budget_driver_per_hour,
+    settings.ai_budget_driver_burst,
+    settings.ai_budget_chat_per_hour,
+    settings.ai_budget_chat_burst,
+    settings.ai_budget_overrides,
+)
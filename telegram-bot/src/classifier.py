@@ -1,19 +1,31 @@
 """Two-layer message classification pipeline.
 
 Layer 1: Deterministic keyword/heuristic matching (~55% of messages, instant, free).
-Layer 2: AI classification via GPT-4o-mini (~45% of messages).
+Layer 1.5: Optional local hashed n-gram model; answers only when confident (local_model.py).
+Layer 2: AI classification via GPT-4o-mini (remaining messages).
 Fail-open: if AI fails, create ticket anyway.
+Under heavy overload Layer 2 is skipped and undecided messages fail open (overload.py).
+Live traffic spends per-driver and per-chat AI budgets (budget.py).
 """
 
 from __future__ import annotations
 
+import asyncio
+import difflib
 import json
 import logging
 import re
-
-import openai
+import time
+from typing import TYPE_CHECKING
 
 from src.config import settings
+from src.local_model import classify_local
+from src.metrics import (
+    CLASSIFICATION_SECONDS,
+    CLASSIFICATIONS_TOTAL,
+    OPENAI_SECONDS,
+    SHED_TOTAL,
+)
 from src.models import (
     ClassificationResult,
     EnrichmentResult,
@@ -21,6 +33,14 @@ from src.models import (
     Message,
     TicketCategory,
 )
+from src.normalize import KeywordIndex, detect_language, fold
+from src.overload import OverloadLevel, overload
+from src.tracing import span
+
+if TYPE_CHECKING:
+    import openai
+
+    from src.budget import AIBudget
 
 logger = logging.getLogger(__name__)
 
@@ -90,6 +110,86 @@ TICKET_KEYWORDS: dict[str, TicketCategory] = {
     "check engine": TicketCategory.MECHANICAL,
 }
 
+# Russian and Uzbek keywords -> (category, urgency), written in their usual spelling.
+# They are folded, transliterated and stemmed when compiled (src/normalize.py), so
+# Uzbek entries also match Cyrillic spelling and inflected forms. Keywords of
+# several words need all of them in the message.
+TICKET_KEYWORDS_RU: dict[str, tuple[TicketCategory, int]] = {
+    # Mechanical
+    "двигатель": (TicketCategory.MECHANICAL, 3),
+    "мотор": (TicketCategory.MECHANICAL, 3),
+    "не заводится": (TicketCategory.MECHANICAL, 3),
+    "сломался": (TicketCategory.MECHANICAL, 4),
+    "поломка": (TicketCategory.MECHANICAL, 4),
+    "перегрев": (TicketCategory.MECHANICAL, 4),
+    "перегрелся": (TicketCategory.MECHANICAL, 4),
+    "радиатор": (TicketCategory.MECHANICAL, 3),
+    "антифриз": (TicketCategory.MECHANICAL, 3),
+    "трансмиссия": (TicketCategory.MECHANICAL, 3),
+    "масло": (TicketCategory.MECHANICAL, 3),
+    "тормоз": (TicketCategory.MECHANICAL, 3),
+    "тормоза отказали": (TicketCategory.MECHANICAL, 5),
+    "прицеп": (TicketCategory.MECHANICAL, 3),
+    # Tire
+    "колесо": (TicketCategory.TIRE, 3),
+    "шина": (TicketCategory.TIRE, 3),
+    "баллон": (TicketCategory.TIRE, 3),
+    "лопнуло": (TicketCategory.TIRE, 4),
+    # Fuel
+    "топливо": (TicketCategory.FUEL, 3),
+    "солярка": (TicketCategory.FUEL, 3),
+    "дизель": (TicketCategory.FUEL, 3),
+    # Accident
+    "авария": (TicketCategory.ACCIDENT, 5),
+    "дтп": (TicketCategory.ACCIDENT, 5),
+    "столкновение": (TicketCategory.ACCIDENT, 5),
+    # Electrical
+    "аккумулятор": (TicketCategory.ELECTRICAL, 3),
+    "проводка": (TicketCategory.ELECTRICAL, 3),
+    "электрика": (TicketCategory.ELECTRICAL, 3),
+    # Documentation
+    "страховка": (TicketCategory.DOCUMENTATION, 1),
+    "регистрация": (TicketCategory.DOCUMENTATION, 1),
+    "пермит": (TicketCategory.DOCUMENTATION, 1),
+}
+
+TICKET_KEYWORDS_UZ: dict[str, tuple[TicketCategory, int]] = {
+    # Mechanical
+    "motor ishlamayapti": (TicketCategory.MECHANICAL, 3),
+    "o't olmayapti": (TicketCategory.MECHANICAL, 3),
+    "buzildi": (TicketCategory.MECHANICAL, 4),
+    "tormoz": (TicketCategory.MECHANICAL, 3),
+    "tormoz ishlamayapti": (TicketCategory.MECHANICAL, 5),
+    "pritsep": (TicketCategory.MECHANICAL, 3),
+    # Tire
+    "balon": (TicketCategory.TIRE, 3),
+    "balon yorildi": (TicketCategory.TIRE, 4),
+    "g'ildirak": (TicketCategory.TIRE, 3),
+    "teshildi": (TicketCategory.TIRE, 3),
+    # Fuel
+    "yoqilg'i": (TicketCategory.FUEL, 3),
+    "solyarka": (TicketCategory.FUEL, 3),
+    # Accident
+    "avariya": (TicketCategory.ACCIDENT, 5),
+    "to'qnashdi": (TicketCategory.ACCIDENT, 5),
+    # Electrical
+    "akkumulyator": (TicketCategory.ELECTRICAL, 3),
+    "tok yo'q": (TicketCategory.ELECTRICAL, 3),
+    # Documentation
+    "hujjat": (TicketCategory.DOCUMENTATION, 1),
+    "sug'urta": (TicketCategory.DOCUMENTATION, 1),
+    "ruxsatnoma": (TicketCategory.DOCUMENTATION, 1),
+}
+
+# Keywords written in Latin script (Uzbek) have stems that are not English words, so
+# they are matched in any text. Stems transliterated from Cyrillic ("shin" from шина,
+# "motor" from мотор) collide with English and only apply to Russian or Uzbek text.
+_MULTILINGUAL_TABLES = {"ru": TICKET_KEYWORDS_RU, "uz": TICKET_KEYWORDS_UZ}
+_LATIN_KEYWORDS = KeywordIndex(
+    {lang: {k: v for k, v in t.items() if k.isascii()} for lang, t in _MULTILINGUAL_TABLES.items()}
+)
+_MULTILINGUAL_KEYWORDS = KeywordIndex(_MULTILINGUAL_TABLES)
+
 DISMISS_PATTERNS: list[re.Pattern[str]] = [
     re.compile(r"^(ok|okay|k|kk|yes|no|yep|nope|ya|nah|sure|yea|yeah)\.?$", re.IGNORECASE),
     re.compile(r"^thanks?\.?$", re.IGNORECASE),
@@ -140,13 +240,18 @@ def _should_dismiss(text: str) -> bool:
     # Single short word dismissal (unless it's a protected keyword)
     words = text.split()
     if len(words) == 1 and len(text) < 6 and not any(kw in text.lower() for kw in _PROTECTED_SHORT_WORDS):
-        return True
+        return _match_multilingual(text)[0] is None  # "балон", "мотор"
 
     return any(p.match(text) for p in DISMISS_PATTERNS)
 
 
 def _match_keywords(text: str) -> tuple[TicketCategory | None, int]:
-    """Match text against keyword patterns. Returns (category, urgency) or (None, 0)."""
+    """Match text against keyword patterns. Returns (category, urgency) or (None, 0).
+
+    English keywords first. The Russian and Uzbek tables are consulted when those
+    miss or the text is not plain ASCII, and only for text detected as Russian or
+    Uzbek; the most urgent match wins.
+    """
     text_lower = text.lower()
     best_category: TicketCategory | None = None
     best_urgency = 0
@@ -158,9 +263,26 @@ def _match_keywords(text: str) -> tuple[TicketCategory | None, int]:
                 best_urgency = urgency
                 best_category = category
 
+    if best_category is None or not text.isascii():
+        category, urgency = _match_multilingual(text)
+        if urgency > best_urgency:
+            best_category, best_urgency = category, urgency
+
     return best_category, best_urgency
 
 
+def _match_multilingual(text: str) -> tuple[TicketCategory | None, int]:
+    """Most urgent Russian/Uzbek keyword match on the folded text, or (None, 0).
+
+    Latin-script keywords ("avariya", "balon") always count. Keywords transliterated
+    from Cyrillic count only in text detected as Russian or Uzbek: folded English
+    would otherwise hit them ("shin" from шина in "shining").
+    """
+    if detect_language(text) in ("ru", "uz"):
+        return _MULTILINGUAL_KEYWORDS.match(fold(text))
+    return _LATIN_KEYWORDS.match(fold(text))
+
+
 def classify_deterministic(message: Message) -> ClassificationResult | None:
     """Layer 1: deterministic classification. Returns None if undecided (pass to AI)."""
     # Photo/video attachments from drivers are likely ticket-worthy
@@ -245,18 +367,113 @@ def classify_deterministic(message: Message) -> ClassificationResult | None:
     return None
 
 
+# --- Urgent pre-classification ---
+
+URGENT_MIN_URGENCY = 4
+
+# Urgency >= 4 words with no TICKET_KEYWORDS entry ("stuck", "fire", ...). Alone they
+# are too common ("this playlist is fire"), so they count next to a ticket keyword or
+# a vehicle/road word ("truck is on fire"). Whole words only: "fired" is not "fire".
+_URGENT_ONLY_RE = re.compile(
+    r"\b("
+    + "|".join(
+        re.escape(k)
+        for k, u in URGENCY_KEYWORDS.items()
+        if u >= URGENT_MIN_URGENCY and k not in TICKET_KEYWORDS
+    )
+    + r")\b",
+    re.IGNORECASE,
+)
+# "stuck in traffic" names a vehicle and is still chatter: these need a ticket keyword
+_NEEDS_TICKET_KEYWORD = {"stuck"}
+_VEHICLE_CONTEXT_RE = re.compile(
+    r"\b(truck|trailer|reefer|rig|semi|tractor|cab|engine|load|highway|interstate|shoulder"
+    r"|i-?\d+)\b",
+    re.IGNORECASE,
+)
+
+
+def detect_urgent(message: Message) -> ClassificationResult | None:
+    """Cheap urgency screen run before any I/O: a ticket result for urgency >= 4 signals.
+
+    Keywords and location shares only, no local model or AI, so it is safe to
+    run on every update. Words like "fire" only count next to a ticket keyword or
+    a vehicle word, "stuck" only next to a ticket keyword. Returns None for
+    everything else, which takes the normal pipeline.
+    """
+    text = message.text.strip()
+    category, urgency = _match_keywords(text) if text else (None, 0)
+    words = [w.lower() for w in _URGENT_ONLY_RE.findall(text)]
+    if words:
+        vehicle = category is not None or _VEHICLE_CONTEXT_RE.search(text) is not None
+        for word in words:
+            if category is not None or (vehicle and word not in _NEEDS_TICKET_KEYWORD):
+                urgency = max(urgency, URGENCY_KEYWORDS[word])
+
+    if urgency >= URGENT_MIN_URGENCY:
+        return ClassificationResult(
+            is_ticket=True,
+            confidence=4,
+            category=category or TicketCategory.UNCLASSIFIED,
+            urgency=urgency,
+            layer="deterministic",
+            reason="urgent_keyword",
+        )
+    if message.has_location:
+        return classify_deterministic(message)
+    return None
+
+
 # --- Layer 2: AI Classification ---
 
 _client: openai.AsyncOpenAI | None = None
 
 
 def _get_openai_client() -> openai.AsyncOpenAI:
+    """Build the client on first use; importing openai alone takes about half a second."""
     global _client
     if _client is None:
-        _client = openai.AsyncOpenAI(api_key=settings.openai_api_key)
+        import httpx
+        import openai
+
+        from src.transport import get_async_transport
+
+        _client = openai.AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            http_client=httpx.AsyncClient(
+                transport=get_async_transport("openai"),
+                timeout=httpx.Timeout(settings.ai_timeout_seconds, connect=5.0),
+                follow_redirects=True,
+            ),
+        )
     return _client
 
 
+async def prewarm_openai() -> None:
+    """Import openai off the event loop and open a connection before the first AI call."""
+    client = await asyncio.to_thread(_get_openai_client)
+    await client.models.retrieve("gpt-4o-mini", timeout=settings.ai_timeout_seconds)
+
+
+async def _chat_completion(call: str, **kwargs: object) -> object:
+    """One GPT-4o-mini request, timed into fleetrelay_openai_seconds{call,outcome}."""
+    client = _get_openai_client()
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        with span(f"openai:{call}"):
+            response = await client.chat.completions.create(
+                model="gpt-4o-mini",
+                temperature=0.1,
+                timeout=settings.ai_timeout_seconds,
+                **kwargs,
+            )
+        outcome = "ok"
+        return response
+    finally:
+        OPENAI_SECONDS.observe(time.perf_counter() - start, call, outcome)
+
+
 CLASSIFICATION_PROMPT = """You are a support ticket classifier for a trucking/logistics fleet company.
 Drivers send messages via Telegram when they have issues with their trucks, ELD devices,
 documentation, or need dispatch help.
@@ -273,18 +490,14 @@ Respond with ONLY a JSON object, no other text:
 
 async def classify_ai(message: Message) -> ClassificationResult:
     """Layer 2: AI classification via GPT-4o-mini. Fail-open on errors."""
-    client = _get_openai_client()
-
     try:
-        response = await client.chat.completions.create(
-            model="gpt-4o-mini",
+        response = await _chat_completion(
+            "classify",
             messages=[
                 {"role": "system", "content": CLASSIFICATION_PROMPT},
                 {"role": "user", "content": message.text[:1000]},
             ],
-            temperature=0.1,
             max_tokens=100,
-            timeout=settings.ai_timeout_seconds,
         )
 
         content = response.choices[0].message.content or ""
@@ -318,11 +531,9 @@ Respond with ONLY a JSON object:
 
 async def classify_image(file_url: str) -> tuple[ImageCategory, str]:
     """Classify an image using GPT-4o-mini vision. Returns (category, description)."""
-    client = _get_openai_client()
-
     try:
-        response = await client.chat.completions.create(
-            model="gpt-4o-mini",
+        response = await _chat_completion(
+            "vision",
             messages=[
                 {"role": "system", "content": IMAGE_CLASSIFICATION_PROMPT},
                 {
@@ -332,9 +543,7 @@ async def classify_image(file_url: str) -> tuple[ImageCategory, str]:
                     ],
                 },
             ],
-            temperature=0.1,
             max_tokens=100,
-            timeout=settings.ai_timeout_seconds,
         )
 
         content = response.choices[0].message.content or ""
@@ -358,22 +567,38 @@ Given the messages below from a truck driver, extract:
 Respond with ONLY a JSON object:
 {"urgency": int, "category": str, "location": str, "summary": str}"""
 
+# Used when the location was already extracted deterministically (src/location.py).
+ENRICHMENT_PROMPT_NO_LOCATION = """You are a support ticket enrichment system for a trucking fleet.
+Given the messages below from a truck driver, extract:
+1. urgency: 1-5 (1=low, 5=emergency)
+2. category: mechanical, electrical, tire, fuel, accident, eld, documentation, other
+3. summary: one-sentence summary of the issue
+
+Respond with ONLY a JSON object:
+{"urgency": int, "category": str, "summary": str}"""
+
+# Used for a ticket whose other fields come from its incident (src/incidents.py).
+LOCATION_PROMPT = """You are a location extractor for a trucking fleet.
+Given the messages below from a truck driver, extract any location mentioned
+(city, highway, mile marker, etc.) or an empty string.
+
+Respond with ONLY a JSON object:
+{"location": str}"""
+
 
-async def enrich_ticket(messages: list[str]) -> EnrichmentResult:
+async def enrich_ticket(messages: list[str], include_location: bool = True) -> EnrichmentResult:
     """Post-creation enrichment: extract urgency, category, location, summary."""
-    client = _get_openai_client()
     combined = "\n---\n".join(messages)
+    prompt = ENRICHMENT_PROMPT if include_location else ENRICHMENT_PROMPT_NO_LOCATION
 
     try:
-        response = await client.chat.completions.create(
-            model="gpt-4o-mini",
+        response = await _chat_completion(
+            "enrich",
             messages=[
-                {"role": "system", "content": ENRICHMENT_PROMPT},
+                {"role": "system", "content": prompt},
                 {"role": "user", "content": combined[:2000]},
             ],
-            temperature=0.1,
             max_tokens=150,
-            timeout=settings.ai_timeout_seconds,
         )
 
         content = response.choices[0].message.content or ""
@@ -391,26 +616,165 @@ async def enrich_ticket(messages: list[str]) -> EnrichmentResult:
         return EnrichmentResult()
 
 
-async def classify_message(message: Message) -> ClassificationResult:
-    """Full classification pipeline: Layer 1 deterministic, then Layer 2 AI."""
-    # Try deterministic first
-    result = classify_deterministic(message)
+async def enrich_location(messages: list[str]) -> str:
+    """Location-only enrichment: the location mentioned in the messages, or ""."""
+    combined = "\n---\n".join(messages)
+
+    try:
+        response = await _chat_completion(
+            "location",
+            messages=[
+                {"role": "system", "content": LOCATION_PROMPT},
+                {"role": "user", "content": combined[:2000]},
+            ],
+            max_tokens=50,
+        )
+
+        content = response.choices[0].message.content or ""
+        return str(json.loads(content).get("location", ""))
+
+    except Exception as e:
+        logger.error("Location extraction failed: %s", e)
+        return ""
+
+
+async def classify_message(
+    message: Message, budget: AIBudget | None = None
+) -> ClassificationResult:
+    """Full classification pipeline: Layer 1 deterministic, Layer 1.5 local, Layer 2 AI.
+
+    With a ``budget`` (live traffic), a Layer-2 call is only made while the
+    driver and the chat are within their AI budget (see budget.py).
+    """
+    result = classify_offline(message)
+    if result is None:
+        result = await classify_online(message, budget)
+    return result
+
+
+def classify_offline(message: Message) -> ClassificationResult | None:
+    """Layers 1 and 1.5 only, with no API call: None if the message needs Layer 2.
+
+    Records metrics, so call it on the event loop; use classify_offline_in_thread
+    to run it on a worker thread.
+    """
+    result, elapsed = _classify_offline_timed(message)
     if result is not None:
-        return result
+        _observe(message, result, elapsed)
+    return result
 
-    # Fall through to AI
-    if message.text.strip():
-        return await classify_ai(message)
 
-    # No text and no media — dismiss
-    return ClassificationResult(
-        is_ticket=False,
-        confidence=5,
-        category=TicketCategory.UNCLASSIFIED,
-        urgency=1,
-        layer="deterministic",
-        reason="no_content",
-    )
+async def classify_offline_in_thread(message: Message) -> ClassificationResult | None:
+    """classify_offline on a worker thread, recording its metrics back on the event loop."""
+    result, elapsed = await asyncio.to_thread(_classify_offline_timed, message)
+    if result is not None:
+        _observe(message, result, elapsed)
+    return result
+
+
+def _classify_offline_timed(message: Message) -> tuple[ClassificationResult | None, float]:
+    # Records nothing: metrics.py takes no locks, so only the event loop may write to it
+    start = time.perf_counter()
+    result = classify_deterministic(message)
+    if result is None:
+        if not message.text.strip():
+            # No text and no media — dismiss
+            result = ClassificationResult(
+                is_ticket=False,
+                confidence=5,
+                category=TicketCategory.UNCLASSIFIED,
+                urgency=1,
+                layer="deterministic",
+                reason="no_content",
+            )
+        else:
+            # Confident local prediction avoids the API call entirely
+            result = classify_local(message)
+    return result, time.perf_counter() - start
+
+
+async def classify_online(
+    message: Message, budget: AIBudget | None = None
+) -> ClassificationResult:
+    """Layer 2 for a message classify_offline could not decide."""
+    start = time.perf_counter()
+    result = await _classify_ai_layer(message, budget)
+    _observe(message, result, time.perf_counter() - start)
+    return result
+
+
+def _observe(message: Message, result: ClassificationResult, elapsed: float) -> None:
+    CLASSIFICATION_SECONDS.observe(elapsed, result.layer)
+    CLASSIFICATIONS_TOTAL.inc(detect_language(message.text), result.layer)
+
+
+async def _classify_ai_layer(message: Message, budget: AIBudget | None) -> ClassificationResult:
+    if overload.level >= OverloadLevel.SKIP_AI:
+        # Shedding: no AI call; the router turns this straight into a ticket
+        SHED_TOTAL.inc("ai_skipped")
+        return ClassificationResult(
+            is_ticket=True,
+            confidence=0,
+            category=TicketCategory.UNCLASSIFIED,
+            urgency=3,
+            layer="shed",
+            reason="overload",
+        )
+
+    if budget is not None:
+        exhausted = budget.allow(message, asyncio.get_running_loop().time())
+        if exhausted == "driver":
+            # Not a ticket: the lookups before classification already appended it to
+            # any open ticket, and one driver's flood must not open new ones
+            return ClassificationResult(
+                is_ticket=False,
+                confidence=1,
+                category=TicketCategory.UNCLASSIFIED,
+                urgency=1,
+                layer="budget",
+                reason="ai_budget_driver",
+            )
+        if exhausted == "chat":
+            # A busy chat says nothing about this driver: take the cheap path instead of
+            # dropping the report. Confidence 1 is buffered, so a follow-up opens a ticket.
+            return ClassificationResult(
+                is_ticket=True,
+                confidence=1,
+                category=TicketCategory.OTHER,
+                urgency=3,
+                layer="budget",
+                reason="ai_budget_chat",
+            )
+
+    return await classify_ai(message)
+
+
+# --- Edited messages ---
+
+# An edit at least this similar to the original (difflib ratio) is a typo fix.
+EDIT_SIMILARITY_THRESHOLD = 0.9
+
+
+async def reclassify_edit(
+    message: Message, old_text: str, previous_layer: str, budget: AIBudget | None = None
+) -> ClassificationResult | None:
+    """Classify an edited message only as far as the edit could change the outcome.
+
+    Layer 1 on the new text is free, so a decided Layer-1 result is always
+    returned. If Layer 1 is undecided and the original came from the local
+    model or the AI, a small edit keeps the original outcome (returns None).
+    Everything else goes through the full pipeline; if that runs out of AI budget,
+    the original outcome stands too.
+    """
+    result = classify_deterministic(message)
+    if result is not None:
+        return result
+    if previous_layer in ("local_model", "ai"):
+        ratio = difflib.SequenceMatcher(None, old_text, message.text).ratio()
+        if ratio >= EDIT_SIMILARITY_THRESHOLD:
+            return None
+    result = await classify_message(message, budget)
+    return None if result.layer == "budget" else result
 
 
 def _fail_open_result(reason: str) -> ClassificationResult:
@@ -8,6 +8,7 @@ class Settings(BaseSettings):
     bot_token: str
     webhook_url: str = ""
     webhook_secret: str = ""
+    telegram_base_url: str = ""  # e.g. a local Bot API server; empty = api.telegram.org
 
     # OpenAI
     openai_api_key: str
@@ -16,15 +17,123 @@ class Settings(BaseSettings):
     log_level: str = "INFO"
     environment: str = "development"
 
+    # Storage backend: "supabase", or "sqlite" for single-node deployments (src/sqlite_storage.py)
+    storage_backend: str = "supabase"
+    sqlite_path: str = "fleetrelay.sqlite3"
+    sqlite_media_dir: str = "media"  # uploaded media when storage_backend is "sqlite"
+
     # Supabase
     supabase_url: str = ""
     supabase_service_key: str = ""
+    supabase_max_concurrency: int = 16  # worker threads for the synchronous client
+
+    # Warm restart (src/snapshot.py): buffer, pending albums and bursts survive a restart.
+    # Empty path disables. Telegram drops undelivered updates after 24 hours.
+    snapshot_path: str = "state_snapshot.json"
+    snapshot_max_age_seconds: float = 24 * 3600
+
+    # Outbound HTTP (src/transport.py): one pool per upstream, shared by every client of it.
+    # The Supabase pool is sized by supabase_max_concurrency.
+    http2: bool = True  # negotiated via ALPN; plain-http upstreams stay on HTTP/1.1
+    http_keepalive_seconds: float = 90.0
+    http_dns_cache_seconds: float = 300.0
+    telegram_max_connections: int = 32
+    openai_max_connections: int = 64
+
+    # Once serving, open the storage and OpenAI connections in the background
+    prewarm_clients: bool = True
 
     # Classification tuning
     buffer_timeout_seconds: int = 300  # 5 minutes
     ai_timeout_seconds: int = 10
     min_confidence_for_ticket: int = 3  # 1-5 scale
 
+    # Layer 1.5 local model (see src/local_model.py); empty path disables it
+    local_model_path: str = ""
+    local_model_threshold: float = 0.9
+    local_model_dismiss_threshold: float = 0.98
+
+    # Run Layers 1 and 1.5 on a worker thread while the driver and ticket lookups run.
+    # The AI (Layer 2) always waits for the lookups to miss.
+    speculative_classification: bool = True
+
+    # Concurrent pipeline runs; past this, updates wait and urgent ones are admitted first
+    ingest_max_concurrency: int = 32
+
+    # Load shedding (src/overload.py). Pressure is the larger of gate waiters / QUEUE_DEPTH
+    # and event loop lag / LOOP_LAG_SECONDS; levels step down after RECOVER_SECONDS of calm.
+    overload_shedding: bool = True
+    overload_queue_depth: int = 64
+    overload_loop_lag_seconds: float = 0.25
+    overload_recover_seconds: float = 30.0
+    overload_audit_flush_seconds: float = 1.0  # audit batch interval at level 2 and above
+
+    # Layer-2 budgets (src/budget.py): token buckets per driver and per chat; a rate of 0
+    # removes that limit. Overrides scale both for one connection, keyed by group chat_id or
+    # business_connection_id, e.g. {"-1001234567890": 3, "bc_abc": 0.5}; 0 sends none to AI.
+    ai_budget_driver_per_hour: float = 60.0
+    ai_budget_driver_burst: int = 10
+    ai_budget_chat_per_hour: float = 300.0
+    ai_budget_chat_burst: int = 40
+    ai_budget_overrides: dict[str, float] = {}
+
+    # Incident clustering (src/incidents.py): near-duplicate tickets from one connection
+    # within the window share one enrichment call. Similarity is estimated Jaccard (0-1).
+    incident_clustering: bool = True
+    incident_window_seconds: float = 900.0
+    incident_similarity: float = 0.6
+
+    # Album coalescing: quiet period after the last update of a media group
+    media_group_window_seconds: float = 1.5
+
+    # Text-burst coalescing: a driver's consecutive text messages in one chat share a
+    # pipeline run. The quiet period adapts to the driver's typing pace between these
+    # bounds; 0 disables. A burst is cut at BURST_MAX_SECONDS or BURST_MAX_MESSAGES.
+    burst_quiet_seconds: float = 2.0
+    burst_max_quiet_seconds: float = 6.0
+    burst_max_seconds: float = 15.0
+    burst_max_messages: int = 10
+
+    # Image classification cache
+    image_cache_path: str = "image_cache.sqlite3"
+    image_cache_max_entries: int = 5000
+    image_hash_max_distance: int = 6  # Hamming distance on 64-bit dHash
+    image_hash_workers: int = 2
+    image_min_side_px: int = 320
+
+    # Media stage (downloads, vision calls, Supabase Storage uploads)
+    media_bucket: str = "ticket-media"
+    media_max_concurrent_downloads: int = 8
+    media_max_concurrent_vision: int = 4
+    media_max_download_bytes: int = 20 * 1024 * 1024  # Bot API getFile limit
+    # /media links stored on ticket_messages are signed with this key and expire
+    # after media_url_ttl_seconds; empty: /media needs the API token
+    media_signing_key: str = ""
+    media_url_ttl_seconds: int = 30 * 86400
+
+    # Offline reverse geocoding (see src/location.py)
+    geo_index_path: str = ""
+    geo_city_max_km: float = 50.0
+    geo_mile_marker_max_km: float = 3.0
+
+    # Outbound operator replies (see src/outbound.py). Telegram allows ~30 msg/s
+    # overall, ~20 msg/min per group and about 1 msg/s per private chat.
+    api_token: str = ""  # Bearer token for /api/*; empty disables those endpoints
+    outbound_global_per_second: float = 25.0
+    outbound_group_per_minute: float = 20.0
+    outbound_private_per_second: float = 1.0
+    outbound_max_attempts: int = 3
+    outbound_max_in_flight: int = 8
+    outbound_flush_seconds: float = 1.0
+
+    # /health: database counts are refreshed in the background at this interval
+    health_refresh_seconds: float = 30.0
+
+    # Diagnostics: slow-update span logging and the /debug/profile endpoint
+    slow_update_threshold_seconds: float = 5.0
+    trace_max_spans: int = 500  # per update; later spans are counted but not kept
+    debug_token: str = ""  # X-Debug-Token for /debug/*; empty disables those endpoints
+
     model_config = {"env_file": ".env", "env_file_encoding": "utf-8"}
 
 
@@ -0,0 +1,362 @@
+"""Incremental columnar export of raw_messages, tickets and ticket_messages.
+
+Analytics should read these files, not the live tables the bot writes to::
+
+    python -m src.export -o exports/                   # Parquet, all three tables
+    python -m src.export -o exports/ --format arrow    # Arrow IPC instead
+    python -m src.export -o exports/ --table tickets
+
+Layout (Hive-style partitions, readable by DuckDB, Polars, pandas, Spark)::
+
+    exports/
+      _checkpoint.json
+      raw_messages/date=2025-03-01/part-20250302T010000-0000.parquet
+      tickets/date=2025-03-01/part-....parquet
+      ticket_messages/date=2025-03-01/part-....parquet
+
+Each table is read with keyset pagination (SupabaseStorage.iter_rows_keyset),
+starting from the (key, id) high-water mark in _checkpoint.json. Only rows
+older than ``--settle-minutes`` are exported. That lag covers transactions
+that commit after a later created_at has already been exported, and the
+media and delivery updates that land just after a message is inserted.
+Rows are buffered per day up to ``--row-group-size`` and files are written
+under a temporary name, then renamed. The checkpoint advances only after a
+file is complete, so an interrupted run resumes where the last complete
+file ended.
+
+Keys and what the files mean:
+
+- raw_messages, ticket_messages: keyed on created_at and written once. Later
+  in-place changes (edits, media URLs, delivery status after the settle
+  window) are not re-exported.
+- tickets: keyed on updated_at. Every change after the last run is exported
+  again into the day it changed, so readers keep the latest ``updated_at``
+  per ``id``.
+
+PyArrow is an optional dependency (the "export" extra).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from src.storage import storage
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None  # type: ignore[assignment]
+    pq = None  # type: ignore[assignment]
+
+CHECKPOINT_FILE = "_checkpoint.json"
+
+# (column, arrow type name) per table, in PRD-08 column order.
+_TABLES: dict[str, tuple[str, list[tuple[str, str]]]] = {
+    "raw_messages": (
+        "created_at",
+        [
+            ("id", "string"),
+            ("telegram_message_id", "int64"),
+            ("telegram_user_id", "int64"),
+            ("chat_id", "int64"),
+            ("chat_type", "string"),
+            ("content_text", "string"),
+            ("content_type", "string"),
+            ("has_media", "bool_"),
+            ("classification_result", "string"),
+            ("classification_source", "string"),
+            ("ai_raw_response", "json"),
+            ("ticket_id", "string"),
+            ("created_at", "timestamp"),
+        ],
+    ),
+    "tickets": (
+        "updated_at",
+        [
+            ("id", "string"),
+            ("display_id", "string"),
+            ("driver_id", "string"),
+            ("source_type", "string"),
+            ("source_chat_id", "int64"),
+            ("source_name", "string"),
+            ("business_connection_id", "string"),
+            ("status", "string"),
+            ("priority", "string"),
+            ("is_urgent", "bool_"),
+            ("assigned_operator_id", "string"),
+            ("score_category_id", "string"),
+            ("ai_summary", "string"),
+            ("ai_category", "string"),
+            ("ai_urgency", "int16"),
+            ("ai_location", "string"),
+            ("claimed_at", "timestamp"),
+            ("resolved_at", "timestamp"),
+            ("dismissed_at", "timestamp"),
+            ("created_at", "timestamp"),
+            ("updated_at", "timestamp"),
+        ],
+    ),
+    "ticket_messages": (
+        "created_at",
+        [
+            ("id", "string"),
+            ("ticket_id", "string"),
+            ("direction", "string"),
+            ("sender_type", "string"),
+            ("sender_name", "string"),
+            ("sender_user_id", "string"),
+            ("telegram_message_id", "int64"),
+            ("content_text", "string"),
+            ("content_type", "string"),
+            ("media_url", "string"),
+            ("media_thumbnail_url", "string"),
+            ("ai_media_description", "string"),
+            ("is_internal_note", "bool_"),
+            ("delivery_status", "string"),
+            ("created_at", "timestamp"),
+        ],
+    ),
+}
+
+
+def _arrow_type(name: str) -> pa.DataType:
+    if name == "timestamp":
+        return pa.timestamp("us", tz="UTC")
+    if name == "json":
+        return pa.string()
+    return getattr(pa, name)()
+
+
+def _schema(table: str) -> pa.Schema:
+    return pa.schema([(column, _arrow_type(kind)) for column, kind in _TABLES[table][1]])
+
+
+def _parse_timestamp(value: str | None) -> datetime | None:
+    return datetime.fromisoformat(value) if value else None
+
+
+def _to_columns(table: str, rows: list[dict]) -> dict[str, list]:
+    columns: dict[str, list] = {}
+    for column, kind in _TABLES[table][1]:
+        values = [r.get(column) for r in rows]
+        if kind == "timestamp":
+            values = [_parse_timestamp(v) for v in values]
+        elif kind == "json":
+            values = [None if v is None else json.dumps(v, ensure_ascii=False) for v in values]
+        columns[column] = values
+    return columns
+
+
+# --- Checkpoint ---
+
+
+def load_checkpoint(out_dir: str) -> dict[str, dict]:
+    path = os.path.join(out_dir, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_checkpoint(out_dir: str, checkpoint: dict[str, dict]) -> None:
+    path = os.path.join(out_dir, CHECKPOINT_FILE)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+# --- Partition writer ---
+
+
+class _PartitionWriter:
+    """One open file at a time: rows arrive in key order, so days only move forward."""
+
+    def __init__(self, out_dir: str, table: str, fmt: str, run_id: str, row_group_size: int):
+        self._base = os.path.join(out_dir, table)
+        self._table = table
+        self._schema = _schema(table)
+        self._format = fmt
+        self._run_id = run_id
+        self._row_group_size = row_group_size
+        self._day = ""
+        self._rows: list[dict] = []
+        self._writer: object | None = None
+        self._path = ""
+        self._seq = 0
+        self.rows_written = 0
+        self.files: list[str] = []
+
+    def add(self, day: str, row: dict) -> str | None:
+        """Buffer a row. Returns the finished file's path when a day boundary closes one."""
+        finished = None
+        if day != self._day:
+            finished = self.close()
+            self._day = day
+        self._rows.append(row)
+        if len(self._rows) >= self._row_group_size:
+            self._flush()
+        return finished
+
+    def _open(self) -> None:
+        directory = os.path.join(self._base, f"date={self._day}")
+        os.makedirs(directory, exist_ok=True)
+        suffix = "parquet" if self._format == "parquet" else "arrow"
+        self._path = os.path.join(directory, f"part-{self._run_id}-{self._seq:04d}.{suffix}")
+        self._seq += 1
+        tmp = f"{self._path}.tmp"
+        if self._format == "parquet":
+            self._writer = pq.ParquetWriter(tmp, self._schema, compression="zstd")
+        else:
+            self._writer = pa.ipc.new_file(tmp, self._schema)
+
+    def _flush(self) -> None:
+        if not self._rows:
+            return
+        if self._writer is None:
+            self._open()
+        batch = pa.RecordBatch.from_pydict(
+            _to_columns(self._table, self._rows), schema=self._schema
+        )
+        self._writer.write_batch(batch)
+        self.rows_written += len(self._rows)
+        self._rows = []
+
+    def close(self) -> str | None:
+        self._flush()
+        if self._writer is None:
+            return None
+        self._writer.close()
+        self._writer = None
+        os.replace(f"{self._path}.tmp", self._path)
+        self.files.append(self._path)
+        return self._path
+
+    def abort(self) -> None:
+        """Drop the open file; the checkpoint never covered it."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            os.remove(f"{self._path}.tmp")
+
+
+def _remove_partial_files(out_dir: str) -> None:
+    for root, _, files in os.walk(out_dir):
+        for name in files:
+            if name.endswith(".tmp"):
+                os.remove(os.path.join(root, name))
+
+
+# --- Export ---
+
+
+async def export_table(
+    table: str,
+    out_dir: str,
+    checkpoint: dict[str, dict],
+    fmt: str = "parquet",
+    page_size: int = 5000,
+    row_group_size: int = 50_000,
+    settle: timedelta = timedelta(minutes=10),
+) -> tuple[int, list[str]]:
+    """Export rows past the table's high-water mark. Returns (rows, files written)."""
+    key_column, columns = _TABLES[table]
+    mark = checkpoint.get(table)
+    after = (mark["key"], mark["id"]) if mark else None
+    cutoff = datetime.now(timezone.utc) - settle
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    writer = _PartitionWriter(out_dir, table, fmt, run_id, row_group_size)
+
+    last: tuple[str, str] | None = None  # (key, id) of the newest buffered row
+    started = time.perf_counter()
+    scanned = 0
+
+    def commit(upto: tuple[str, str]) -> None:
+        checkpoint[table] = {"key": upto[0], "id": upto[1]}
+        save_checkpoint(out_dir, checkpoint)
+
+    try:
+        async for page in storage.iter_rows_keyset(
+            table,
+            columns=", ".join(c for c, _ in columns),
+            page_size=page_size,
+            after=after,
+            key_column=key_column,
+        ):
+            done = False
+            for row in page:
+                key = _parse_timestamp(row[key_column])
+                if key is None or key > cutoff:
+                    done = True
+                    break
+                previous = last
+                if writer.add(key.date().isoformat(), row) is not None and previous:
+                    commit(previous)  # every row up to the previous one is on disk
+                last = (row[key_column], row["id"])
+            scanned += len(page)
+            elapsed = time.perf_counter() - started
+            print(
+                f"{table}: {scanned} rows read, {writer.rows_written} written,"
+                f" {scanned / elapsed if elapsed else 0:,.0f} rows/s",
+                file=sys.stderr,
+            )
+            if done:
+                break
+    except BaseException:
+        writer.abort()
+        raise
+    if writer.close() is not None and last:
+        commit(last)
+    return writer.rows_written, writer.files
+
+
+async def export(args: argparse.Namespace) -> None:
+    os.makedirs(args.output, exist_ok=True)
+    _remove_partial_files(args.output)
+    checkpoint = load_checkpoint(args.output)
+    for table in args.table or list(_TABLES):
+        start = time.perf_counter()
+        rows, files = await export_table(
+            table,
+            args.output,
+            checkpoint,
+            fmt=args.format,
+            page_size=args.page_size,
+            row_group_size=args.row_group_size,
+            settle=timedelta(minutes=args.settle_minutes),
+        )
+        mark = checkpoint.get(table)
+        print(
+            f"{table}: {rows} rows in {len(files)} files, {time.perf_counter() - start:.1f}s"
+            f" (high-water mark {mark['key'] if mark else '-'})"
+        )
+
+
+# --- CLI ---
+
+
+def main() -> None:
+    if pa is None:
+        raise SystemExit("PyArrow is required: pip install -e '.[export]'")
+    parser = argparse.ArgumentParser(description="Incremental columnar export for analytics")
+    parser.add_argument("-o", "--output", default="exports")
+    parser.add_argument("--format", choices=("parquet", "arrow"), default="parquet")
+    parser.add_argument("--table", action="append", choices=list(_TABLES))
+    parser.add_argument("--page-size", type=int, default=5000)
+    parser.add_argument("--row-group-size", type=int, default=50_000)
+    parser.add_argument("--settle-minutes", type=float, default=10.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(export(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Cached health snapshot for /health, /health/live and /health/ready.
+
+Load balancers and uptime checks poll health every few seconds, so nothing on
+those paths touches the database. A background task refreshes the estimated
+table counts every health_refresh_seconds and records whether Supabase
+answered. In-memory state is read on each request because it is free: the
+message buffer, pending albums, background task queues, image cache hit rate
+and event loop lag.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+from src.config import settings
+from src.storage import storage
+
+logger = logging.getLogger(__name__)
+
+
+class HealthMonitor:
+    def __init__(self) -> None:
+        self.started_at = time.monotonic()
+        self.ready = False  # set by main once the bot application is running
+        self.counts: dict[str, int] = {}
+        self.counts_refreshed_at: float | None = None
+        self.storage_ok = False
+        self.storage_error = ""
+
+    async def refresh(self) -> None:
+        try:
+            stats = await storage.stats()
+        except Exception as e:
+            self.storage_ok = False
+            self.storage_error = str(e)[:200]
+            logger.warning("Health refresh failed: %s", e)
+            return
+        self.counts = {"drivers": stats["drivers"], "tickets": stats["tickets"]}
+        self.counts_refreshed_at = time.monotonic()
+        self.storage_ok = True
+        self.storage_error = ""
+
+    async def run(self) -> None:
+        while True:
+            await self.refresh()
+            await asyncio.sleep(settings.health_refresh_seconds)
+
+    def counts_age(self) -> float | None:
+        if self.counts_refreshed_at is None:
+            return None
+        return time.monotonic() - self.counts_refreshed_at
+
+    def readiness(self) -> tuple[bool, dict]:
+        """Ready = bot running and Supabase answered within the last few refreshes."""
+        age = self.counts_age()
+        fresh = age is not None and age <= settings.health_refresh_seconds * 3
+        checks = {
+            "bot": self.ready,
+            "storage": self.storage_ok and fresh,
+        }
+        detail: dict = {"checks": checks}
+        if self.storage_error:
+            detail["storage_error"] = self.storage_error
+        return all(checks.values()), detail
+
+    def snapshot(self, runtime: dict) -> dict:
+        age = self.counts_age()
+        return {
+            "uptime_seconds": round(time.monotonic() - self.started_at, 1),
+            "stats": {
+                **self.counts,
+                "buffered": storage.buffered_count(),
+                "counts_are_estimates": True,
+                "counts_age_seconds": round(age, 1) if age is not None else None,
+            },
+            **runtime,
+        }
+
+
+health_monitor = HealthMonitor()
@@ -0,0 +1,348 @@
+"""Perceptual-hash cache in front of GPT-4o-mini image classification.
+
+Drivers re-send the same photo and forward the same BOL/permit scans into several
+groups. Before paying for a vision call we check, in order:
+
+1. Exact match on Telegram's file_unique_id (no download needed at all).
+2. Near-duplicate match on a 64-bit difference hash (dHash) of the image, compared
+   by Hamming distance.
+
+Results are kept in a bounded, persistent SQLite cache (least-recently-used rows are
+evicted). Hashing runs in a process pool and SQLite work on a worker thread, so
+neither image decoding nor a commit blocks the event loop. Pillow is optional:
+without it only exact file_unique_id matches are used.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import logging
+import sqlite3
+import threading
+import time
+from collections.abc import Awaitable, Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+
+from src.classifier import classify_image
+from src.config import settings
+from src.metrics import IMAGE_CACHE_BYTES_AVOIDED_TOTAL, IMAGE_CACHE_LOOKUPS_TOTAL
+from src.models import ImageCategory
+
+logger = logging.getLogger(__name__)
+
+# --- Hashing (runs in worker processes) ---
+
+
+def compute_dhash(data: bytes) -> int | None:
+    """64-bit difference hash of an image, or None if it can't be decoded."""
+    try:
+        from io import BytesIO
+
+        from PIL import Image
+    except ImportError:
+        return None
+
+    try:
+        with Image.open(BytesIO(data)) as img:
+            pixels = list(img.convert("L").resize((9, 8), Image.Resampling.LANCZOS).getdata())
+    except Exception:
+        return None
+
+    value = 0
+    for row in range(8):
+        offset = row * 9
+        for col in range(8):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def _get_hash_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.image_hash_workers)
+    return _pool
+
+
+async def hash_image(data: bytes) -> int | None:
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_get_hash_pool(), compute_dhash, data)
+    except Exception as e:
+        logger.warning("Image hashing failed: %s", e)
+        return None
+
+
+# --- Photo size selection ---
+
+
+def pick_photo_size(sizes: Sequence[dict]) -> dict:
+    """Smallest size whose short side still meets image_min_side_px.
+
+    GPT-4o-mini is called with detail="low" (512px), so larger sizes only cost
+    download time. Falls back to the largest available size. Sizes are the
+    file-info dicts stored in Message.raw_data.
+    """
+    ordered = sorted(sizes, key=lambda s: s["width"] * s["height"])
+    for size in ordered:
+        if min(size["width"], size["height"]) >= settings.image_min_side_px:
+            return size
+    return ordered[-1]
+
+
+# --- Persistent cache ---
+
+
+def _hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class ImageCache:
+    """Bounded SQLite cache of (file_unique_id, dHash) -> (category, description).
+
+    SQLite reads, writes and the near-duplicate scan run on a worker thread, one at
+    a time under a lock; hit/miss counters are updated back on the event loop.
+    """
+
+    def __init__(self, path: str, max_entries: int, max_distance: int) -> None:
+        self._max_entries = max_entries
+        self._max_distance = max_distance
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS image_cache (
+                file_unique_id TEXT PRIMARY KEY,
+                phash INTEGER,
+                category TEXT NOT NULL,
+                description TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL DEFAULT 0,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_image_cache_last_used ON image_cache(last_used)"
+        )
+        self._db.commit()
+
+        # Hashes are kept in memory for the near-duplicate scan; the table is bounded
+        # so a linear popcount scan stays well under a millisecond.
+        self._hashes: dict[str, int] = {
+            row[0]: row[1]
+            for row in self._db.execute(
+                "SELECT file_unique_id, phash FROM image_cache WHERE phash IS NOT NULL"
+            )
+        }
+        self._entries = self._count()
+
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.vision_calls_avoided = 0
+        self.download_bytes_avoided = 0
+        self.vision_bytes_avoided = 0
+
+    # --- Worker thread (hold self._lock) ---
+
+    def _count(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM image_cache").fetchone()[0]
+
+    def _touch(self, file_unique_id: str) -> None:
+        self._db.execute(
+            "UPDATE image_cache SET last_used = ? WHERE file_unique_id = ?",
+            (time.time(), file_unique_id),
+        )
+        self._db.commit()
+
+    def _row(self, file_unique_id: str) -> tuple[ImageCategory, str, int] | None:
+        row = self._db.execute(
+            "SELECT category, description, size_bytes FROM image_cache"
+            " WHERE file_unique_id = ?",
+            (file_unique_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        return ImageCategory(row[0]), row[1], row[2]
+
+    def _lookup_exact(self, file_unique_id: str) -> tuple[ImageCategory, str, int] | None:
+        with self._lock:
+            row = self._row(file_unique_id)
+            if row is not None:
+                self._touch(file_unique_id)
+            return row
+
+    def _lookup_near(self, phash: int) -> tuple[ImageCategory, str] | None:
+        with self._lock:
+            best_id: str | None = None
+            best_distance = self._max_distance + 1
+            for file_unique_id, candidate in self._hashes.items():
+                distance = _hamming(phash, candidate)
+                if distance < best_distance:
+                    best_id, best_distance = file_unique_id, distance
+                    if distance == 0:
+                        break
+            if best_id is None:
+                return None
+            row = self._row(best_id)
+            if row is None:
+                self._hashes.pop(best_id, None)
+                return None
+            self._touch(best_id)
+            return row[0], row[1]
+
+    def _store(
+        self,
+        file_unique_id: str,
+        phash: int | None,
+        category: ImageCategory,
+        description: str,
+        size_bytes: int,
+    ) -> None:
+        with self._lock:
+            self._db.execute(
+                """INSERT OR REPLACE INTO image_cache
+                   (file_unique_id, phash, category, description, size_bytes, last_used)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (file_unique_id, phash, category.value, description, size_bytes, time.time()),
+            )
+            if phash is not None:
+                self._hashes[file_unique_id] = phash
+
+            overflow = self._count() - self._max_entries
+            if overflow > 0:
+                evicted = self._db.execute(
+                    "SELECT file_unique_id FROM image_cache ORDER BY last_used LIMIT ?",
+                    (overflow,),
+                ).fetchall()
+                self._db.executemany("DELETE FROM image_cache WHERE file_unique_id = ?", evicted)
+                for (evicted_id,) in evicted:
+                    self._hashes.pop(evicted_id, None)
+            self._db.commit()
+            self._entries = self._count()
+
+    # --- Event loop ---
+
+    async def get_exact(
+        self, file_unique_id: str, size_bytes: int = 0
+    ) -> tuple[ImageCategory, str] | None:
+        row = await asyncio.to_thread(self._lookup_exact, file_unique_id)
+        if row is None:
+            return None
+        self.exact_hits += 1
+        size_bytes = size_bytes or row[2]
+        self._avoided("exact_hit", size_bytes, size_bytes)
+        return row[0], row[1]
+
+    async def get_near(self, phash: int, size_bytes: int) -> tuple[ImageCategory, str] | None:
+        cached = await asyncio.to_thread(self._lookup_near, phash)
+        if cached is None:
+            return None
+        self.near_hits += 1
+        self._avoided("near_hit", 0, size_bytes)
+        return cached
+
+    def record_miss(self) -> None:
+        self.misses += 1
+        IMAGE_CACHE_LOOKUPS_TOTAL.inc("miss")
+
+    def _avoided(self, result: str, download_bytes: int, vision_bytes: int) -> None:
+        self.vision_calls_avoided += 1
+        self.download_bytes_avoided += download_bytes
+        self.vision_bytes_avoided += vision_bytes
+        IMAGE_CACHE_LOOKUPS_TOTAL.inc(result)
+        IMAGE_CACHE_BYTES_AVOIDED_TOTAL.inc("download", amount=download_bytes)
+        IMAGE_CACHE_BYTES_AVOIDED_TOTAL.inc("vision", amount=vision_bytes)
+
+    async def put(
+        self,
+        file_unique_id: str,
+        phash: int | None,
+        category: ImageCategory,
+        description: str,
+        size_bytes: int,
+    ) -> None:
+        await asyncio.to_thread(
+            self._store, file_unique_id, phash, category, description, size_bytes
+        )
+
+    def __len__(self) -> int:
+        return self._entries
+
+    def stats(self) -> dict[str, int | float]:
+        lookups = self.exact_hits + self.near_hits + self.misses
+        hits = self.exact_hits + self.near_hits
+        return {
+            "entries": len(self),
+            "exact_hits": self.exact_hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "vision_calls_avoided": self.vision_calls_avoided,
+            "download_bytes_avoided": self.download_bytes_avoided,
+            "vision_bytes_avoided": self.vision_bytes_avoided,
+        }
+
+
+_cache: ImageCache | None = None
+
+
+def get_image_cache() -> ImageCache:
+    global _cache
+    if _cache is None:
+        _cache = ImageCache(
+            settings.image_cache_path,
+            max_entries=settings.image_cache_max_entries,
+            max_distance=settings.image_hash_max_distance,
+        )
+    return _cache
+
+
+# --- Cached classification ---
+
+_vision_semaphore: asyncio.Semaphore | None = None
+
+
+def _get_vision_semaphore() -> asyncio.Semaphore:
+    global _vision_semaphore
+    if _vision_semaphore is None:
+        _vision_semaphore = asyncio.Semaphore(settings.media_max_concurrent_vision)
+    return _vision_semaphore
+
+
+async def classify_image_cached(
+    file_unique_id: str,
+    file_size: int,
+    download: Callable[[], Awaitable[bytes]],
+) -> tuple[ImageCategory, str]:
+    """Classify an image, reusing cached results for exact and near duplicates.
+
+    ``download`` is only awaited on an exact-match miss.
+    """
+    cache = get_image_cache()
+
+    cached = await cache.get_exact(file_unique_id, file_size)
+    if cached is not None:
+        logger.debug("Image cache exact hit for %s", file_unique_id)
+        return cached
+
+    data = await download()
+
+    phash = await hash_image(data)
+    if phash is not None:
+        cached = await cache.get_near(phash, len(data))
+        if cached is not None:
+            logger.debug("Image cache near-duplicate hit for %s", file_unique_id)
+            await cache.put(file_unique_id, phash, cached[0], cached[1], len(data))
+            return cached
+
+    cache.record_miss()
+    data_url = "data:image/jpeg;base64," + base64.b64encode(data).decode("ascii")
+    async with _get_vision_semaphore():
+        category, description = await classify_image(data_url)
+
+    # classify_image fails open to (IRRELEVANT, ""); don't cache failures.
+    if description:
+        await cache.put(file_unique_id, phash, category, description, len(data))
+    return category, description
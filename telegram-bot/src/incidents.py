@@ -0,0 +1,179 @@
+"""Cross-driver incident clustering: near-duplicate reports across drivers.
+
+When the ELD provider goes down or a storm closes a highway, many drivers in one
+group report the same thing within minutes, and each report becomes its own
+ticket. The index here groups those tickets into incidents, so the first
+report's urgency and category can be reused for the rest (bot.py). Its summary
+describes one driver's report and stays on the Incident.
+
+Text is folded (normalize.py) and cut into character 4-grams. A MinHash
+signature of _NUM_HASHES values estimates the Jaccard similarity of two
+reports' shingle sets. Signatures are split into _BANDS bands (LSH); a report
+is compared only with earlier reports that share at least one band, which keeps
+the lookup constant-time per report. A candidate at or above
+INCIDENT_SIMILARITY joins that incident.
+
+Reports are compared only within one connection (group chat_id or
+business_connection_id). An incident closes INCIDENT_WINDOW_SECONDS after its
+latest report. Everything is in memory: a restart starts with no incidents.
+"""
+
+from __future__ import annotations
+
+import itertools
+import zlib
+
+from src.config import settings
+from src.models import EnrichmentResult
+from src.normalize import folded_words
+
+_SHINGLE = 4
+_NUM_HASHES = 64
+_BANDS = 16  # 4 rows per band: pairs above ~0.5 similarity collide in some band
+_ROWS = _NUM_HASHES // _BANDS
+_MIN_CHARS = 12  # shorter reports ("help", "ok thx") are too generic to cluster
+_MAX_CHARS = 500
+_MAX_INDEXED = 20  # reports per incident kept for matching; later ones only join
+_SWEEP_EVERY = 256  # reports between sweeps of connections with no live incident
+
+# One-permutation hashing: each shingle is hashed once, the top 6 bits pick one of
+# the 64 bins and the rest is the value; a bin keeps its minimum. Empty bins borrow
+# from the next filled bin (rotation densification), offset by the distance.
+_MIX = 0x9E3779B97F4A7C15  # 64-bit golden-ratio multiplier spreads crc32 over all bits
+_BIN_SHIFT = 58
+_VALUE_MASK = (1 << _BIN_SHIFT) - 1
+_EMPTY = 1 << _BIN_SHIFT
+
+Signature = tuple[int, ...]
+
+
+def signature(text: str) -> Signature | None:
+    """MinHash signature of ``text``, or None if it is too short to compare."""
+    normalized = " ".join(folded_words(text[:_MAX_CHARS]))
+    if len(normalized) < _MIN_CHARS:
+        return None
+    bins = [_EMPTY] * _NUM_HASHES
+    encoded = normalized.encode()
+    for i in range(len(encoded) - _SHINGLE + 1):
+        h = (zlib.crc32(encoded[i : i + _SHINGLE]) * _MIX) & 0xFFFFFFFFFFFFFFFF
+        b = h >> _BIN_SHIFT
+        if (v := h & _VALUE_MASK) < bins[b]:
+            bins[b] = v
+    if _EMPTY in bins:
+        original = bins[:]
+        for b in range(_NUM_HASHES):
+            if original[b] == _EMPTY:
+                distance = 1
+                while original[(b + distance) % _NUM_HASHES] == _EMPTY:
+                    distance += 1
+                bins[b] = original[(b + distance) % _NUM_HASHES] + distance * _EMPTY
+    return tuple(bins)
+
+
+def similarity(a: Signature, b: Signature) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / _NUM_HASHES
+
+
+class Incident:
+    """Tickets reporting the same event, and the enrichment they share."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, now: float) -> None:
+        self.id = next(self._ids)
+        self.started = now
+        self.last_seen = now
+        self.ticket_ids: list[str] = []
+        self.enrichment: EnrichmentResult | None = None
+        self.enrichment_failed = False
+        # Tickets that joined while the first report was still being enriched:
+        # (ticket_id, texts, include_location)
+        self.waiting: list[tuple[str, list[str], bool]] = []
+
+
+class _Scope:
+    __slots__ = ("incidents", "bands")
+
+    def __init__(self) -> None:
+        self.incidents: list[Incident] = []
+        self.bands: dict[tuple[int, Signature], list[tuple[Incident, Signature]]] = {}
+
+
+class IncidentIndex:
+    def __init__(self, window_seconds: float, threshold: float) -> None:
+        self._window = window_seconds
+        self._threshold = threshold
+        self._scopes: dict[str, _Scope] = {}
+        self._observed = 0
+
+    def observe(
+        self, scope_key: str, text: str, ticket_id: str, now: float
+    ) -> tuple[Incident, bool] | None:
+        """File a new ticket's text under an incident: (incident, is_new), or None if too short."""
+        sig = signature(text)
+        if sig is None:
+            return None
+        self._observed += 1
+        if self._observed % _SWEEP_EVERY == 0:
+            self._sweep(now)
+        scope = self._scopes.get(scope_key)
+        if scope is None:
+            scope = self._scopes[scope_key] = _Scope()
+        else:
+            self._expire(scope, now)
+
+        incident, is_new = self._best_match(scope, sig), False
+        if incident is None:
+            incident, is_new = Incident(now), True
+            scope.incidents.append(incident)
+        incident.ticket_ids.append(ticket_id)
+        incident.last_seen = now
+        if len(incident.ticket_ids) <= _MAX_INDEXED:
+            for band in range(_BANDS):
+                key = (band, sig[band * _ROWS : (band + 1) * _ROWS])
+                scope.bands.setdefault(key, []).append((incident, sig))
+        return incident, is_new
+
+    def _best_match(self, scope: _Scope, sig: Signature) -> Incident | None:
+        best, best_score = None, self._threshold
+        seen: set[int] = set()
+        for band in range(_BANDS):
+            entries = scope.bands.get((band, sig[band * _ROWS : (band + 1) * _ROWS]), ())
+            for incident, other in entries:
+                if id(other) in seen:
+                    continue
+                seen.add(id(other))
+                score = similarity(sig, other)
+                if score >= best_score:
+                    best, best_score = incident, score
+        return best
+
+    def _expire(self, scope: _Scope, now: float) -> None:
+        live = [i for i in scope.incidents if now - i.last_seen < self._window]
+        if len(live) == len(scope.incidents):
+            return
+        scope.incidents = live
+        alive = {id(i) for i in live}
+        scope.bands = {
+            key: kept
+            for key, entries in scope.bands.items()
+            if (kept := [e for e in entries if id(e[0]) in alive])
+        }
+
+    def _sweep(self, now: float) -> None:
+        for key, scope in list(self._scopes.items()):
+            self._expire(scope, now)
+            if not scope.incidents:
+                del self._scopes[key]
+
+    def stats(self) -> dict:
+        incidents = [i for scope in self._scopes.values() for i in scope.incidents]
+        return {
+            "open": len(incidents),
+            "clustered": sum(len(i.ticket_ids) > 1 for i in incidents),
+            "largest": max((len(i.ticket_ids) for i in incidents), default=0),
+        }
+
+
+incidents = IncidentIndex(settings.incident_window_seconds, settings.incident_similarity)
@@ -0,0 +1,389 @@
+"""Layer 1.5: offline-trained local text classifier (hashed n-grams + Naive Bayes).
+
+Sits between the deterministic rules and GPT-4o-mini. Messages Layer 1 can't decide
+are scored locally in microseconds; only predictions above local_model_threshold
+are answered here, everything else still goes to the API.
+
+Features are word unigrams, word bigrams and in-word character trigrams (the
+trigrams carry Uzbek/Russian morphology), hashed into a fixed-size vector with
+CRC32 so training and serving agree across processes. The model is a multinomial
+Naive Bayes over "not_ticket" plus each ticket category, stored as an .npz file.
+
+Training data is raw_messages history: "created" rows are positives (labelled with
+the linked ticket's enriched ai_category/ai_urgency), "dismissed" rows negatives.
+Only dismissals Layer 1 or Layer 2 decided count: rows dismissed by the AI budget,
+load shedding or this model itself say nothing about the text.
+The newest --holdout percent of rows is held out by created_at, never by random
+sampling: a random split leaks a driver's repeats of one message across both sides.
+The model records the created_at of its newest training row, and ``report`` scores
+only rows after it::
+
+    python -m src.local_model train -o local_model.npz
+    python -m src.local_model report local_model.npz
+
+NumPy is an optional dependency (the "ml" extra); without it Layer 1.5 is skipped.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import re
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+
+from src.config import settings
+from src.models import ClassificationResult, Message, TicketCategory
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+NOT_TICKET = "not_ticket"
+_CATEGORY_LABELS = {c.value for c in TicketCategory} - {TicketCategory.UNCLASSIFIED.value}
+# classification_source values whose "dismissed" verdict was about the message text
+_NEGATIVE_SOURCES = ("deterministic", "ai")
+DEFAULT_DIM = 1 << 18
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# --- Features ---
+
+
+def extract_features(text: str) -> list[str]:
+    words = _WORD_RE.findall(text.lower())
+    features = [f"w:{w}" for w in words]
+    features.extend(f"b:{a} {b}" for a, b in zip(words, words[1:]))
+    for w in words:
+        padded = f"^{w}$"
+        features.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return features
+
+
+def hash_features(text: str, dim: int) -> list[int]:
+    return [zlib.crc32(f.encode("utf-8")) % dim for f in extract_features(text)]
+
+
+# --- Model ---
+
+
+@dataclass
+class LocalModel:
+    classes: list[str]
+    log_prior: np.ndarray  # (n_classes,)
+    feature_log_prob: np.ndarray  # (n_classes, dim), float32
+    class_urgency: np.ndarray  # (n_classes,), median ai_urgency per class
+    dim: int
+    trained_until: str = ""  # created_at of the newest training row
+
+    def predict_proba(self, text: str) -> np.ndarray:
+        idx = np.fromiter(hash_features(text, self.dim), dtype=np.int64)
+        scores = self.log_prior + self.feature_log_prob[:, idx].sum(axis=1)
+        scores -= scores.max()
+        probs = np.exp(scores)
+        return probs / probs.sum()
+
+    def predict(self, text: str) -> tuple[str, float, int]:
+        """Returns (label, probability, urgency)."""
+        probs = self.predict_proba(text)
+        best = int(probs.argmax())
+        return self.classes[best], float(probs[best]), int(self.class_urgency[best])
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(
+            path,
+            classes=np.array(self.classes),
+            log_prior=self.log_prior,
+            feature_log_prob=self.feature_log_prob,
+            class_urgency=self.class_urgency,
+            dim=np.array(self.dim),
+            trained_until=np.array(self.trained_until),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> LocalModel:
+        with np.load(path) as data:
+            return cls(
+                classes=[str(c) for c in data["classes"]],
+                log_prior=data["log_prior"],
+                feature_log_prob=data["feature_log_prob"],
+                class_urgency=data["class_urgency"],
+                dim=int(data["dim"]),
+                trained_until=str(data["trained_until"]) if "trained_until" in data else "",
+            )
+
+
+def train(
+    samples: list[tuple[str, str, int]],
+    dim: int = DEFAULT_DIM,
+    alpha: float = 0.1,
+) -> LocalModel:
+    """Fit multinomial Naive Bayes on (text, label, urgency) samples."""
+    classes = sorted({label for _, label, _ in samples})
+    class_index = {c: i for i, c in enumerate(classes)}
+    counts = np.zeros((len(classes), dim), dtype=np.float64)
+    class_counts = np.zeros(len(classes), dtype=np.float64)
+    urgencies: list[list[int]] = [[] for _ in classes]
+
+    for text, label, urgency in samples:
+        ci = class_index[label]
+        class_counts[ci] += 1
+        urgencies[ci].append(urgency)
+        np.add.at(counts[ci], np.fromiter(hash_features(text, dim), dtype=np.int64), 1)
+
+    smoothed = counts + alpha
+    feature_log_prob = np.log(smoothed / smoothed.sum(axis=1, keepdims=True))
+    return LocalModel(
+        classes=classes,
+        log_prior=np.log(class_counts / class_counts.sum()),
+        feature_log_prob=feature_log_prob.astype(np.float32),
+        class_urgency=np.array([int(np.median(u)) if u else 3 for u in urgencies]),
+        dim=dim,
+    )
+
+
+# --- Serving ---
+
+_model: LocalModel | None = None
+_model_loaded = False
+# classify_offline runs on worker threads (bot.py), so the first load is serialized
+_load_lock = threading.Lock()
+
+
+def get_local_model() -> LocalModel | None:
+    global _model, _model_loaded
+    if not _model_loaded:
+        with _load_lock:
+            if not _model_loaded:
+                _model = _load_model()
+                _model_loaded = True
+    return _model
+
+
+def _load_model() -> LocalModel | None:
+    if np is None or not settings.local_model_path:
+        return None
+    try:
+        model = LocalModel.load(settings.local_model_path)
+    except Exception as e:
+        logger.error("Failed to load local model %s: %s", settings.local_model_path, e)
+        return None
+    logger.info(
+        "Local model loaded from %s (%d classes)",
+        settings.local_model_path,
+        len(model.classes),
+    )
+    return model
+
+
+def classify_local(message: Message) -> ClassificationResult | None:
+    """Layer 1.5: answer locally when the model is confident, else None (go to AI)."""
+    model = get_local_model()
+    if model is None:
+        return None
+    text = message.text.strip()
+    if not text:
+        return None
+
+    label, probability, urgency = model.predict(text)
+    # A wrong local dismissal loses a driver message, so it needs a stricter bar.
+    threshold = (
+        settings.local_model_dismiss_threshold
+        if label == NOT_TICKET
+        else settings.local_model_threshold
+    )
+    if probability < threshold:
+        return None
+
+    confidence = 5 if probability >= 0.99 else 4
+    if label == NOT_TICKET:
+        return ClassificationResult(
+            is_ticket=False,
+            confidence=confidence,
+            category=TicketCategory.UNCLASSIFIED,
+            urgency=1,
+            layer="local_model",
+            reason=f"local_model_p{probability:.2f}",
+        )
+    return ClassificationResult(
+        is_ticket=True,
+        confidence=confidence,
+        category=TicketCategory(label),
+        urgency=max(1, min(5, urgency)),
+        layer="local_model",
+        reason=f"local_model_p{probability:.2f}",
+    )
+
+
+# --- Training data ---
+
+
+Sample = tuple[str, str, int, str]  # (text, label, urgency, created_at)
+
+
+def split_by_time(samples: list[Sample], holdout_pct: int) -> tuple[list[Sample], list[Sample]]:
+    """(train, holdout): the newest ``holdout_pct`` percent of samples are held out.
+
+    Rows sharing the cutoff timestamp all go to the holdout, so every holdout row
+    is strictly newer than every training row.
+    """
+    ordered = sorted(samples, key=lambda s: s[3])
+    held = len(ordered) * holdout_pct // 100
+    if held == 0:
+        return ordered, []
+    cutoff = ordered[len(ordered) - held][3]
+    return [s for s in ordered if s[3] < cutoff], [s for s in ordered if s[3] >= cutoff]
+
+
+async def load_training_samples(limit: int = 0) -> list[Sample]:
+    """(text, label, urgency, created_at) from raw_messages joined to enriched tickets."""
+    from src.storage import storage
+
+    samples: list[Sample] = []
+    async for page in storage.iter_rows_keyset(
+        "raw_messages",
+        columns=(
+            "id, created_at, content_text, content_type, classification_result,"
+            " classification_source, ticket_id"
+        ),
+    ):
+        rows = [
+            r
+            for r in page
+            if r.get("content_type") == "text"
+            and r.get("content_text")
+            and (
+                r.get("classification_result") == "created"
+                or (
+                    r.get("classification_result") == "dismissed"
+                    and r.get("classification_source") in _NEGATIVE_SOURCES
+                )
+            )
+        ]
+        ticket_ids = list({r["ticket_id"] for r in rows if r.get("ticket_id")})
+        tickets = {
+            t["id"]: t
+            for t in await storage.get_tickets_by_ids(ticket_ids, "id, ai_category, ai_urgency")
+        }
+        for r in rows:
+            if r["classification_result"] == "dismissed":
+                samples.append((r["content_text"], NOT_TICKET, 1, r["created_at"]))
+                continue
+            ticket = tickets.get(r.get("ticket_id"))
+            if ticket is None or ticket.get("ai_category") not in _CATEGORY_LABELS:
+                continue
+            urgency = ticket.get("ai_urgency") or 3
+            samples.append((r["content_text"], ticket["ai_category"], urgency, r["created_at"]))
+        if limit and len(samples) >= limit:
+            return samples[:limit]
+    return samples
+
+
+def evaluate(model: LocalModel, samples: list[Sample]) -> dict:
+    """Accuracy overall and on the confident subset, plus coverage and throughput."""
+    threshold = settings.local_model_threshold
+    correct = answered = answered_correct = 0
+    start = time.perf_counter()
+    for text, label, _, _ in samples:
+        predicted, probability, _ = model.predict(text)
+        correct += predicted == label
+        if probability >= threshold:
+            answered += 1
+            answered_correct += predicted == label
+    elapsed = time.perf_counter() - start
+    total = len(samples) or 1
+    return {
+        "samples": len(samples),
+        "accuracy": correct / total,
+        "threshold": threshold,
+        "coverage": answered / total,
+        "confident_accuracy": answered_correct / (answered or 1),
+        "predictions_per_sec": len(samples) / elapsed if elapsed else 0.0,
+        "avg_latency_us": elapsed / total * 1e6,
+    }
+
+
+def _print_report(report: dict) -> None:
+    print(f"samples:             {report['samples']}")
+    print(f"accuracy (all):      {report['accuracy']:.3f}")
+    print(f"coverage @ {report['threshold']:.2f}:     {report['coverage']:.3f}")
+    print(f"accuracy (answered): {report['confident_accuracy']:.3f}")
+    print(f"throughput:          {report['predictions_per_sec']:,.0f} predictions/s")
+    print(f"latency:             {report['avg_latency_us']:.1f} us/prediction")
+
+
+# --- CLI ---
+
+
+async def _train_command(args: argparse.Namespace) -> None:
+    samples = await load_training_samples(limit=args.limit)
+    train_set, test_set = split_by_time(samples, args.holdout)
+    if not train_set:
+        raise SystemExit("No training samples found in raw_messages")
+
+    start = time.perf_counter()
+    model = train([(t, label, u) for t, label, u, _ in train_set], dim=args.dim, alpha=args.alpha)
+    model.trained_until = train_set[-1][3]
+    print(f"Trained on {len(train_set)} samples in {time.perf_counter() - start:.1f}s")
+    model.save(args.output)
+    print(f"Model written to {args.output}")
+    if test_set:
+        print(f"\nHoldout (newest {args.holdout}%, after {model.trained_until}):")
+        _print_report(evaluate(model, test_set))
+
+
+async def _report_command(args: argparse.Namespace) -> None:
+    model = LocalModel.load(args.model)
+    since = args.since or model.trained_until
+    if not since:
+        raise SystemExit(
+            f"{args.model} does not record its training cutoff; retrain it or pass --since"
+        )
+    samples = await load_training_samples(limit=args.limit)
+    holdout = [s for s in samples if s[3] > since]
+    if not holdout:
+        raise SystemExit(f"No rows in raw_messages after {since}")
+    print(f"Rows after {since}:")
+    _print_report(evaluate(model, holdout))
+
+
+def main() -> None:
+    if np is None:
+        raise SystemExit("NumPy is required: pip install -e '.[ml]'")
+    parser = argparse.ArgumentParser(description="FleetRelay Layer 1.5 local classifier")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    train_cmd = sub.add_parser("train", help="train from raw_messages history")
+    train_cmd.add_argument("-o", "--output", default="local_model.npz")
+    train_cmd.add_argument("--dim", type=int, default=DEFAULT_DIM)
+    train_cmd.add_argument("--alpha", type=float, default=0.1)
+    train_cmd.add_argument(
+        "--holdout", type=int, default=10, help="percentage of newest rows held out"
+    )
+    train_cmd.add_argument("--limit", type=int, default=0)
+
+    report_cmd = sub.add_parser(
+        "report", help="accuracy/throughput of a model on rows newer than its training data"
+    )
+    report_cmd.add_argument("model")
+    report_cmd.add_argument(
+        "--since", default="", help="created_at cutoff (default: the model's training cutoff)"
+    )
+    report_cmd.add_argument("--limit", type=int, default=0)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    if args.command == "train":
+        asyncio.run(_train_command(args))
+    else:
+        asyncio.run(_report_command(args))
+
+
+if __name__ == "__main__":
+    main()
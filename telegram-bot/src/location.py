@@ -0,0 +1,320 @@
+"""Deterministic location extraction for tickets (fills ai_location without AI).
+
+Two sources, both instant:
+
+- Free text: compiled highway / mile-marker / exit patterns
+  ("I-40 mile marker 212" -> "I-40 MM 212", "exit 87 on I-81" -> "I-81 Exit 87").
+- Telegram location shares: offline reverse geocoding against a prebuilt grid index
+  of cities and interstate mile markers. The index is a flat binary file that is
+  memory-mapped, so loading is O(1) and lookups touch only a few pages.
+
+Build the index from a CSV of ``kind,label,lat,lon`` rows (kind is ``city`` or
+``mile_marker``)::
+
+    python -m src.location build geo_points.csv -o geo_index.bin
+
+and point GEO_INDEX_PATH at the result. Without an index, shared coordinates are
+stored as plain "lat, lon". A lookup searches every cell within its max distance,
+so any ``--cell-deg`` is correct. With the default 1.0, GEO_CITY_MAX_KM lookups in
+the contiguous US stay within the 3x3 block around the point; much smaller cells
+make every lookup visit many more.
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import csv
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+from collections.abc import Iterable
+
+from src.config import settings
+from src.models import Message
+
+logger = logging.getLogger(__name__)
+
+# --- Free-text patterns ---
+
+_HIGHWAY_RE = re.compile(
+    # "I 5" is too often "I 5 min away", so bare I/IH needs a hyphen or no space.
+    r"\b(?:(?P<short>I|IH)-?|(?P<prefix>Interstate|(?-i:US)|Hwy|Highway|SR|Route|Rt)[\s-]*)"
+    r"(?P<number>\d{1,3})"
+    r"(?:\s*(?P<dir>[NSEW]B|north|south|east|west)(?:bound)?)?\b",
+    re.IGNORECASE,
+)
+# "mile marker 212" is preferred over "212 mm" so "I-40 mile marker 212" isn't read as MM 40.
+_MILE_MARKER_RE = re.compile(
+    r"\b(?:mile\s*marker|mile\s*post|mm|mp|mile)\s*#?\s*(?P<mile>\d{1,3}(?:\.\d+)?)\b",
+    re.IGNORECASE,
+)
+_MILE_MARKER_AFTER_RE = re.compile(
+    r"\b(?P<mile>\d{1,3}(?:\.\d+)?)\s*(?:mile\s*marker|mm)\b", re.IGNORECASE
+)
+_EXIT_RE = re.compile(r"\bexit\s*#?\s*(?P<exit>\d{1,3}[a-c]?)\b", re.IGNORECASE)
+
+_HIGHWAY_PREFIX = {
+    "i": "I",
+    "ih": "I",
+    "interstate": "I",
+    "us": "US",
+    "hwy": "Hwy",
+    "highway": "Hwy",
+    "sr": "SR",
+    "route": "Route",
+    "rt": "Route",
+}
+_DIRECTION = {"north": "NB", "south": "SB", "east": "EB", "west": "WB"}
+
+
+def extract_text_location(text: str) -> str:
+    """Highway, mile marker and exit mentioned in free text, normalized; "" if none."""
+    if not text:
+        return ""
+    parts: list[str] = []
+
+    highway = _HIGHWAY_RE.search(text)
+    if highway:
+        prefix = _HIGHWAY_PREFIX[(highway["short"] or highway["prefix"]).lower()]
+        sep = "-" if prefix in ("I", "US", "SR") else " "
+        label = f"{prefix}{sep}{highway['number']}"
+        if highway["dir"]:
+            direction = highway["dir"].lower()
+            label += " " + _DIRECTION.get(direction, direction.upper())
+        parts.append(label)
+
+    mile = _MILE_MARKER_RE.search(text) or _MILE_MARKER_AFTER_RE.search(text)
+    if mile:
+        parts.append(f"MM {mile['mile']}")
+
+    exit_match = _EXIT_RE.search(text)
+    if exit_match:
+        parts.append(f"Exit {exit_match['exit'].upper()}")
+
+    # A bare mile number without a highway or exit is too ambiguous to store.
+    if len(parts) == 1 and parts[0].startswith("MM "):
+        return ""
+    return " ".join(parts)
+
+
+# --- Offline reverse geocoding (memory-mapped grid index) ---
+
+_MAGIC = b"FRGEO1\0\0"
+_HEADER = struct.Struct("<8sIIIf")  # magic, n_cells, n_points, labels_len, cell_deg
+
+KIND_CITY = 0
+KIND_MILE_MARKER = 1
+
+_EARTH_RADIUS_KM = 6371.0
+_KM_PER_DEGREE = math.pi * _EARTH_RADIUS_KM / 180
+
+
+def _cell_key(lat: float, lon: float, cell_deg: float) -> int:
+    cols = math.ceil(360 / cell_deg)
+    row = int((lat + 90) // cell_deg)
+    col = int((lon + 180) // cell_deg) % cols
+    return row * cols + col
+
+
+def _distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    # Equirectangular approximation: accurate to well under 1% at these ranges.
+    x = math.radians(lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return _EARTH_RADIUS_KM * math.hypot(x, y)
+
+
+def build_geo_index(
+    points: Iterable[tuple[int, str, float, float]],
+    path: str,
+    cell_deg: float = 1.0,
+) -> int:
+    """Write a grid index of (kind, label, lat, lon) points. Returns the point count.
+
+    Layout (little-endian, every array 4-byte aligned): header, cell keys (i32),
+    cell starts (u32), cell counts (u32), lats (f32), lons (f32), label offsets
+    (u32, n+1 entries), kinds (u8), labels (utf-8 blob). Points are sorted by
+    cell so each cell is one contiguous run.
+    """
+    keyed = sorted(
+        (_cell_key(lat, lon, cell_deg), kind, label, lat, lon)
+        for kind, label, lat, lon in points
+    )
+
+    cell_keys: list[int] = []
+    cell_starts: list[int] = []
+    cell_counts: list[int] = []
+    labels = bytearray()
+    label_offsets = [0]
+    for i, (key, _, label, _, _) in enumerate(keyed):
+        if not cell_keys or cell_keys[-1] != key:
+            cell_keys.append(key)
+            cell_starts.append(i)
+            cell_counts.append(0)
+        cell_counts[-1] += 1
+        labels += label.encode("utf-8")
+        label_offsets.append(len(labels))
+
+    n_cells, n_points = len(cell_keys), len(keyed)
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, n_cells, n_points, len(labels), cell_deg))
+        f.write(struct.pack(f"<{n_cells}i", *cell_keys))
+        f.write(struct.pack(f"<{n_cells}I", *cell_starts))
+        f.write(struct.pack(f"<{n_cells}I", *cell_counts))
+        f.write(struct.pack(f"<{n_points}f", *(p[3] for p in keyed)))
+        f.write(struct.pack(f"<{n_points}f", *(p[4] for p in keyed)))
+        f.write(struct.pack(f"<{n_points + 1}I", *label_offsets))
+        f.write(bytes(p[1] for p in keyed))
+        f.write(labels)
+    return n_points
+
+
+class GeoIndex:
+    """Read-only view over a memory-mapped grid index built by build_geo_index."""
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n_cells, n_points, labels_len, self.cell_deg = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a FleetRelay geo index")
+
+        view = memoryview(self._mm)
+        offset = _HEADER.size
+
+        def take(count: int, fmt: str, size: int) -> memoryview:
+            nonlocal offset
+            section = view[offset : offset + count * size].cast(fmt)
+            offset += count * size
+            return section
+
+        self._cell_keys = take(n_cells, "i", 4)
+        self._cell_starts = take(n_cells, "I", 4)
+        self._cell_counts = take(n_cells, "I", 4)
+        self._lats = take(n_points, "f", 4)
+        self._lons = take(n_points, "f", 4)
+        self._label_offsets = take(n_points + 1, "I", 4)
+        self._kinds = take(n_points, "B", 1)
+        self._labels = view[offset : offset + labels_len]
+        self.size = n_points
+
+    def _label(self, i: int) -> str:
+        start, end = self._label_offsets[i], self._label_offsets[i + 1]
+        return bytes(self._labels[start:end]).decode("utf-8")
+
+    def nearest(self, lat: float, lon: float, kind: int, max_km: float) -> tuple[str, float] | None:
+        """Nearest point of ``kind`` within max_km, searching every cell max_km reaches.
+
+        That is the 3x3 neighbouring cells unless max_km is wider than a cell; a
+        degree of longitude shrinks towards the poles, so more columns are searched there.
+        """
+        cols = math.ceil(360 / self.cell_deg)
+        row, col = divmod(_cell_key(lat, lon, self.cell_deg), cols)
+        row_ring = max(1, math.ceil(max_km / (_KM_PER_DEGREE * self.cell_deg)))
+        # Narrowest column in the searched rows, capped short of the pole
+        edge_lat = min(89.0, abs(lat) + row_ring * self.cell_deg)
+        col_km = _KM_PER_DEGREE * self.cell_deg * math.cos(math.radians(edge_lat))
+        col_ring = max(1, math.ceil(max_km / col_km))
+        search_cols = (
+            range(cols)
+            if 2 * col_ring + 1 >= cols
+            else [(col + d_col) % cols for d_col in range(-col_ring, col_ring + 1)]
+        )
+        best: tuple[str, float] | None = None
+        best_km = max_km
+        for d_row in range(-row_ring, row_ring + 1):
+            for search_col in search_cols:
+                key = (row + d_row) * cols + search_col
+                idx = bisect.bisect_left(self._cell_keys, key)
+                if idx == len(self._cell_keys) or self._cell_keys[idx] != key:
+                    continue
+                start = self._cell_starts[idx]
+                for i in range(start, start + self._cell_counts[idx]):
+                    if self._kinds[i] != kind:
+                        continue
+                    km = _distance_km(lat, lon, self._lats[i], self._lons[i])
+                    if km <= best_km:
+                        best_km = km
+                        best = (self._label(i), km)
+        return best
+
+
+_index: GeoIndex | None = None
+_index_loaded = False
+
+
+def get_geo_index() -> GeoIndex | None:
+    global _index, _index_loaded
+    if not _index_loaded:
+        _index_loaded = True
+        path = settings.geo_index_path
+        if path and os.path.exists(path):
+            try:
+                _index = GeoIndex(path)
+                logger.info("Geo index loaded: %d points from %s", _index.size, path)
+            except Exception as e:
+                logger.error("Failed to load geo index %s: %s", path, e)
+    return _index
+
+
+def reverse_geocode(lat: float, lon: float) -> str:
+    """Human-readable label for coordinates, e.g. "I-40 MM 71 near Amarillo, TX"."""
+    coords = f"{lat:.5f}, {lon:.5f}"
+    index = get_geo_index()
+    if index is None:
+        return coords
+
+    parts: list[str] = []
+    marker = index.nearest(lat, lon, KIND_MILE_MARKER, max_km=settings.geo_mile_marker_max_km)
+    if marker is not None:
+        parts.append(marker[0])
+    city = index.nearest(lat, lon, KIND_CITY, max_km=settings.geo_city_max_km)
+    if city is not None:
+        parts.append(f"near {city[0]}")
+    if not parts:
+        return coords
+    return f"{' '.join(parts)} ({coords})"
+
+
+def extract_location(messages: list[Message]) -> str:
+    """Best deterministic location for a batch: shared coordinates first, then text."""
+    for message in messages:
+        shared = message.raw_data.get("location")
+        if shared:
+            return reverse_geocode(shared["latitude"], shared["longitude"])
+    for message in messages:
+        location = extract_text_location(message.text)
+        if location:
+            return location
+    return ""
+
+
+# --- Index builder CLI ---
+
+
+def _read_points(paths: list[str]) -> Iterable[tuple[int, str, float, float]]:
+    kinds = {"city": KIND_CITY, "mile_marker": KIND_MILE_MARKER}
+    for path in paths:
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                yield kinds[row["kind"]], row["label"], float(row["lat"]), float(row["lon"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="FleetRelay offline geo index tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="build a grid index from kind,label,lat,lon CSVs")
+    build.add_argument("csv", nargs="+")
+    build.add_argument("-o", "--output", default="geo_index.bin")
+    build.add_argument("--cell-deg", type=float, default=1.0)
+    args = parser.parse_args()
+
+    count = build_geo_index(_read_points(args.csv), args.output, cell_deg=args.cell_deg)
+    print(f"Wrote {count} points to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
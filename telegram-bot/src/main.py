@@ -1,7 +1,15 @@
 """FastAPI entry point for FleetRelay Telegram bot.
 
 Receives Telegram webhook updates and routes them through the classification pipeline.
-Also exposes health/stats endpoints for monitoring.
+Also exposes health/stats and Prometheus metrics endpoints for monitoring.
+
+Restarts: the follow-up buffer and any albums or text bursts still being coalesced
+are saved on shutdown and restored on startup (src/snapshot.py).
+
+Cold start: the Telegram application is built in startup(), not at import. The
+Supabase and OpenAI clients are built on first use. Webhook registration and
+client pre-warming run in the background once the server is serving. Each phase
+is logged and exported as fleetrelay_startup_seconds{phase}.
 """
 
 from __future__ import annotations
@@ -9,13 +17,51 @@ from __future__ import annotations
 import asyncio
 import hmac
 import logging
+import os
+import threading
+import time
+from collections.abc import Awaitable, Callable, Coroutine, Iterator
+from contextlib import contextmanager
 
 from fastapi import FastAPI, Request, Response
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from telegram import Update
+from telegram.ext import Application
 
-from src.bot import create_bot_application, flush_expired_buffers
+import src
+from src.bot import (
+    create_bot_application,
+    flush_expired_buffers,
+    flush_shed_work,
+    monitor_overload,
+    runtime_state,
+)
+from src.classifier import prewarm_openai
 from src.config import settings
-from src.supabase_storage import storage
+from src.health import health_monitor
+from src.image_cache import get_image_cache
+from src.media import MediaTooLargeError, close_media, iter_media_body, open_media_stream
+from src.metrics import (
+    EVENT_LOOP_LAG_LAST,
+    STAGE_SECONDS,
+    STARTUP_SECONDS,
+    UPDATES_TOTAL,
+    monitor_event_loop_lag,
+    render,
+)
+from src.models import SendReplyRequest
+from src.outbound import (
+    build_job,
+    get_dispatcher,
+    get_ticket_routing,
+    start_outbound,
+    stop_outbound,
+)
+from src.profiler import clamp, render_folded, sample_thread
+from src.signed_urls import signature_valid
+from src.snapshot import restore_snapshot, save_snapshot
+from src.storage import storage
+from src.transport import close_transports, pool_stats
 
 logging.basicConfig(
     level=getattr(logging, settings.log_level.upper(), logging.INFO),
@@ -30,30 +76,123 @@ app = FastAPI(
     docs_url="/docs" if settings.environment == "development" else None,
 )
 
-_bot_app = create_bot_application()
+_bot_app: Application | None = None  # built in startup()
+# Periodic loops and warm-up started in startup(); held so they are not garbage
+# collected mid-run, and cancelled in shutdown()
+_background: list[asyncio.Task] = []
+
+
+def _spawn(coro: Coroutine) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    _background.append(task)
+    return task
+
+
+async def _cancel_background() -> None:
+    for task in _background:
+        task.cancel()
+    await asyncio.gather(*_background, return_exceptions=True)
+    _background.clear()
+
+
+@contextmanager
+def _startup_phase(phase: str, phases: dict[str, float]) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases[phase] = time.perf_counter() - start
+        STARTUP_SECONDS.set(phases[phase], phase)
+
+
+def _format_phases(phases: dict[str, float]) -> str:
+    return ", ".join(f"{phase} {seconds * 1000:.0f}ms" for phase, seconds in phases.items())
 
 
 @app.on_event("startup")
 async def startup() -> None:
-    await _bot_app.initialize()
-    await _bot_app.start()
+    global _bot_app
+    phases = {"imports": time.perf_counter() - src.IMPORT_STARTED}
+    STARTUP_SECONDS.set(phases["imports"], "imports")
+
+    with _startup_phase("telegram_app", phases):
+        _bot_app = create_bot_application()
+    with _startup_phase("telegram_initialize", phases):
+        await _bot_app.initialize()
+        await _bot_app.start()
+    if settings.snapshot_path:
+        with _startup_phase("restore_snapshot", phases):
+            restore_snapshot(
+                settings.snapshot_path, _bot_app.bot, settings.snapshot_max_age_seconds
+            )
+
+    _spawn(flush_expired_buffers())
+    _spawn(monitor_event_loop_lag())
+    _spawn(health_monitor.run())
+    if settings.overload_shedding:
+        _spawn(monitor_overload())
+    with _startup_phase("outbound", phases):
+        await start_outbound(_bot_app.bot)
+    health_monitor.ready = True
+    _spawn(_warm_up())
+    logger.info(
+        "FleetRelay bot started (env=%s): %s", settings.environment, _format_phases(phases)
+    )
+
 
+async def _warm_up() -> None:
+    """Register the webhook and pre-warm clients without delaying the first request."""
+    phases: dict[str, float] = {}
+
+    async def run(phase: str, step: Callable[[], Awaitable[object]]) -> None:
+        with _startup_phase(phase, phases):
+            try:
+                await step()
+            except Exception as e:
+                logger.warning("Warm-up step %s failed: %s", phase, e)
+
+    steps = []
     if settings.webhook_url:
         webhook_url = f"{settings.webhook_url.rstrip('/')}/webhook"
-        await _bot_app.bot.set_webhook(
-            url=webhook_url,
-            secret_token=settings.webhook_secret or None,
-        )
-        logger.info("Webhook set: %s", webhook_url)
 
-    asyncio.create_task(flush_expired_buffers())
-    logger.info("FleetRelay bot started (env=%s)", settings.environment)
+        async def set_webhook() -> None:
+            await _bot_app.bot.set_webhook(
+                url=webhook_url,
+                secret_token=settings.webhook_secret or None,
+            )
+            logger.info("Webhook set: %s", webhook_url)
+
+        steps.append(run("set_webhook", set_webhook))
+    if settings.prewarm_clients:
+        steps.append(run("prewarm_storage", storage.prewarm))
+        steps.append(run("prewarm_openai", prewarm_openai))
+    if steps:
+        await asyncio.gather(*steps)
+        logger.info("Warm-up finished: %s", _format_phases(phases))
 
 
 @app.on_event("shutdown")
 async def shutdown() -> None:
-    await _bot_app.stop()
-    await _bot_app.shutdown()
+    health_monitor.ready = False
+    await _cancel_background()
+    if settings.snapshot_path:
+        try:
+            saved = save_snapshot(settings.snapshot_path)
+            logger.info(
+                "Saved snapshot: %d buffered messages, %d albums, %d bursts",
+                saved["buffer"],
+                saved["albums"],
+                saved["bursts"],
+            )
+        except OSError as e:
+            logger.error("Failed to save snapshot: %s", e)
+    await flush_shed_work()
+    await stop_outbound()
+    if _bot_app is not None:
+        await _bot_app.stop()
+        await _bot_app.shutdown()
+    await close_media()
+    await close_transports()
     logger.info("FleetRelay bot stopped")
 
 
@@ -65,22 +204,163 @@ async def webhook(request: Request) -> Response:
             logger.warning("Webhook request with invalid secret token")
             return Response(status_code=403)
 
+    UPDATES_TOTAL.inc()
     try:
-        body = await request.json()
-        update = Update.de_json(body, _bot_app.bot)
-        if update:
-            await _bot_app.process_update(update)
+        with STAGE_SECONDS.time("update"):
+            body = await request.json()
+            update = Update.de_json(body, _bot_app.bot)
+            if update:
+                await _bot_app.process_update(update)
     except Exception as e:
         logger.error("Webhook processing error: %s", e)
 
     return Response(status_code=200)
 
 
+def _api_authorized(request: Request) -> bool:
+    if not settings.api_token:
+        return False
+    token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    return hmac.compare_digest(token, settings.api_token)
+
+
+@app.post("/api/send-reply")
+async def send_reply(body: SendReplyRequest, request: Request) -> Response:
+    """Queue an operator reply for delivery to Telegram (PRD-02). Returns 202 once queued."""
+    if not _api_authorized(request):
+        return Response(status_code=401)
+    dispatcher = get_dispatcher()
+    if dispatcher is None:
+        return JSONResponse({"error": "not started"}, status_code=503)
+
+    ticket = await get_ticket_routing(body.ticket_id)
+    if ticket is None:
+        return JSONResponse({"error": "ticket not found"}, status_code=404)
+
+    if body.ticket_message_id:
+        row = await storage.get_ticket_message(body.ticket_message_id)
+        if row is None or row["ticket_id"] != body.ticket_id:
+            return JSONResponse({"error": "ticket message not found"}, status_code=404)
+        if row.get("delivery_status") in ("sent", "delivered"):
+            return JSONResponse({"error": "already sent"}, status_code=409)
+        row = {**row, "content_text": body.message_text, "delivery_status": "pending"}
+        await storage.update_ticket_messages_delivery(
+            [{"id": row["id"], "content_text": body.message_text, "delivery_status": "pending"}]
+        )
+    else:
+        row = await storage.create_outbound_message(
+            body.ticket_id,
+            body.message_text,
+            sender_name=body.sender_name,
+            sender_user_id=body.sender_user_id,
+        )
+
+    dispatcher.enqueue(await build_job(ticket, row, body.reply_to_message_id))
+    return JSONResponse(
+        {"ticket_message_id": row["id"], "delivery_status": "pending"}, status_code=202
+    )
+
+
 @app.get("/health")
 async def health() -> dict:
-    stats = await storage.stats()
+    """Cached snapshot: estimated DB counts plus live in-memory state. No DB round trip."""
+    ready, _ = health_monitor.readiness()
     return {
-        "status": "ok",
+        "status": "ok" if ready else "degraded",
         "environment": settings.environment,
-        "stats": stats,
+        **health_monitor.snapshot(runtime_state()),
+        "image_cache": get_image_cache().stats(),
+        "event_loop_lag_seconds": round(EVENT_LOOP_LAG_LAST.value(), 4),
+        "outbound": dispatcher.stats() if (dispatcher := get_dispatcher()) else None,
+        "http_pools": pool_stats(),
     }
+
+
+@app.get("/health/live")
+async def health_live() -> dict:
+    """Liveness: the process is up and the event loop is serving requests."""
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+async def health_ready() -> Response:
+    """Readiness: the bot is running and Supabase answered a recent background check."""
+    ready, detail = health_monitor.readiness()
+    return JSONResponse(
+        {"status": "ready" if ready else "not_ready", **detail},
+        status_code=200 if ready else 503,
+    )
+
+
+@app.get("/metrics")
+async def metrics() -> Response:
+    return Response(content=render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/media/{file_id}")
+async def media(file_id: str, request: Request, exp: int = 0, sig: str = "") -> Response:
+    """Proxy a Telegram file so ticket_messages.media_url never exposes the bot token.
+
+    Needs a signed link from media_proxy_url or the API token. The body is streamed,
+    never held in memory, and cut off at MEDIA_MAX_DOWNLOAD_BYTES.
+    """
+    if not _link_authorized(request, f"/media/{file_id}", exp, sig):
+        return Response(status_code=401)
+    try:
+        upstream, content_type = await open_media_stream(_bot_app.bot, file_id)
+    except MediaTooLargeError:
+        return Response(status_code=413)
+    except Exception as e:
+        logger.warning("Media proxy failed for %s: %s", file_id, e)
+        return Response(status_code=404)
+    headers = {"Cache-Control": "private, max-age=86400"}
+    if "Content-Length" in upstream.headers:
+        headers["Content-Length"] = upstream.headers["Content-Length"]
+    return StreamingResponse(iter_media_body(upstream), media_type=content_type, headers=headers)
+
+
+@app.get("/files/{path:path}")
+async def files(path: str, request: Request, exp: int = 0, sig: str = "") -> Response:
+    """Media the SQLite backend wrote under SQLITE_MEDIA_DIR (storage.upload_media)."""
+    if not _link_authorized(request, f"/files/{path}", exp, sig):
+        return Response(status_code=401)
+    if settings.storage_backend != "sqlite":
+        return Response(status_code=404)
+    root = os.path.realpath(settings.sqlite_media_dir)
+    target = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, target]) != root or not os.path.isfile(target):
+        return Response(status_code=404)
+    return FileResponse(target, headers={"Cache-Control": "private, max-age=86400"})
+
+
+def _link_authorized(request: Request, path: str, exp: int, sig: str) -> bool:
+    return _api_authorized(request) or signature_valid(path, exp, sig, time.time())
+
+
+def _debug_authorized(request: Request) -> bool:
+    if not settings.debug_token:
+        return False
+    token = request.headers.get("X-Debug-Token", "")
+    return hmac.compare_digest(token, settings.debug_token)
+
+
+@app.get("/debug/profile")
+async def debug_profile(
+    request: Request, seconds: float = 10.0, interval_ms: float = 5.0
+) -> Response:
+    """Sample the event loop thread and return folded stacks for a flamegraph."""
+    if not _debug_authorized(request):
+        return Response(status_code=404)
+
+    seconds, interval = clamp(seconds, interval_ms / 1000)
+    loop_thread = threading.get_ident()
+    try:
+        stacks, samples = await asyncio.to_thread(sample_thread, loop_thread, seconds, interval)
+    except RuntimeError:
+        return Response(status_code=409, content="A profile is already running")
+    logger.info("Profiled event loop for %.1fs (%d samples)", seconds, samples)
+    return Response(
+        content=render_folded(stacks),
+        media_type="text/plain; charset=utf-8",
+        headers={"X-Profile-Samples": str(samples)},
+    )
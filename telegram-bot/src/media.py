@@ -0,0 +1,283 @@
+"""Async media stage: classify ticket attachments and link them on ticket_messages.
+
+Runs after a ticket is created (or messages are appended), never on the ingest path.
+For each photo/video/video note it:
+
+- resolves the Telegram file and downloads it through a pooled HTTP client,
+- classifies the photo (or the video's thumbnail frame) via the image cache,
+- writes ai_media_description, media_url and media_thumbnail_url back to
+  ticket_messages in one batched request per ticket.
+
+media_url/media_thumbnail_url point at the bot's /media/{file_id} proxy so the
+original files are only fetched from Telegram when an operator opens them. The
+links are signed and expire (signed_urls.py). Concurrent downloads and vision
+calls are capped by semaphores.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import mimetypes
+import os
+import shutil
+import tempfile
+from collections.abc import AsyncIterator
+
+import httpx
+from telegram import Bot
+
+from src.config import settings
+from src.image_cache import classify_image_cached, pick_photo_size
+from src.models import ImageCategory, Message, TicketCategory
+from src.signed_urls import signed_url
+from src.storage import storage
+from src.transport import get_async_transport
+
+logger = logging.getLogger(__name__)
+
+IMAGE_TO_TICKET_CATEGORY: dict[ImageCategory, TicketCategory] = {
+    ImageCategory.MECHANICAL: TicketCategory.MECHANICAL,
+    ImageCategory.ACCIDENT: TicketCategory.ACCIDENT,
+    ImageCategory.DOCUMENT: TicketCategory.DOCUMENTATION,
+    ImageCategory.ROAD: TicketCategory.OTHER,
+}
+
+_bot: Bot | None = None
+_http: httpx.AsyncClient | None = None
+_download_semaphore: asyncio.Semaphore | None = None
+
+
+def init_media(bot: Bot) -> None:
+    """Register the bot used to resolve Telegram file paths."""
+    global _bot
+    _bot = bot
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    global _http
+    if _http is None:
+        # Same host as the Bot API, so downloads share its pool and connections.
+        _http = httpx.AsyncClient(
+            transport=get_async_transport("telegram"),
+            timeout=httpx.Timeout(30.0, connect=5.0),
+        )
+    return _http
+
+
+def _get_download_semaphore() -> asyncio.Semaphore:
+    global _download_semaphore
+    if _download_semaphore is None:
+        _download_semaphore = asyncio.Semaphore(settings.media_max_concurrent_downloads)
+    return _download_semaphore
+
+
+def media_proxy_url(file_id: str) -> str:
+    return signed_url(f"/media/{file_id}")
+
+
+# --- Downloads ---
+
+
+async def resolve_file_url(bot: Bot, file_id: str) -> str:
+    tg_file = await bot.get_file(file_id)
+    return str(tg_file.file_path)
+
+
+async def download_file(bot: Bot, file_id: str) -> bytes:
+    data, _ = await fetch_media(bot, file_id)
+    return data
+
+
+async def fetch_media(bot: Bot, file_id: str) -> tuple[bytes, str]:
+    """Download a Telegram file into memory. Returns (data, content_type)."""
+    async with _get_download_semaphore():
+        url = await resolve_file_url(bot, file_id)
+        response = await _get_http_client().get(url)
+        response.raise_for_status()
+    content_type = mimetypes.guess_type(url)[0] or "application/octet-stream"
+    return response.content, content_type
+
+
+class MediaTooLargeError(Exception):
+    pass
+
+
+async def open_media_stream(bot: Bot, file_id: str) -> tuple[httpx.Response, str]:
+    """Start a Telegram file download for the /media proxy without reading the body.
+
+    Returns (response, content_type); the caller streams it with iter_media_body.
+    Raises MediaTooLargeError if the announced size is over media_max_download_bytes.
+    """
+    async with _get_download_semaphore():
+        url = await resolve_file_url(bot, file_id)
+    client = _get_http_client()
+    response = await client.send(client.build_request("GET", url), stream=True)
+    try:
+        response.raise_for_status()
+        if int(response.headers.get("Content-Length", 0)) > settings.media_max_download_bytes:
+            raise MediaTooLargeError(file_id)
+    except BaseException:
+        await response.aclose()
+        raise
+    content_type = mimetypes.guess_type(url)[0] or "application/octet-stream"
+    return response, content_type
+
+
+async def iter_media_body(response: httpx.Response) -> AsyncIterator[bytes]:
+    """Body of an open_media_stream response, cut off at media_max_download_bytes."""
+    sent = 0
+    try:
+        async for chunk in response.aiter_bytes():
+            sent += len(chunk)
+            if sent > settings.media_max_download_bytes:
+                logger.warning("Media proxy body over %d bytes, cut off", sent - len(chunk))
+                return
+            yield chunk
+    finally:
+        await response.aclose()
+
+
+async def close_media() -> None:
+    global _http
+    if _http is not None:
+        await _http.aclose()
+        _http = None
+
+
+async def extract_video_frame(data: bytes) -> bytes | None:
+    """First frame of a video as JPEG via ffmpeg, or None if ffmpeg is unavailable."""
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        return None
+
+    # mp4 needs a seekable input (moov atom may be at the end), so no stdin pipe.
+    fd, path = tempfile.mkstemp(suffix=".mp4")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        proc = await asyncio.create_subprocess_exec(
+            ffmpeg, "-loglevel", "error", "-i", path,
+            "-frames:v", "1", "-f", "image2", "-vcodec", "mjpeg", "pipe:1",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        frame, _ = await proc.communicate()
+        return frame if proc.returncode == 0 and frame else None
+    finally:
+        os.unlink(path)
+
+
+# --- Per-message processing ---
+
+
+async def _classify_file(bot: Bot, info: dict) -> tuple[ImageCategory, str]:
+    return await classify_image_cached(
+        info["file_unique_id"],
+        info["file_size"],
+        lambda: download_file(bot, info["file_id"]),
+    )
+
+
+async def _process_message_media(
+    bot: Bot, message: Message
+) -> tuple[dict, ImageCategory | None]:
+    """Returns (ticket_messages fields to update, image category)."""
+    fields: dict = {}
+    category: ImageCategory | None = None
+    description = ""
+
+    photo = message.raw_data.get("photo")
+    video = message.raw_data.get("video")
+
+    if photo:
+        small = pick_photo_size(photo)
+        large = max(photo, key=lambda s: s["width"] * s["height"])
+        fields["media_url"] = media_proxy_url(large["file_id"])
+        fields["media_thumbnail_url"] = media_proxy_url(small["file_id"])
+        category, description = await _classify_file(bot, small)
+
+    elif video:
+        fields["media_url"] = media_proxy_url(video["file_id"])
+        thumb = video.get("thumbnail")
+        if thumb:
+            fields["media_thumbnail_url"] = media_proxy_url(thumb["file_id"])
+            category, description = await _classify_file(bot, thumb)
+        elif 0 < video["file_size"] <= settings.media_max_download_bytes:
+            frame = await extract_video_frame(await download_file(bot, video["file_id"]))
+            if frame:
+                key = f"thumbnails/{video['file_unique_id']}.jpg"
+                fields["media_thumbnail_url"] = await storage.upload_media(
+                    key, frame, "image/jpeg"
+                )
+
+                async def _frame() -> bytes:
+                    return frame
+
+                category, description = await classify_image_cached(
+                    f"{video['file_unique_id']}:frame", len(frame), _frame
+                )
+
+    if description:
+        fields["ai_media_description"] = f"[{category}] {description}"
+    return fields, category
+
+
+async def process_ticket_media(
+    ticket_id: str,
+    messages: list[Message],
+    rows: list[dict],
+    update_category: bool = False,
+) -> None:
+    """Classify media on freshly written ticket_messages rows and batch the results back.
+
+    When ``update_category`` is set (media-only ticket, no text enrichment running),
+    the first relevant image category becomes the ticket's ai_category.
+    """
+    if _bot is None:
+        return
+    rows_by_tg_id = {row.get("telegram_message_id"): row for row in rows}
+    targets = [
+        m
+        for m in messages
+        if ("photo" in m.raw_data or "video" in m.raw_data)
+        and m.telegram_message_id in rows_by_tg_id
+    ]
+    if not targets:
+        return
+
+    results = await asyncio.gather(
+        *(_process_message_media(_bot, m) for m in targets), return_exceptions=True
+    )
+
+    updated_rows: list[dict] = []
+    ticket_category: TicketCategory | None = None
+    for message, result in zip(targets, results):
+        if isinstance(result, BaseException):
+            logger.error(
+                "Media processing failed for message %d on ticket %s: %s",
+                message.telegram_message_id,
+                ticket_id,
+                result,
+            )
+            continue
+        fields, category = result
+        if fields:
+            updated_rows.append({"id": rows_by_tg_id[message.telegram_message_id]["id"], **fields})
+        if ticket_category is None and category is not None:
+            ticket_category = IMAGE_TO_TICKET_CATEGORY.get(category)
+
+    try:
+        await storage.update_ticket_messages_media(updated_rows)
+        if update_category and ticket_category is not None:
+            await storage.update_ticket(ticket_id, category=ticket_category)
+    except Exception as e:
+        logger.error("Failed to write media results for ticket %s: %s", ticket_id, e)
+        return
+
+    logger.info(
+        "Media stage for ticket %s — %d/%d attachments processed",
+        ticket_id,
+        len(updated_rows),
+        len(targets),
+    )
@@ -0,0 +1,358 @@
+"""In-process metrics exposed in the Prometheus text format on GET /metrics.
+
+Counters, gauges and histograms are plain dicts keyed by label values. Recording
+is a dict lookup, a bisect over the bucket bounds and two additions. No locks are
+taken because everything records from the event loop thread. Label values must
+stay low-cardinality: stage names, storage method names, classification outcomes.
+Never use ids or free text.
+
+What gets recorded where:
+
+- ``fleetrelay_stage_seconds{stage}``: pipeline stages in bot.py
+- ``fleetrelay_classification_seconds{layer}``: classifier.py, by deciding layer
+- ``fleetrelay_storage_seconds{method}``: every public storage backend coroutine
+- ``fleetrelay_openai_seconds{call,outcome}``: every chat completion request
+- ``fleetrelay_messages_total{result,source}``: each raw_messages audit row
+- ``fleetrelay_event_loop_lag_seconds``: how late a periodic wakeup fires
+- ``fleetrelay_http_pool_wait_seconds{upstream}``: connection waits in transport.py
+- ``fleetrelay_startup_seconds{phase}``: imports, client setup and warm-up in main.py
+- ``fleetrelay_overload_level``, ``fleetrelay_shed_total{action}``: load shedding (overload.py)
+- ``fleetrelay_ai_budget_throttled_total{scope}``: AI calls over budget (budget.py)
+- ``fleetrelay_incident_reports_total{outcome}``, ``fleetrelay_enrichment_reused_total``:
+  incident clustering (incidents.py, bot.py)
+- ``fleetrelay_image_cache_lookups_total{result}``,
+  ``fleetrelay_image_cache_bytes_avoided_total{kind}``: image cache (image_cache.py)
+
+Histograms created with ``span=`` also open a trace span (see tracing.py) around
+everything they time, named ``<span>:<first label>``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import functools
+import inspect
+import time
+from collections.abc import Callable
+
+from src.tracing import end_span, start_span
+
+# Latency buckets in seconds: sub-millisecond Layer-1 work up to slow AI calls.
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+_registry: list[_Metric] = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        _registry.append(self)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def _samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(v)}"
+            for labels, v in sorted(self._values.items())
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def _samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(v)}"
+            for labels, v in sorted(self._values.items())
+        ]
+
+
+class _HistogramSeries:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, n_buckets: int) -> None:
+        self.counts = [0] * (n_buckets + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+
+class _Timer:
+    """Context manager that observes its elapsed time into a histogram."""
+
+    __slots__ = ("_histogram", "_labels", "_start", "_span")
+
+    def __init__(self, histogram: Histogram, labels: tuple[str, ...]) -> None:
+        self._histogram = histogram
+        self._labels = labels
+
+    def __enter__(self) -> _Timer:
+        self._span = self._histogram.start_span(self._labels)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: object, *exc: object) -> None:
+        self._histogram.observe(time.perf_counter() - self._start, *self._labels)
+        end_span(self._span, error=exc_type is not None)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+        span: str = "",
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.span = span
+        self._series: dict[tuple[str, ...], _HistogramSeries] = {}
+
+    def start_span(self, labels: tuple[str, ...]) -> object:
+        if not self.span:
+            return None
+        return start_span(f"{self.span}:{labels[0]}" if labels else self.span)
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = _HistogramSeries(len(self.buckets))
+        series.counts[bisect.bisect_left(self.buckets, value)] += 1
+        series.sum += value
+        series.count += 1
+
+    def time(self, *labels: str) -> _Timer:
+        return _Timer(self, labels)
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return series.count if series else 0
+
+    def _samples(self) -> list[str]:
+        lines = []
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, n in zip((*self.buckets, float("inf")), series.counts):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+                )
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {_format_value(series.sum)}")
+            lines.append(f"{self.name}_count{label_str} {series.count}")
+        return lines
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text exposition format (0.0.4)."""
+    lines: list[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- FleetRelay metrics ---
+
+STAGE_SECONDS = Histogram(
+    "fleetrelay_stage_seconds",
+    "Latency of message pipeline stages.",
+    ("stage",),
+    span="stage",
+)
+CLASSIFICATION_SECONDS = Histogram(
+    "fleetrelay_classification_seconds",
+    "Latency of classification, by the layer that decided.",
+    ("layer",),
+)
+STORAGE_SECONDS = Histogram(
+    "fleetrelay_storage_seconds",
+    "Latency of storage backend methods.",
+    ("method",),
+    span="storage",
+)
+OPENAI_SECONDS = Histogram(
+    "fleetrelay_openai_seconds",
+    "Latency of OpenAI chat completion requests.",
+    ("call", "outcome"),
+)
+CLASSIFICATIONS_TOTAL = Counter(
+    "fleetrelay_classifications_total",
+    "Messages classified, by detected language and the layer that decided. The"
+    " deterministic share of a language is its Layer 1 coverage.",
+    ("language", "layer"),
+)
+MESSAGES_TOTAL = Counter(
+    "fleetrelay_messages_total",
+    "Messages written to the raw_messages audit log, by outcome.",
+    ("result", "source"),
+)
+SPECULATIVE_LEGS_TOTAL = Counter(
+    "fleetrelay_speculative_legs_total",
+    "Concurrent pipeline steps (lookups, classify) by outcome: used, discarded (finished after"
+    " an earlier step routed the message) or cancelled (still running, e.g. an AI call).",
+    ("leg", "outcome"),
+)
+UPDATES_TOTAL = Counter(
+    "fleetrelay_updates_total",
+    "Telegram updates received on the webhook.",
+)
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "fleetrelay_event_loop_lag_seconds",
+    "How late a periodic event loop wakeup fired.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+HTTP_POOL_WAIT_SECONDS = Histogram(
+    "fleetrelay_http_pool_wait_seconds",
+    "Time from handing a request to the shared transport until it had a connection.",
+    ("upstream",),
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+HTTP_CONNECTIONS_TOTAL = Counter(
+    "fleetrelay_http_connections_total",
+    "Outbound HTTP requests by upstream and whether they opened a connection or reused one.",
+    ("upstream", "connection"),
+)
+STARTUP_SECONDS = Gauge(
+    "fleetrelay_startup_seconds",
+    "Duration of each startup and warm-up phase of this process.",
+    ("phase",),
+)
+OVERLOAD_LEVEL = Gauge(
+    "fleetrelay_overload_level",
+    "Load shedding level: 0 normal, 1 enrichment deferred, 2 audit batched, 3 AI skipped.",
+)
+SHED_TOTAL = Counter(
+    "fleetrelay_shed_total",
+    "Work shed under overload: enrichment_deferred, audit_batched or ai_skipped.",
+    ("action",),
+)
+AI_BUDGET_THROTTLED_TOTAL = Counter(
+    "fleetrelay_ai_budget_throttled_total",
+    "Layer-2 calls skipped because a driver or chat was over its AI budget, by scope.",
+    ("scope",),
+)
+INCIDENT_REPORTS_TOTAL = Counter(
+    "fleetrelay_incident_reports_total",
+    "New tickets with text by incident outcome: new, clustered (near-duplicate of a recent"
+    " ticket in the same connection) or skipped (too short to compare). The duplicate rate"
+    " is clustered / (new + clustered).",
+    ("outcome",),
+)
+ENRICHMENT_REUSED_TOTAL = Counter(
+    "fleetrelay_enrichment_reused_total",
+    "Enrichment AI calls saved by reusing the result of an incident's first ticket.",
+)
+IMAGE_CACHE_LOOKUPS_TOTAL = Counter(
+    "fleetrelay_image_cache_lookups_total",
+    "Image classifications by cache result: exact_hit (same file_unique_id), near_hit"
+    " (dHash within IMAGE_HASH_MAX_DISTANCE) or miss (vision call made).",
+    ("result",),
+)
+IMAGE_CACHE_BYTES_AVOIDED_TOTAL = Counter(
+    "fleetrelay_image_cache_bytes_avoided_total",
+    "Bytes not downloaded from Telegram (download) or not sent to the vision model"
+    " (vision) thanks to image cache hits.",
+    ("kind",),
+)
+EVENT_LOOP_LAG_LAST = Gauge(
+    "fleetrelay_event_loop_lag_last_seconds",
+    "Event loop lag measured at the most recent wakeup.",
+)
+
+
+# --- Helpers ---
+
+
+def instrument_methods(histogram: Histogram) -> Callable[[type], type]:
+    """Class decorator: time every public coroutine method, labelled by method name."""
+
+    def decorate(cls: type) -> type:
+        for name, method in list(vars(cls).items()):
+            if name.startswith("_") or not inspect.iscoroutinefunction(method):
+                continue
+            setattr(cls, name, _timed_coroutine(method, histogram, name))
+        return cls
+
+    return decorate
+
+
+def _timed_coroutine(method: Callable, histogram: Histogram, label: str) -> Callable:
+    @functools.wraps(method)
+    async def timed(*args, **kwargs):
+        with histogram.time(label):
+            return await method(*args, **kwargs)
+
+    return timed
+
+
+async def monitor_event_loop_lag(interval: float = 0.5) -> None:
+    """Sleep ``interval`` in a loop and record how much later than asked each wakeup is.
+
+    Lag here means something held the loop: a sync Supabase call, a long regex,
+    a CPU-bound step that should have gone to an executor.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - start - interval)
+        EVENT_LOOP_LAG_SECONDS.observe(lag)
+        EVENT_LOOP_LAG_LAST.set(lag)
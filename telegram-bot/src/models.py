@@ -108,6 +108,7 @@ class Message(BaseModel):
     has_document: bool = False
     source: MessageSource = MessageSource.DM
     business_connection_id: str = ""
+    media_group_id: str = ""
     raw_data: dict = Field(default_factory=dict)
     created_at: datetime = Field(default_factory=_utcnow)
 
@@ -136,3 +137,20 @@ class BufferedMessage(BaseModel):
     message: Message
     classification: ClassificationResult
     expires_at: datetime
+    # The rest of a burst classified together with ``message``
+    extra_messages: list[Message] = Field(default_factory=list)
+
+
+# --- API ---
+
+
+class SendReplyRequest(BaseModel):
+    """POST /api/send-reply body (PRD-02). Pass ticket_message_id when the dashboard
+    has already inserted the outbound ticket_messages row; otherwise the bot creates it."""
+
+    ticket_id: str
+    message_text: str = Field(min_length=1, max_length=4096)
+    reply_to_message_id: int | None = None
+    ticket_message_id: str | None = None
+    sender_name: str = ""
+    sender_user_id: str | None = None
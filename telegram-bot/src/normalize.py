@@ -0,0 +1,178 @@
+"""Text normalization for the Russian and Uzbek Layer-1 keyword tables.
+
+Drivers write in English, Uzbek (Latin and Cyrillic) and Russian, often mixing
+scripts and dropping apostrophes ("yoqilgi" for "yoqilg'i"). Before matching,
+text is folded into one canonical Latin form:
+
+- case folding;
+- transliteration of Russian and Uzbek Cyrillic (``мотор ишламаяпти`` ->
+  ``motor ishlamayapti``). A word-initial ё is "yo" as in Uzbek (``ёрилди`` ->
+  ``yorildi``), elsewhere "e" as Russian drivers usually type it;
+- apostrophe removal, so Uzbek o'/g' and their look-alikes (ʻ ’ `) match the
+  bare letters;
+- diacritic folding (NFKD, combining marks dropped).
+
+Keywords go through the same folding when the tables are compiled, plus a
+light stemmer that strips one inflectional ending (``колесо`` -> ``koles``,
+``yorildi`` -> ``yoril``). A message word matches a keyword stem when it starts
+with it, so ``kolesa``, ``kolesom`` and ``yorilgan`` all hit. Uzbek negation
+(-ma-) is part of the stem, so ``ishlamayapti`` never matches ``ishlayapti``.
+Stems shorter than four letters (``ne``, ``dtp``) only match a whole word, and
+stems shorter than six (``shin``, ``motor``) only a whole word or the stem plus
+one of the known endings (``shina``, ``motorom``), never ``shiny`` or
+``motorway``. The index is only consulted for text detected as Russian or Uzbek
+(see detect_language), so English never reaches it.
+
+A keyword of several words matches when all of its stems appear in the
+message, in any order.
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+
+from src.models import TicketCategory
+
+_CYRILLIC_TO_LATIN = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e",
+    "ж": "j", "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m",
+    "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u",
+    "ф": "f", "х": "x", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "sh", "ъ": "",
+    "ы": "i", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+    # Uzbek Cyrillic
+    "ў": "o", "қ": "q", "ғ": "g", "ҳ": "h",
+}  # fmt: skip
+_APOSTROPHES = "'ʻʼ‘’`´"
+_FOLD_TABLE = str.maketrans({**_CYRILLIC_TO_LATIN, **dict.fromkeys(_APOSTROPHES, "")})
+
+# Uzbek ё starts words (ёрдам, ёқилғи) and is "yo" in Latin; Russian ё inside a
+# word (колёса) is usually typed as е.
+_INITIAL_YO_RE = re.compile(r"\bё")
+_WORD_RE = re.compile(r"\w+")
+
+# One ending is stripped from keywords, longest first. Russian reflexive and case
+# endings, Uzbek tense, plural, case and possessive suffixes. No Uzbek negation.
+_SUFFIXES = sorted(
+    {
+        # Russian. Reflexive verbs lose only -sya, so "zavoditsya" keeps "zavodit"
+        # and cannot match "zavode" (at the factory).
+        "sya", "aet", "yaet", "ami", "yami", "ogo", "ego", "iya", "iyu", "ii",
+        "om", "ov", "oy", "ey", "ax", "am", "ya", "yu", "a", "o", "u", "e", "i",
+        # Uzbek
+        "yapti", "yapman", "moqda", "gan", "dim", "di", "lar", "ning", "dan", "ga", "da", "ni",
+    },
+    key=len,
+    reverse=True,
+)  # fmt: skip
+_MIN_STEM = 4  # shorter stems only match a whole word
+# Stems shorter than this collide with English words ("shin" in "shiny", "motor" in
+# "motorway"), so they match only with one of the endings above, not as a prefix.
+_MIN_PREFIX_STEM = 6
+
+_CYRILLIC_RE = re.compile(r"[\u0400-\u04ff]")
+# Uzbek markers on lowercased text: o'/g', common words, verb endings. The leading
+# lookahead lets the scan skip positions that cannot start any of them.
+_UZ_CYRILLIC_RE = re.compile(
+    r"(?=[ўқғҳкёйэриям])(?:[ўқғҳ]|\b(?:керак|ёрдам|йўқ|эмас|рахмат|раҳмат)\b"
+    r"|(?:илди|япти|япман|моқда|мади)\b)"
+)
+_UZ_LATIN_RE = re.compile(
+    r"(?=[ogkyersqim])(?:[og][ʻʼ'‘’`][a-z]|\b(?:kerak|yordam|yoq|emas|rahmat|salom|qayer)"
+    r"|(?:ildi|yapti|yapman|moqda|madi|maydi)\b)"
+)
+_LANGUAGE_SAMPLE_CHARS = 200
+
+
+def fold(text: str) -> str:
+    """Case-folded, Cyrillic transliterated, apostrophes and diacritics removed."""
+    if text.isascii():  # most messages: only case and apostrophes to fold
+        text = text.lower()
+        if "'" in text or "`" in text:
+            text = text.replace("'", "").replace("`", "")
+        return text
+    text = text.casefold()
+    if "ё" in text:
+        text = _INITIAL_YO_RE.sub("yo", text)
+    text = text.translate(_FOLD_TABLE)
+    if text.isascii():
+        return text
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+
+def folded_words(text: str) -> list[str]:
+    return _WORD_RE.findall(fold(text))
+
+
+def stem(word: str) -> str:
+    """``word`` without its inflectional ending, if at least _MIN_STEM letters remain."""
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= _MIN_STEM:
+            return word[: -len(suffix)]
+    return word
+
+
+def detect_language(text: str) -> str:
+    """Language label by script and a few Uzbek markers: ru, uz, en, or none for empty text.
+
+    Taken from the start of the text; a label for metrics and reports. Keyword
+    matching uses it only to decide whether stems transliterated from Cyrillic
+    apply (classifier._match_multilingual). Latin-script Uzbek without a marker
+    is labelled "en".
+    """
+    sample = text[:_LANGUAGE_SAMPLE_CHARS].lower()
+    if not sample.strip():
+        return "none"
+    if _CYRILLIC_RE.search(sample):
+        return "uz" if _UZ_CYRILLIC_RE.search(sample) else "ru"
+    return "uz" if _UZ_LATIN_RE.search(sample) else "en"
+
+
+def _trie_pattern(stems: set[str], prefix: str = "") -> str:
+    """Regex matching any of ``stems`` (all starting with ``prefix``), longest first.
+
+    A stem that extends another is tried before it, so the longer one is reported.
+    Short stems must end the word, optionally with an inflectional ending.
+    """
+    branches = []
+    for letter in sorted({s[len(prefix)] for s in stems if len(s) > len(prefix)}):
+        longer = {s for s in stems if s.startswith(prefix + letter)}
+        branches.append(re.escape(letter) + _trie_pattern(longer, prefix + letter))
+    if prefix in stems:
+        if len(prefix) >= _MIN_PREFIX_STEM:
+            branches.append("")
+        elif len(prefix) >= _MIN_STEM:
+            branches.append(rf"(?=(?:{'|'.join(_SUFFIXES)})?\b)")
+        else:
+            branches.append(r"\b")
+    if len(branches) == 1:
+        return branches[0]
+    return f"(?:{'|'.join(branches)})"
+
+
+class KeywordIndex:
+    """Per-language keyword tables compiled to folded stems, matched with one regex scan."""
+
+    def __init__(self, tables: dict[str, dict[str, tuple[TicketCategory, int]]]) -> None:
+        self._entries: list[tuple[frozenset[str], TicketCategory, int]] = []
+        for keywords in tables.values():
+            for keyword, (category, urgency) in keywords.items():
+                stems = frozenset(stem(w) for w in folded_words(keyword))
+                self._entries.append((stems, category, urgency))
+        # Highest urgency first, so the first complete entry is the answer.
+        self._entries.sort(key=lambda entry: -entry[2])
+        # Stems as a prefix trie, so each position branches on one letter instead of
+        # trying every stem. The lookahead on first letters lets most positions fail
+        # before entering the trie.
+        stems = {s for entry in self._entries for s in entry[0]}
+        first_letters = re.escape("".join(sorted({s[0] for s in stems})))
+        self._pattern = re.compile(rf"\b(?=[{first_letters}])(?:{_trie_pattern(stems)})")
+
+    def match(self, folded: str) -> tuple[TicketCategory | None, int]:
+        """(category, urgency) of the most urgent keyword in ``folded`` text, or (None, 0)."""
+        found = set(self._pattern.findall(folded))
+        if found:
+            for stems, category, urgency in self._entries:
+                if stems <= found:
+                    return category, urgency
+        return None, 0
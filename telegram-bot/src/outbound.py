@@ -0,0 +1,380 @@
+"""Outbound operator replies: rate-limit-aware delivery to Telegram.
+
+POST /api/send-reply records the reply as an outbound ticket_messages row with
+delivery_status "pending" and enqueues it here. The table is the persistent
+queue: pending rows are reloaded on startup, so a restart never loses a reply.
+Delivery is at-least-once. A crash between the send and the next status flush
+resends that reply.
+
+Scheduling:
+
+- one FIFO per chat, so replies in a chat keep their order and a slow or
+  rate-limited chat never holds up the others;
+- a token bucket per chat (groups ~20/min, private chats ~1/s) plus a global
+  bucket (~30/s overall), all configured in settings.outbound_*;
+- a 429 from Telegram pauses only that chat for ``retry_after`` and does not
+  count as a failed attempt;
+- network errors and timeouts retry with backoff, up to outbound_max_attempts.
+  400/403 errors (chat gone, bot removed) fail at once. Failed replies are
+  marked delivery_status "failed" for the dashboard to show.
+
+Routing follows PRD-02. Business DM tickets send with business_connection_id.
+Group tickets reply to ``reply_to_message_id``, or else to the driver's latest
+message on the ticket. Sent message ids and statuses are written back to
+ticket_messages in batches every outbound_flush_seconds.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+from collections import deque
+from dataclasses import dataclass
+from datetime import timedelta
+
+from telegram import Bot, ReplyParameters
+from telegram.error import BadRequest, Forbidden, RetryAfter
+
+from src.config import settings
+from src.metrics import Counter
+from src.models import MessageSource
+from src.storage import storage
+
+logger = logging.getLogger(__name__)
+
+OUTBOUND_TOTAL = Counter(
+    "fleetrelay_outbound_total",
+    "Outbound reply send attempts, by outcome.",
+    ("outcome",),
+)
+
+
+class TokenBucket:
+    """Classic token bucket on the event loop clock: ``rate`` tokens/s, at most ``capacity``."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+
+@dataclass
+class OutboundJob:
+    row: dict  # the ticket_messages row; only its id is used for status writes
+    chat_id: int
+    text: str
+    business_connection_id: str = ""
+    reply_to_message_id: int | None = None
+    is_group: bool = False
+    attempts: int = 0
+
+
+# Seconds before retrying a network error; doubles with each attempt
+_RETRY_BASE_SECONDS = 2.0
+
+
+def _seconds(value: int | float | timedelta) -> float:
+    return value.total_seconds() if isinstance(value, timedelta) else float(value)
+
+
+class OutboundDispatcher:
+    def __init__(self, bot: Bot) -> None:
+        self._bot = bot
+        self._queues: dict[int, deque[OutboundJob]] = {}
+        self._buckets: dict[int, TokenBucket] = {}
+        self._paused_until: dict[int, float] = {}
+        self._ready: list[tuple[float, int, int]] = []  # (ready_at, seq, chat_id)
+        self._scheduled: set[int] = set()
+        self._busy: set[int] = set()
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._in_flight = asyncio.Semaphore(settings.outbound_max_in_flight)
+        self._global: TokenBucket | None = None
+        self._results: list[dict] = []
+        self._tasks: set[asyncio.Task] = set()
+
+    # --- Queueing ---
+
+    def enqueue(self, job: OutboundJob) -> None:
+        self._queues.setdefault(job.chat_id, deque()).append(job)
+        self._schedule(job.chat_id, 0.0)
+
+    def _schedule(self, chat_id: int, delay: float) -> None:
+        if chat_id in self._scheduled or chat_id in self._busy:
+            return
+        loop = asyncio.get_running_loop()
+        self._scheduled.add(chat_id)
+        heapq.heappush(self._ready, (loop.time() + delay, next(self._seq), chat_id))
+        self._wakeup.set()
+
+    def _bucket(self, job: OutboundJob, now: float) -> TokenBucket:
+        bucket = self._buckets.get(job.chat_id)
+        if bucket is None:
+            rate = (
+                settings.outbound_group_per_minute / 60
+                if job.is_group
+                else settings.outbound_private_per_second
+            )
+            # Capacity 1: evenly spaced sends, never a burst that trips the per-minute cap.
+            bucket = self._buckets[job.chat_id] = TokenBucket(rate, 1, now)
+        return bucket
+
+    def start(self) -> None:
+        for coro in (self.run(), self.run_flusher()):
+            task = asyncio.create_task(coro)
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def stats(self) -> dict:
+        return {
+            "queued": sum(len(q) for q in self._queues.values()),
+            "in_flight": len(self._busy),
+            "chats": len(self._queues),
+            "pending_status_writes": len(self._results),
+        }
+
+    # --- Dispatch loop ---
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._global = TokenBucket(
+            settings.outbound_global_per_second,
+            max(1.0, settings.outbound_global_per_second / 5),
+            loop.time(),
+        )
+        while True:
+            if not self._ready:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            ready_at, _, chat_id = self._ready[0]
+            now = loop.time()
+            if ready_at > now:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=ready_at - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._ready)
+            self._scheduled.discard(chat_id)
+            queue = self._queues.get(chat_id)
+            if not queue:
+                self._queues.pop(chat_id, None)
+                continue
+
+            job = queue[0]
+            bucket = self._bucket(job, now)
+            delay = max(
+                bucket.delay(now),
+                self._global.delay(now),
+                self._paused_until.get(chat_id, 0.0) - now,
+            )
+            if delay > 0:
+                self._schedule(chat_id, delay)
+                continue
+
+            await self._in_flight.acquire()
+            now = loop.time()
+            bucket.take(now)
+            self._global.take(now)
+            queue.popleft()
+            self._busy.add(chat_id)
+            task = asyncio.create_task(self._send(job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, job: OutboundJob) -> None:
+        retry_delay: float | None = None
+        try:
+            reply_parameters = (
+                ReplyParameters(
+                    message_id=job.reply_to_message_id, allow_sending_without_reply=True
+                )
+                if job.reply_to_message_id
+                else None
+            )
+            sent = await self._bot.send_message(
+                chat_id=job.chat_id,
+                text=job.text,
+                business_connection_id=job.business_connection_id or None,
+                reply_parameters=reply_parameters,
+            )
+            OUTBOUND_TOTAL.inc("sent")
+            self._record(job, "sent", sent.message_id)
+
+        except RetryAfter as e:
+            OUTBOUND_TOTAL.inc("rate_limited")
+            wait = _seconds(e.retry_after)
+            self._paused_until[job.chat_id] = asyncio.get_running_loop().time() + wait
+            logger.warning("Telegram 429 for chat %d — pausing %.0fs", job.chat_id, wait)
+            retry_delay = wait
+
+        except (BadRequest, Forbidden) as e:
+            OUTBOUND_TOTAL.inc("failed")
+            logger.error(
+                "Reply %s to chat %d rejected: %s", job.row.get("id"), job.chat_id, e
+            )
+            self._record(job, "failed")
+
+        except Exception as e:  # NetworkError/TimedOut and anything unexpected
+            job.attempts += 1
+            if job.attempts >= settings.outbound_max_attempts:
+                OUTBOUND_TOTAL.inc("failed")
+                logger.error(
+                    "Reply %s to chat %d failed after %d attempts: %s",
+                    job.row.get("id"),
+                    job.chat_id,
+                    job.attempts,
+                    e,
+                )
+                self._record(job, "failed")
+            else:
+                OUTBOUND_TOTAL.inc("retried")
+                retry_delay = _RETRY_BASE_SECONDS * 2 ** (job.attempts - 1)
+                logger.warning(
+                    "Reply %s to chat %d failed (attempt %d), retrying in %.0fs: %s",
+                    job.row.get("id"),
+                    job.chat_id,
+                    job.attempts,
+                    retry_delay,
+                    e,
+                )
+
+        finally:
+            self._in_flight.release()
+            self._busy.discard(job.chat_id)
+
+        queue = self._queues.setdefault(job.chat_id, deque())
+        if retry_delay is not None:
+            queue.appendleft(job)  # keep order within the chat
+            self._schedule(job.chat_id, retry_delay)
+        elif queue:
+            self._schedule(job.chat_id, 0.0)
+        else:
+            self._queues.pop(job.chat_id, None)
+            self._paused_until.pop(job.chat_id, None)
+
+    # --- Status write-back ---
+
+    def _record(
+        self, job: OutboundJob, status: str, telegram_message_id: int | None = None
+    ) -> None:
+        # Only the delivery columns: the row may have changed since it was queued
+        row = {"id": job.row["id"], "delivery_status": status}
+        if telegram_message_id is not None:
+            row["telegram_message_id"] = telegram_message_id
+        self._results.append(row)
+
+    async def flush(self) -> None:
+        if not self._results:
+            return
+        rows, self._results = self._results, []
+        try:
+            await storage.update_ticket_messages_delivery(rows)
+        except Exception as e:
+            logger.error("Failed to write %d delivery results: %s", len(rows), e)
+            self._results[:0] = rows  # retry on the next flush
+
+    async def run_flusher(self) -> None:
+        while True:
+            await asyncio.sleep(settings.outbound_flush_seconds)
+            await self.flush()
+
+
+# --- Routing ---
+
+
+async def build_job(
+    ticket: dict, row: dict, reply_to_message_id: int | None = None
+) -> OutboundJob:
+    """Route a reply per PRD-02: business DMs via business_connection_id, groups as a reply."""
+    if ticket.get("source_type") == MessageSource.DM.value:
+        return OutboundJob(
+            row=row,
+            chat_id=int(ticket["source_chat_id"]),
+            text=row["content_text"],
+            business_connection_id=ticket.get("business_connection_id") or "",
+        )
+    if reply_to_message_id is None:
+        reply_to_message_id = await storage.get_last_inbound_telegram_message_id(ticket["id"])
+    return OutboundJob(
+        row=row,
+        chat_id=int(ticket["source_chat_id"]),
+        text=row["content_text"],
+        reply_to_message_id=reply_to_message_id,
+        is_group=True,
+    )
+
+
+_TICKET_ROUTING_COLUMNS = "id, source_type, source_chat_id, business_connection_id"
+
+
+async def get_ticket_routing(ticket_id: str) -> dict | None:
+    tickets = await storage.get_tickets_by_ids([ticket_id], _TICKET_ROUTING_COLUMNS)
+    return tickets[0] if tickets else None
+
+
+async def recover_pending(dispatcher: OutboundDispatcher) -> int:
+    """Re-enqueue replies left pending by a previous process. Returns how many."""
+    rows = await storage.get_pending_outbound_messages()
+    if not rows:
+        return 0
+    tickets = {
+        t["id"]: t
+        for t in await storage.get_tickets_by_ids(
+            list({r["ticket_id"] for r in rows}), _TICKET_ROUTING_COLUMNS
+        )
+    }
+    count = 0
+    for row in rows:
+        ticket = tickets.get(row["ticket_id"])
+        if ticket is None:
+            continue
+        dispatcher.enqueue(await build_job(ticket, row))
+        count += 1
+    logger.info("Recovered %d pending outbound replies", count)
+    return count
+
+
+_dispatcher: OutboundDispatcher | None = None
+
+
+def get_dispatcher() -> OutboundDispatcher | None:
+    return _dispatcher
+
+
+async def start_outbound(bot: Bot) -> OutboundDispatcher:
+    global _dispatcher
+    _dispatcher = OutboundDispatcher(bot)
+    _dispatcher.start()
+    try:
+        await recover_pending(_dispatcher)
+    except Exception as e:
+        logger.error("Failed to recover pending outbound replies: %s", e)
+    return _dispatcher
+
+
+async def stop_outbound() -> None:
+    if _dispatcher is not None:
+        await _dispatcher.flush()
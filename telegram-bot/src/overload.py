@@ -0,0 +1,115 @@
+"""Adaptive load shedding when ingest falls behind.
+
+The controller watches two signals: updates waiting at the ingest gate and
+event loop lag, smoothed over a few samples. Each is divided by its configured
+limit (OVERLOAD_QUEUE_DEPTH, OVERLOAD_LOOP_LAG_SECONDS), and the larger ratio
+is the pressure. Pressure maps to a degradation level, cheapest sacrifice first:
+
+1. DEFER_ENRICHMENT: ticket summaries wait until the backlog clears (bot.py).
+2. BATCH_AUDIT: raw_messages audit rows are collected and written in one
+   insert every OVERLOAD_AUDIT_FLUSH_SECONDS instead of one insert per outcome.
+3. SKIP_AI: Layer 2 is skipped. A message Layer 1 and the local model cannot
+   decide becomes an unclassified ticket straight away (classifier.py).
+
+Escalation is immediate, straight to the level the pressure calls for. Recovery
+is one level at a time, and only after pressure has stayed below half of the
+current level's threshold for OVERLOAD_RECOVER_SECONDS, so a backlog that
+drains and refills does not flap between levels.
+"""
+
+from __future__ import annotations
+
+import logging
+from enum import IntEnum
+
+from src.config import settings
+from src.metrics import OVERLOAD_LEVEL
+
+logger = logging.getLogger(__name__)
+
+
+class OverloadLevel(IntEnum):
+    NORMAL = 0
+    DEFER_ENRICHMENT = 1
+    BATCH_AUDIT = 2
+    SKIP_AI = 3
+
+
+# Pressure at which each level above NORMAL is entered
+_THRESHOLDS = {
+    OverloadLevel.DEFER_ENRICHMENT: 1.0,
+    OverloadLevel.BATCH_AUDIT: 2.0,
+    OverloadLevel.SKIP_AI: 4.0,
+}
+# Recovery needs pressure below this fraction of the current level's threshold
+_RECOVER_FRACTION = 0.5
+# Loop lag is smoothed (EWMA) so one GC pause or slow regex does not trip a level
+_LAG_SMOOTHING = 0.3
+
+
+class OverloadController:
+    def __init__(
+        self,
+        queue_depth: int,
+        loop_lag_seconds: float,
+        recover_seconds: float,
+    ) -> None:
+        self._queue_depth = max(1, queue_depth)
+        self._loop_lag_seconds = loop_lag_seconds
+        self._recover_seconds = recover_seconds
+        self.level = OverloadLevel.NORMAL
+        self.pressure = 0.0
+        self._lag = 0.0
+        self._calm_since: float | None = None
+
+    def observe(self, waiting: int, loop_lag: float, now: float) -> OverloadLevel:
+        """Update the level from the current queue depth and loop lag; returns the new level."""
+        self._lag += _LAG_SMOOTHING * (loop_lag - self._lag)
+        pressure = waiting / self._queue_depth
+        if self._loop_lag_seconds > 0:
+            pressure = max(pressure, self._lag / self._loop_lag_seconds)
+        self.pressure = pressure
+
+        target = OverloadLevel.NORMAL
+        for level, threshold in _THRESHOLDS.items():
+            if pressure >= threshold:
+                target = level
+        if target > self.level:
+            self._set(target)
+            self._calm_since = None
+        elif self.level > OverloadLevel.NORMAL:
+            if pressure >= _THRESHOLDS[self.level] * _RECOVER_FRACTION:
+                self._calm_since = None
+            elif self._calm_since is None:
+                self._calm_since = now
+            elif now - self._calm_since >= self._recover_seconds:
+                self._set(OverloadLevel(self.level - 1))
+                self._calm_since = now if self.level > OverloadLevel.NORMAL else None
+        return self.level
+
+    def _set(self, level: OverloadLevel) -> None:
+        log = logger.warning if level > self.level else logger.info
+        log(
+            "Overload level %d (%s) -> %d (%s), pressure %.2f",
+            self.level,
+            self.level.name.lower(),
+            level,
+            level.name.lower(),
+            self.pressure,
+        )
+        self.level = level
+        OVERLOAD_LEVEL.set(int(level))
+
+    def stats(self) -> dict:
+        return {
+            "level": int(self.level),
+            "name": self.level.name.lower(),
+            "pressure": round(self.pressure, 2),
+        }
+
+
+overload = OverloadController(
+    settings.overload_queue_depth,
+    settings.overload_loop_lag_seconds,
+    settings.overload_recover_seconds,
+)
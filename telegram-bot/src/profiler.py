@@ -0,0 +1,81 @@
+"""On-demand sampling profiler behind GET /debug/profile.
+
+A daemon thread wakes every ``interval`` seconds, reads the target thread's
+current Python stack via sys._current_frames() and counts identical stacks. The
+target is normally the event loop thread. The result is in the folded-stack
+format (``frame;frame;frame count`` per line), which flamegraph.pl, speedscope
+and inferno read directly::
+
+    curl -H "X-Debug-Token: $DEBUG_TOKEN" \\
+        "https://bot.example.com/debug/profile?seconds=30" > profile.folded
+    flamegraph.pl profile.folded > profile.svg
+
+The sampled thread does no extra work. The sampler holds the GIL for a few
+microseconds per frame on each sample, so at the default 5 ms interval the
+overhead is around 1%.
+
+An idle event loop shows up as time in ``select``/``epoll`` (base_events.py:
+_run_once). Anything else at the top of a stack is work that runs on the loop
+and holds it: sync Supabase calls, regexes, JSON parsing.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+
+MAX_SECONDS = 120.0
+MIN_INTERVAL = 0.001
+
+_lock = threading.Lock()
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    filename = os.path.basename(code.co_filename)
+    return f"{code.co_name} ({filename}:{frame.f_lineno})"
+
+
+def _fold(frame: FrameType | None) -> str:
+    labels: list[str] = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()  # root first, as the folded format expects
+    return ";".join(labels)
+
+
+def sample_thread(thread_id: int, seconds: float, interval: float) -> tuple[Counter, int]:
+    """Sample one thread's stack for ``seconds``. Returns (folded stack counts, samples).
+
+    Blocking; call it from a worker thread (asyncio.to_thread), never the loop itself.
+    """
+    if not _lock.acquire(blocking=False):
+        raise RuntimeError("a profile is already running")
+    try:
+        stacks: Counter = Counter()
+        samples = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                break  # target thread exited
+            stacks[_fold(frame)] += 1
+            samples += 1
+            del frame
+            time.sleep(interval)
+        return stacks, samples
+    finally:
+        _lock.release()
+
+
+def render_folded(stacks: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def clamp(seconds: float, interval: float) -> tuple[float, float]:
+    return min(max(seconds, 0.1), MAX_SECONDS), max(interval, MIN_INTERVAL)
@@ -0,0 +1,350 @@
+"""Bulk reclassification of raw_messages history with the current rules.
+
+Before changing keywords, dismiss patterns or prompts, run ``report`` to see
+how history would have been classified. ``apply`` writes the new
+ai_category/ai_urgency to linked tickets::
+
+    python -m src.reclassify report -o diff.jsonl
+    python -m src.reclassify report --ai --since 2025-01-01
+    python -m src.reclassify apply --min-confidence 4
+
+raw_messages is streamed in keyset-paginated pages
+(SupabaseStorage.iter_rows_keyset). Only one page, its linked tickets and a
+bounded AI result cache are held at a time, so memory use stays flat however
+large the table is. Changed rows are written to the JSONL report as they are
+found. Progress, throughput and the last (created_at, id) cursor go to
+stderr; pass ``--after`` to resume an interrupted run.
+
+What is compared:
+
+- Only rows that were classified: "created", "dismissed" and "buffered".
+  "appended" rows joined a ticket without being classified on their own
+  (an open-ticket match, or the rest of a burst or album).
+- Layer 1 (classify_deterministic) always runs. With ``--ai``, rows Layer 1
+  leaves undecided go through Layer 1.5 and GPT-4o-mini as in production.
+  Identical texts are classified once (LRU cache), and at most
+  ``--ai-concurrency`` requests are in flight. Without ``--ai`` those rows
+  are counted as undecided.
+- Ticket category and urgency are compared against the ticket as it is now,
+  which is usually the enriched value.
+- Layer 1 coverage (the share of rows classify_deterministic decides, so no
+  local model or AI call) is reported per detected language.
+
+``apply`` only touches tickets linked from "created" rows where the new
+result meets ``--min-confidence``. It issues one bulk UPDATE per distinct
+(category, urgency) pair in a page. Outcome flips (dismissed -> ticket and
+back) are reported but never applied; past tickets are not created or
+deleted.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from collections import Counter, OrderedDict, defaultdict
+from dataclasses import dataclass, field
+
+from src.classifier import classify_ai, classify_deterministic
+from src.local_model import classify_local
+from src.models import ClassificationResult, Message, MessageSource, TicketCategory
+from src.normalize import detect_language
+from src.storage import storage
+
+logger = logging.getLogger(__name__)
+
+RAW_COLUMNS = (
+    "id, created_at, telegram_message_id, telegram_user_id, chat_id, chat_type,"
+    " content_text, content_type, classification_result, classification_source, ticket_id"
+)
+CLASSIFIED_RESULTS = ("created", "dismissed", "buffered")
+_MIN_UUID = "00000000-0000-0000-0000-000000000000"
+
+
+def _message_from_row(row: dict) -> Message:
+    """Rebuild enough of a Message for classification from an audit row."""
+    content_type = row.get("content_type") or "text"
+    return Message(
+        telegram_message_id=row.get("telegram_message_id") or 0,
+        telegram_chat_id=row.get("chat_id") or 0,
+        telegram_user_id=row.get("telegram_user_id") or 0,
+        driver_id="",
+        text=row.get("content_text") or "",
+        has_photo=content_type == "photo",
+        has_video=content_type == "video",
+        has_voice=content_type == "voice",
+        has_location=content_type == "location",
+        has_document=content_type == "document",
+        source=MessageSource.DM if row.get("chat_type") == "private" else MessageSource.GROUP,
+    )
+
+
+def _category(value: object) -> str:
+    text = str(getattr(value, "value", value) or "")
+    return "other" if text == TicketCategory.UNCLASSIFIED.value else text
+
+
+class _AIClassifier:
+    """Layer 1.5 + Layer 2 for Layer-1-undecided rows, with an LRU cache and a concurrency cap."""
+
+    def __init__(self, concurrency: int, cache_size: int) -> None:
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._cache: OrderedDict[str, ClassificationResult] = OrderedDict()
+        self._cache_size = cache_size
+        self._in_flight: dict[str, asyncio.Future] = {}  # same text twice in one page
+        self.calls = 0
+        self.cache_hits = 0
+        self.failures = 0
+
+    async def classify(self, message: Message) -> ClassificationResult | None:
+        result = classify_local(message)
+        if result is not None:
+            return result
+        key = " ".join(message.text.lower().split())
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return cached
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            self.cache_hits += 1
+            return await pending
+        pending = self._in_flight[key] = asyncio.ensure_future(self._call_ai(key, message))
+        try:
+            return await pending
+        finally:
+            self._in_flight.pop(key, None)
+
+    async def _call_ai(self, key: str, message: Message) -> ClassificationResult | None:
+        async with self._semaphore:
+            result = await classify_ai(message)
+        self.calls += 1
+        if result.confidence == 0:  # fail-open result, not a real answer
+            self.failures += 1
+            return None
+        self._cache[key] = result
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+
+@dataclass
+class _Run:
+    scanned: int = 0
+    compared: int = 0
+    undecided: int = 0
+    changed: int = 0
+    tickets_updated: int = 0
+    transitions: Counter = field(default_factory=Counter)  # (old outcome, new outcome)
+    changes: Counter = field(default_factory=Counter)  # change kind -> rows
+    language_rows: Counter = field(default_factory=Counter)  # language -> rows compared
+    language_layer1: Counter = field(default_factory=Counter)  # language -> decided by Layer 1
+    cursor: tuple[str, str] | None = None
+    started: float = field(default_factory=time.perf_counter)
+
+    def progress(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        rate = self.scanned / elapsed if elapsed else 0.0
+        cursor = ",".join(self.cursor) if self.cursor else "-"
+        return (
+            f"scanned={self.scanned} compared={self.compared} changed={self.changed}"
+            f" undecided={self.undecided} {rate:,.0f} rows/s cursor={cursor}"
+        )
+
+
+def _diff(row: dict, ticket: dict | None, result: ClassificationResult) -> dict | None:
+    """Report line for a row whose outcome, category or urgency would change."""
+    old_result = row["classification_result"]
+    changes = []
+    if result.is_ticket != (old_result != "dismissed"):
+        changes.append("outcome")
+    if ticket is not None and result.is_ticket:
+        if _category(result.category) != _category(ticket.get("ai_category")):
+            changes.append("category")
+        if result.urgency != ticket.get("ai_urgency"):
+            changes.append("urgency")
+    if not changes:
+        return None
+    return {
+        "raw_message_id": row["id"],
+        "created_at": row["created_at"],
+        "ticket_id": row.get("ticket_id"),
+        "text": (row.get("content_text") or "")[:200],
+        "changes": changes,
+        "old": {
+            "result": old_result,
+            "source": row.get("classification_source"),
+            "category": ticket.get("ai_category") if ticket else None,
+            "urgency": ticket.get("ai_urgency") if ticket else None,
+        },
+        "new": {
+            "is_ticket": result.is_ticket,
+            "category": _category(result.category),
+            "urgency": result.urgency,
+            "confidence": result.confidence,
+            "layer": result.layer,
+            "reason": result.reason,
+        },
+    }
+
+
+async def _classify_page(
+    rows: list[dict], ai: _AIClassifier | None
+) -> list[ClassificationResult | None]:
+    messages = [_message_from_row(r) for r in rows]
+    results: list[ClassificationResult | None] = [classify_deterministic(m) for m in messages]
+    if ai is not None:
+        pending = [i for i, r in enumerate(results) if r is None and messages[i].text.strip()]
+        answers = await asyncio.gather(*(ai.classify(messages[i]) for i in pending))
+        for i, answer in zip(pending, answers):
+            results[i] = answer
+    return results
+
+
+async def _apply_page(updates: dict[str, ClassificationResult]) -> int:
+    """Bulk-write category/urgency: one UPDATE per distinct (category, urgency) pair."""
+    groups: dict[tuple[str, int], list[str]] = defaultdict(list)
+    for ticket_id, result in updates.items():
+        groups[(_category(result.category), result.urgency)].append(ticket_id)
+    for (category, urgency), ticket_ids in groups.items():
+        await storage.update_tickets_classification(ticket_ids, category, urgency)
+    return len(updates)
+
+
+async def reclassify(args: argparse.Namespace) -> _Run:
+    run = _Run()
+    ai = _AIClassifier(args.ai_concurrency, args.ai_cache_size) if args.ai else None
+    out = open(args.output, "w", encoding="utf-8") if args.output else None
+    after: tuple[str, str] | None = None
+    if args.after:
+        key, _, row_id = args.after.rpartition(",")
+        after = (key, row_id)
+    elif args.since:
+        after = (args.since, _MIN_UUID)
+
+    last_progress = time.perf_counter()
+    try:
+        async for page in storage.iter_rows_keyset(
+            "raw_messages", columns=RAW_COLUMNS, page_size=args.page_size, after=after
+        ):
+            run.scanned += len(page)
+            run.cursor = (page[-1]["created_at"], page[-1]["id"])
+            rows = [r for r in page if r.get("classification_result") in CLASSIFIED_RESULTS]
+            if args.limit:
+                rows = rows[: max(0, args.limit - run.compared)]
+
+            tickets = {
+                t["id"]: t
+                for t in await storage.get_tickets_by_ids(
+                    list({r["ticket_id"] for r in rows if r.get("ticket_id")}),
+                    "id, ai_category, ai_urgency",
+                )
+            }
+            updates: dict[str, ClassificationResult] = {}
+            for row, result in zip(rows, await _classify_page(rows, ai)):
+                run.compared += 1
+                language = detect_language(row.get("content_text") or "")
+                run.language_rows[language] += 1
+                if result is not None and result.layer == "deterministic":
+                    run.language_layer1[language] += 1
+                old = row["classification_result"]
+                if result is None:
+                    run.undecided += 1
+                    run.transitions[(old, "undecided")] += 1
+                    continue
+                run.transitions[(old, "ticket" if result.is_ticket else "dismissed")] += 1
+                ticket = tickets.get(row.get("ticket_id"))
+                line = _diff(row, ticket, result)
+                if line is None:
+                    continue
+                run.changed += 1
+                run.changes.update(line["changes"])
+                if out is not None:
+                    out.write(json.dumps(line, ensure_ascii=False) + "\n")
+                if (
+                    args.command == "apply"
+                    and ticket is not None
+                    and old == "created"
+                    and result.is_ticket
+                    and result.confidence >= args.min_confidence
+                    and ("category" in line["changes"] or "urgency" in line["changes"])
+                ):
+                    current = updates.get(ticket["id"])
+                    if current is None or result.urgency > current.urgency:
+                        updates[ticket["id"]] = result
+
+            if updates:
+                run.tickets_updated += await _apply_page(updates)
+            if time.perf_counter() - last_progress >= args.progress_seconds:
+                print(run.progress(), file=sys.stderr)
+                last_progress = time.perf_counter()
+            if args.limit and run.compared >= args.limit:
+                break
+    finally:
+        if out is not None:
+            out.close()
+
+    if ai is not None:
+        print(
+            f"ai: calls={ai.calls} cache_hits={ai.cache_hits} failures={ai.failures}",
+            file=sys.stderr,
+        )
+    return run
+
+
+def _print_summary(run: _Run, command: str) -> None:
+    elapsed = time.perf_counter() - run.started
+    print(f"rows scanned:    {run.scanned}")
+    print(f"rows compared:   {run.compared}")
+    print(f"undecided:       {run.undecided}")
+    print(f"changed:         {run.changed}  {dict(run.changes)}")
+    if command == "apply":
+        print(f"tickets updated: {run.tickets_updated}")
+    rate = run.scanned / elapsed if elapsed else 0.0
+    print(f"elapsed:         {elapsed:.1f}s ({rate:,.0f} rows/s)")
+    print("transitions (old -> new):")
+    for (old, new), count in sorted(run.transitions.items()):
+        print(f"  {old:>9} -> {new:<9} {count}")
+    print("layer 1 coverage by language:")
+    for language, rows in run.language_rows.most_common():
+        decided = run.language_layer1[language]
+        print(f"  {language:>9}    {decided}/{rows} ({decided / rows:.1%})")
+    if run.cursor:
+        print(f"last cursor:     {','.join(run.cursor)}")
+
+
+# --- CLI ---
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Re-run the classifier over raw_messages history")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (
+        ("report", "diff current rules against recorded outcomes"),
+        ("apply", "report, and write new ai_category/ai_urgency to linked tickets"),
+    ):
+        cmd = sub.add_parser(name, help=help_text)
+        cmd.add_argument("-o", "--output", help="JSONL file for changed rows")
+        cmd.add_argument("--ai", action="store_true", help="classify Layer-1-undecided rows")
+        cmd.add_argument("--ai-concurrency", type=int, default=4)
+        cmd.add_argument("--ai-cache-size", type=int, default=50_000)
+        cmd.add_argument("--page-size", type=int, default=1000)
+        cmd.add_argument("--since", help="start at this created_at (ISO 8601)")
+        cmd.add_argument("--after", help="resume from a 'created_at,id' cursor")
+        cmd.add_argument("--limit", type=int, default=0, help="stop after N compared rows")
+        cmd.add_argument("--progress-seconds", type=float, default=5.0)
+        if name == "apply":
+            cmd.add_argument("--min-confidence", type=int, default=4)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    run = asyncio.run(reclassify(args))
+    _print_summary(run, args.command)
+
+
+if __name__ == "__main__":
+    main()
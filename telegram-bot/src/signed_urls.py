@@ -0,0 +1,38 @@
+"""Signed, expiring links to files the bot serves itself.
+
+Links stored on ticket_messages (the /media proxy for Telegram files, /files for
+media the SQLite backend wrote to disk) are opened straight from the dashboard, so
+they cannot carry the API token. Instead each link carries ``exp`` (unix seconds)
+and ``sig``, an HMAC-SHA256 of the path and expiry under MEDIA_SIGNING_KEY, valid
+for MEDIA_URL_TTL_SECONDS. Without a key, links are unsigned and the endpoints
+only accept the API token.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import time
+
+from src.config import settings
+
+
+def signed_url(path: str) -> str:
+    """Absolute URL for an app-served ``path`` ("/media/<file_id>"), signed if a key is set."""
+    url = settings.webhook_url.rstrip("/") + path
+    if not settings.media_signing_key:
+        return url
+    expires = int(time.time()) + settings.media_url_ttl_seconds
+    return f"{url}?exp={expires}&sig={_signature(path, expires)}"
+
+
+def signature_valid(path: str, expires: int, signature: str, now: float) -> bool:
+    """Whether ``exp``/``sig`` on a request for ``path`` came from signed_url and are current."""
+    if not settings.media_signing_key or not signature or expires < now:
+        return False
+    return hmac.compare_digest(signature, _signature(path, expires))
+
+
+def _signature(path: str, expires: int) -> str:
+    key = settings.media_signing_key.encode()
+    return hmac.new(key, f"{path}:{expires}".encode(), hashlib.sha256).hexdigest()
@@ -0,0 +1,148 @@
+"""Warm restart: carry in-memory pipeline state across a deploy or restart.
+
+Three things live only in process memory, and Telegram has already received
+a 200 for them:
+
+- the follow-up buffer (low-confidence messages or bursts waiting for a
+  driver's next message),
+- albums still inside their coalescing window, and
+- text bursts still waiting for their quiet period.
+
+On shutdown all three are written to SNAPSHOT_PATH, a small JSON file written under
+a temporary name and then renamed. startup() restores it before the webhook is
+registered, then deletes it, so a crash loop never replays the same albums
+twice.
+
+Buffer expiry is shifted by the downtime. Telegram holds the updates sent while
+the bot was down and delivers them after the restart, so a follow-up still
+finds the message it belongs to. Restored albums and bursts get a fresh window.
+A snapshot older than SNAPSHOT_MAX_AGE_SECONDS is dropped, since Telegram
+discards undelivered updates after 24 hours. Entries that fail validation
+are logged and skipped; the rest of the snapshot is still used.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+from pydantic import ValidationError
+from telegram import Bot, Update
+
+from src.bot import (
+    export_pending_albums,
+    export_pending_bursts,
+    restore_pending_albums,
+    restore_pending_bursts,
+)
+from src.models import BufferedMessage, Message
+from src.storage import storage
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+
+def save_snapshot(path: str) -> dict[str, int]:
+    """Write the buffer, pending albums and bursts to ``path``. Returns counts per kind."""
+    buffer = storage.export_buffer()
+    albums = export_pending_albums()
+    bursts = export_pending_bursts()
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "saved_at": datetime.now(timezone.utc).isoformat(),
+        "buffer": [
+            {"telegram_user_id": user_id, "entry": entry.model_dump(mode="json")}
+            for user_id, entry in buffer
+        ],
+        "albums": [
+            {
+                "group_key": group_key,
+                "messages": [m.model_dump(mode="json") for m in messages],
+                "update": update.to_dict(),
+            }
+            for group_key, messages, update in albums
+        ],
+        "bursts": [
+            {
+                "key": key,
+                "messages": [m.model_dump(mode="json") for m in messages],
+                "update": update.to_dict(),
+            }
+            for key, messages, update in bursts
+        ],
+    }
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, separators=(",", ":"))
+    os.replace(tmp, path)
+    return {"buffer": len(buffer), "albums": len(albums), "bursts": len(bursts)}
+
+
+def restore_snapshot(path: str, bot: Bot, max_age_seconds: float) -> dict[str, int]:
+    """Restore and delete the snapshot at ``path``. Returns counts per kind restored."""
+    restored = {"buffer": 0, "albums": 0, "bursts": 0}
+    if not os.path.exists(path):
+        return restored
+    try:
+        with open(path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable snapshot %s: %s", path, e)
+        os.remove(path)
+        return restored
+    os.remove(path)
+
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        logger.warning("Ignoring snapshot with version %r", snapshot.get("version"))
+        return restored
+    downtime = datetime.now(timezone.utc) - datetime.fromisoformat(snapshot["saved_at"])
+    if downtime > timedelta(seconds=max_age_seconds):
+        logger.warning("Ignoring snapshot saved %s ago", downtime)
+        return restored
+
+    entries = []
+    for item in snapshot.get("buffer", []):
+        try:
+            entry = BufferedMessage.model_validate(item["entry"])
+        except (KeyError, ValidationError) as e:
+            logger.warning("Skipping invalid buffered message in snapshot: %s", e)
+            continue
+        entry.expires_at += downtime
+        entries.append((int(item["telegram_user_id"]), entry))
+    storage.restore_buffer(entries)
+    restored["buffer"] = len(entries)
+
+    albums = _pending_batches(snapshot.get("albums", []), "group_key", "album", bot)
+    restore_pending_albums(albums)
+    restored["albums"] = len(albums)
+
+    bursts = _pending_batches(snapshot.get("bursts", []), "key", "burst", bot)
+    restore_pending_bursts(bursts)
+    restored["bursts"] = len(bursts)
+
+    logger.info(
+        "Restored %d buffered messages, %d albums and %d bursts (down %.0fs)",
+        restored["buffer"],
+        restored["albums"],
+        restored["bursts"],
+        downtime.total_seconds(),
+    )
+    return restored
+
+
+def _pending_batches(
+    items: list[dict], key_field: str, kind: str, bot: Bot
+) -> list[tuple[str, list[Message], Update]]:
+    batches = []
+    for item in items:
+        try:
+            messages = [Message.model_validate(m) for m in item["messages"]]
+            update = Update.de_json(item["update"], bot)
+        except (KeyError, TypeError, ValidationError) as e:
+            logger.warning("Skipping invalid %s in snapshot: %s", kind, e)
+            continue
+        batches.append((item[key_field], messages, update))
+    return batches
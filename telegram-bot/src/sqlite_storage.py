@@ -0,0 +1,697 @@
+"""SQLite storage backend: the V2 tables in one local file (STORAGE_BACKEND=sqlite).
+
+For small fleets on a single node, and for tests and benchmarks that should not
+need a Supabase project. Tables, columns and indexes follow PRD-08 for
+everything the bot reads or writes. Methods behave like SupabaseStorage's and
+build their rows with the same helpers (src/storage.py).
+
+- WAL journal with synchronous=NORMAL. Readers such as the export and
+  reclassify CLIs never block the bot, and a commit appends to the WAL
+  without an fsync.
+- Every query is a fixed SQL string with ? placeholders, so sqlite3's
+  per-connection statement cache reuses the prepared statement on each call.
+- Calls take well under a millisecond and run directly on the event loop, as the
+  image cache does; there is no network round trip to hide.
+
+Register the connections the bot should accept with::
+
+    python -m src.sqlite_storage add-group -1001234567890 "Dispatch East"
+    python -m src.sqlite_storage add-business <business_connection_id> "DM: Fleet One"
+    python -m src.sqlite_storage list
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import uuid
+from collections.abc import AsyncIterator
+from datetime import datetime, timedelta, timezone
+
+from src.config import settings
+from src.metrics import MESSAGES_TOTAL, STORAGE_SECONDS, instrument_methods
+from src.models import Driver, Message, Ticket
+from src.signed_urls import signed_url
+from src.storage import (
+    OPEN_STATUSES,
+    AuditGroup,
+    InMemoryBuffer,
+    classification_update,
+    content_type,
+    inbound_message_rows,
+    now_iso,
+    outbound_message_row,
+    raw_message_rows,
+    ticket_row,
+    ticket_update,
+)
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS drivers (
+  id TEXT PRIMARY KEY,
+  telegram_user_id INTEGER NOT NULL UNIQUE,
+  first_name TEXT NOT NULL,
+  last_name TEXT,
+  username TEXT,
+  first_seen_at TEXT NOT NULL,
+  last_seen_at TEXT NOT NULL,
+  created_at TEXT NOT NULL,
+  updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_drivers_telegram_user_id ON drivers(telegram_user_id);
+
+CREATE TABLE IF NOT EXISTS tickets (
+  id TEXT PRIMARY KEY,
+  display_id TEXT NOT NULL UNIQUE,
+  driver_id TEXT NOT NULL REFERENCES drivers(id) ON DELETE CASCADE,
+  source_type TEXT NOT NULL,
+  source_chat_id INTEGER,
+  source_name TEXT,
+  business_connection_id TEXT,
+  status TEXT NOT NULL DEFAULT 'open',
+  priority TEXT NOT NULL DEFAULT 'normal',
+  is_urgent INTEGER NOT NULL DEFAULT 0,
+  assigned_operator_id TEXT,
+  score_category_id TEXT,
+  ai_summary TEXT,
+  ai_category TEXT,
+  ai_urgency INTEGER CHECK (ai_urgency BETWEEN 1 AND 5),
+  ai_location TEXT,
+  claimed_at TEXT,
+  resolved_at TEXT,
+  dismissed_at TEXT,
+  created_at TEXT NOT NULL,
+  updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tickets_status ON tickets(status);
+CREATE INDEX IF NOT EXISTS idx_tickets_driver_id ON tickets(driver_id);
+CREATE INDEX IF NOT EXISTS idx_tickets_assigned_operator_id ON tickets(assigned_operator_id);
+CREATE INDEX IF NOT EXISTS idx_tickets_created_at ON tickets(created_at);
+CREATE INDEX IF NOT EXISTS idx_tickets_source_chat_id ON tickets(source_chat_id);
+
+CREATE TABLE IF NOT EXISTS ticket_messages (
+  id TEXT PRIMARY KEY,
+  ticket_id TEXT NOT NULL REFERENCES tickets(id) ON DELETE CASCADE,
+  direction TEXT NOT NULL,
+  sender_type TEXT NOT NULL,
+  sender_name TEXT NOT NULL,
+  sender_user_id TEXT,
+  telegram_message_id INTEGER,
+  content_text TEXT,
+  content_type TEXT NOT NULL DEFAULT 'text',
+  media_url TEXT,
+  media_thumbnail_url TEXT,
+  ai_media_description TEXT,
+  is_internal_note INTEGER NOT NULL DEFAULT 0,
+  delivery_status TEXT,
+  created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ticket_messages_ticket_id ON ticket_messages(ticket_id);
+CREATE INDEX IF NOT EXISTS idx_ticket_messages_telegram_message_id
+  ON ticket_messages(telegram_message_id);
+
+CREATE TABLE IF NOT EXISTS telegram_connections (
+  id TEXT PRIMARY KEY,
+  connection_type TEXT NOT NULL,
+  chat_id INTEGER,
+  business_connection_id TEXT,
+  display_name TEXT NOT NULL,
+  is_active INTEGER NOT NULL DEFAULT 1,
+  created_at TEXT NOT NULL,
+  updated_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS raw_messages (
+  id TEXT PRIMARY KEY,
+  telegram_message_id INTEGER NOT NULL,
+  telegram_user_id INTEGER NOT NULL,
+  chat_id INTEGER NOT NULL,
+  chat_type TEXT NOT NULL,
+  content_text TEXT,
+  content_type TEXT NOT NULL,
+  has_media INTEGER NOT NULL DEFAULT 0,
+  classification_result TEXT,
+  classification_source TEXT,
+  ai_raw_response TEXT,
+  ticket_id TEXT REFERENCES tickets(id) ON DELETE SET NULL,
+  created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_raw_messages_telegram_user_id ON raw_messages(telegram_user_id);
+CREATE INDEX IF NOT EXISTS idx_raw_messages_chat_id ON raw_messages(chat_id);
+CREATE INDEX IF NOT EXISTS idx_raw_messages_created_at ON raw_messages(created_at);
+"""
+
+# SQLite has no boolean or jsonb; these columns are converted on the way in and out.
+_BOOL_COLUMNS = {"is_active", "is_urgent", "has_media", "is_internal_note"}
+_JSON_COLUMNS = {"ai_raw_response"}
+
+_OPEN = ", ".join(f"'{status}'" for status in OPEN_STATUSES)
+
+
+def _row_factory(cursor: sqlite3.Cursor, row: tuple) -> dict:
+    out = {}
+    for (name, *_), value in zip(cursor.description, row):
+        if value is not None:
+            if name in _BOOL_COLUMNS:
+                value = bool(value)
+            elif name in _JSON_COLUMNS:
+                value = json.loads(value)
+        out[name] = value
+    return out
+
+
+def _encode(value: object) -> object:
+    return json.dumps(value) if isinstance(value, (dict, list)) else value
+
+
+def _driver(d: dict) -> Driver:
+    return Driver(
+        id=d["id"],
+        telegram_user_id=d.get("telegram_user_id") or 0,
+        first_name=d.get("first_name") or "",
+        last_name=d.get("last_name") or "",
+        username=d.get("username") or "",
+    )
+
+
+@instrument_methods(STORAGE_SECONDS)
+class SQLiteStorage(InMemoryBuffer):
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = _row_factory
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.executescript(SCHEMA)
+        # Column names per table: generated SQL only ever names known columns.
+        self._columns: dict[str, set[str]] = {
+            table: {c["name"] for c in self._db.execute(f"PRAGMA table_info({table})")}
+            for table in ("drivers", "tickets", "ticket_messages", "telegram_connections",
+                          "raw_messages")
+        }
+        logger.info("SQLite storage initialized at %s", path)
+
+    def close(self) -> None:
+        self._db.close()
+
+    async def prewarm(self) -> None:
+        """Nothing to do: the database is opened in __init__ and costs about a millisecond."""
+
+    # --- SQL helpers ---
+
+    def _one(self, sql: str, params: tuple | dict = ()) -> dict | None:
+        return self._db.execute(sql, params).fetchone()
+
+    def _all(self, sql: str, params: tuple | dict = ()) -> list[dict]:
+        return self._db.execute(sql, params).fetchall()
+
+    def _check_columns(self, table: str, columns: object) -> None:
+        unknown = set(columns) - self._columns[table]
+        if unknown:
+            raise ValueError(f"Unknown {table} columns: {sorted(unknown)}")
+
+    def _select_list(self, table: str, columns: str) -> str:
+        names = [c.strip() for c in columns.split(",")]
+        if names != ["*"]:
+            self._check_columns(table, names)
+        return ", ".join(names)
+
+    def _insert(self, table: str, rows: list[dict]) -> list[dict]:
+        """Insert rows, filling id and timestamps the way Postgres defaults would."""
+        now = now_iso()
+        inserted = []
+        with self._db:
+            for row in rows:
+                row = {"id": str(uuid.uuid4()), "created_at": now, **row}
+                if "updated_at" in self._columns[table]:
+                    row.setdefault("updated_at", now)
+                if table == "tickets":
+                    seq = self._one("SELECT COALESCE(MAX(rowid), 0) + 1 AS n FROM tickets")
+                    row.setdefault("display_id", f"TKT-{seq['n']:04d}")
+                self._check_columns(table, row)
+                names = ", ".join(row)
+                marks = ", ".join("?" * len(row))
+                inserted.append(
+                    self._one(
+                        f"INSERT INTO {table} ({names}) VALUES ({marks}) RETURNING *",
+                        tuple(_encode(v) for v in row.values()),
+                    )
+                )
+        return inserted
+
+    def _update(self, table: str, data: dict, where: str, params: tuple) -> None:
+        self._check_columns(table, data)
+        assignments = ", ".join(f"{column} = ?" for column in data)
+        with self._db:
+            self._db.execute(
+                f"UPDATE {table} SET {assignments} WHERE {where}",
+                (*(_encode(v) for v in data.values()), *params),
+            )
+
+    def _update_by_id(self, table: str, rows: list[dict]) -> None:
+        """Set each row's columns on the row with its id; columns not in the dict are kept."""
+        for row in rows:
+            fields = {column: value for column, value in row.items() if column != "id"}
+            self._update(table, fields, "id = ?", (row["id"],))
+
+    # --- Connection Validation ---
+
+    async def validate_business_connection(self, business_connection_id: str) -> bool:
+        return await self.get_active_connection_name(
+            business_connection_id=business_connection_id
+        ) is not None
+
+    async def validate_group_connection(self, chat_id: int) -> bool:
+        return await self.get_active_connection_name(chat_id=chat_id) is not None
+
+    async def get_connection_display_name(
+        self,
+        business_connection_id: str | None = None,
+        chat_id: int | None = None,
+    ) -> str:
+        name = await self.get_active_connection_name(business_connection_id, chat_id)
+        return name or ""
+
+    async def get_active_connection_name(
+        self,
+        business_connection_id: str | None = None,
+        chat_id: int | None = None,
+    ) -> str | None:
+        """Validate and name a connection in one query. None if not registered/active."""
+        if business_connection_id:
+            row = self._one(
+                "SELECT display_name FROM telegram_connections WHERE is_active = 1"
+                " AND connection_type = 'business_account' AND business_connection_id = ?"
+                " LIMIT 1",
+                (business_connection_id,),
+            )
+        elif chat_id is not None:
+            row = self._one(
+                "SELECT display_name FROM telegram_connections WHERE is_active = 1"
+                " AND connection_type = 'group' AND chat_id = ? LIMIT 1",
+                (chat_id,),
+            )
+        else:
+            return None
+        return None if row is None else row["display_name"] or ""
+
+    def add_connection(
+        self,
+        display_name: str,
+        chat_id: int | None = None,
+        business_connection_id: str | None = None,
+    ) -> dict:
+        """Register a group (chat_id) or business account (business_connection_id)."""
+        connection_type = "group" if chat_id is not None else "business_account"
+        return self._insert(
+            "telegram_connections",
+            [
+                {
+                    "connection_type": connection_type,
+                    "chat_id": chat_id,
+                    "business_connection_id": business_connection_id,
+                    "display_name": display_name,
+                    "is_active": True,
+                }
+            ],
+        )[0]
+
+    # --- Drivers ---
+
+    async def upsert_driver(
+        self,
+        telegram_user_id: int,
+        first_name: str = "",
+        last_name: str = "",
+        username: str = "",
+    ) -> Driver:
+        """Upsert driver by telegram_user_id in one statement. Empty names never overwrite."""
+        now = now_iso()
+        with self._db:
+            row = self._one(
+                """INSERT INTO drivers (id, telegram_user_id, first_name, last_name, username,
+                                        first_seen_at, last_seen_at, created_at, updated_at)
+                   VALUES (:id, :tg, COALESCE(NULLIF(:first, ''), 'Unknown'), NULLIF(:last, ''),
+                           NULLIF(:username, ''), :now, :now, :now, :now)
+                   ON CONFLICT (telegram_user_id) DO UPDATE SET
+                     first_name = COALESCE(NULLIF(:first, ''), first_name),
+                     last_name = COALESCE(NULLIF(:last, ''), last_name),
+                     username = COALESCE(NULLIF(:username, ''), username),
+                     last_seen_at = :now,
+                     updated_at = :now
+                   RETURNING id""",
+                {
+                    "id": str(uuid.uuid4()),
+                    "tg": telegram_user_id,
+                    "first": first_name,
+                    "last": last_name,
+                    "username": username,
+                    "now": now,
+                },
+            )
+        return Driver(
+            id=row["id"],
+            telegram_user_id=telegram_user_id,
+            first_name=first_name,
+            last_name=last_name,
+            username=username,
+        )
+
+    async def get_driver(self, driver_id: str) -> Driver | None:
+        row = self._one("SELECT * FROM drivers WHERE id = ?", (driver_id,))
+        return None if row is None else _driver(row)
+
+    async def get_driver_by_telegram_id(self, telegram_user_id: int) -> Driver | None:
+        row = self._one("SELECT * FROM drivers WHERE telegram_user_id = ?", (telegram_user_id,))
+        return None if row is None else _driver(row)
+
+    # --- Open Ticket Check ---
+
+    async def find_open_ticket_for_driver(
+        self,
+        driver_id: str,
+        source_type: str,
+        source_identifier: int | str,
+        hours: int = 4,
+    ) -> dict | None:
+        """Open ticket for this driver on the same source, updated within the window."""
+        cutoff = (datetime.now(timezone.utc) - timedelta(hours=hours)).isoformat()
+        source = (
+            "business_connection_id = ?" if source_type == "business_dm" else "source_chat_id = ?"
+        )
+        identifier = (
+            str(source_identifier) if source_type == "business_dm" else int(source_identifier)
+        )
+        return self._one(
+            "SELECT id, status, ai_urgency, updated_at, source_type, source_chat_id,"
+            " business_connection_id FROM tickets"
+            f" WHERE driver_id = ? AND status IN ({_OPEN}) AND updated_at >= ? AND {source}"
+            " ORDER BY updated_at DESC LIMIT 1",
+            (driver_id, cutoff, identifier),
+        )
+
+    async def find_recently_resolved_ticket(
+        self, driver_id: str, hours: int = 24
+    ) -> dict | None:
+        cutoff = (datetime.now(timezone.utc) - timedelta(hours=hours)).isoformat()
+        return self._one(
+            "SELECT id, resolved_at FROM tickets"
+            " WHERE driver_id = ? AND status = 'resolved' AND resolved_at >= ?"
+            " ORDER BY resolved_at DESC LIMIT 1",
+            (driver_id, cutoff),
+        )
+
+    # --- Reply Thread Lookup (group chats) ---
+
+    async def find_ticket_by_message_telegram_id(
+        self,
+        chat_id: int,
+        telegram_message_id: int,
+    ) -> dict | None:
+        """Open ticket in this chat holding the message with this Telegram ID (one join)."""
+        return self._one(
+            "SELECT t.id, t.status, t.ai_urgency FROM ticket_messages m"
+            " JOIN tickets t ON t.id = m.ticket_id"
+            f" WHERE m.telegram_message_id = ? AND t.source_chat_id = ? AND t.status IN ({_OPEN})"
+            " LIMIT 1",
+            (telegram_message_id, chat_id),
+        )
+
+    # --- Tickets ---
+
+    async def create_ticket(self, ticket: Ticket) -> str:
+        return self._insert("tickets", [ticket_row(ticket)])[0]["id"]
+
+    async def update_ticket(self, ticket_id: str, **updates: object) -> None:
+        self._update("tickets", ticket_update(**updates), "id = ?", (ticket_id,))
+
+    async def append_message_to_ticket(
+        self,
+        ticket_id: str,
+        message: Message,
+        driver_name: str = "",
+    ) -> None:
+        await self.append_messages_to_ticket(ticket_id, [message], driver_name)
+
+    async def append_messages_to_ticket(
+        self,
+        ticket_id: str,
+        messages: list[Message],
+        driver_name: str = "",
+    ) -> list[dict]:
+        """Insert inbound ticket_messages and bump the ticket's updated_at."""
+        if not messages:
+            return []
+        rows = self._insert(
+            "ticket_messages", inbound_message_rows(ticket_id, messages, driver_name)
+        )
+        self._update("tickets", {"updated_at": now_iso()}, "id = ?", (ticket_id,))
+        return rows
+
+    async def update_ticket_messages_media(self, rows: list[dict]) -> None:
+        self._update_by_id("ticket_messages", rows)
+
+    async def upload_media(self, path: str, data: bytes, content_type: str) -> str:
+        """Write media under SQLITE_MEDIA_DIR. Returns its signed /files URL on this app."""
+        target = os.path.abspath(os.path.join(settings.sqlite_media_dir, path))
+
+        def write() -> None:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "wb") as f:
+                f.write(data)
+
+        await asyncio.to_thread(write)
+        return signed_url(f"/files/{path}")
+
+    # --- Raw Messages (Audit Trail) ---
+
+    async def log_raw_message(
+        self,
+        message: Message,
+        classification_result: str,
+        classification_source: str,
+        ticket_id: str | None = None,
+        ai_response: dict | None = None,
+    ) -> None:
+        await self.log_raw_messages(
+            [message],
+            classification_result=classification_result,
+            classification_source=classification_source,
+            ticket_id=ticket_id,
+            ai_response=ai_response,
+        )
+
+    async def log_raw_messages(
+        self,
+        messages: list[Message],
+        classification_result: str,
+        classification_source: str,
+        ticket_id: str | None = None,
+        ai_response: dict | None = None,
+    ) -> None:
+        MESSAGES_TOTAL.inc(classification_result, classification_source, amount=len(messages))
+        if not messages:
+            return
+        rows = raw_message_rows(
+            messages, classification_result, classification_source, ticket_id, ai_response
+        )
+        try:
+            self._insert("raw_messages", rows)
+        except sqlite3.Error as e:
+            logger.error("Failed to log raw message: %s", e)
+
+    async def log_raw_message_groups(self, groups: list[AuditGroup]) -> None:
+        rows = []
+        for messages, classification_result, classification_source, ticket_id in groups:
+            MESSAGES_TOTAL.inc(classification_result, classification_source, amount=len(messages))
+            rows.extend(
+                raw_message_rows(
+                    messages, classification_result, classification_source, ticket_id, None
+                )
+            )
+        if not rows:
+            return
+        try:
+            self._insert("raw_messages", rows)
+        except sqlite3.Error as e:
+            logger.error("Failed to log %d raw messages: %s", len(rows), e)
+
+    async def find_raw_message(self, chat_id: int, telegram_message_id: int) -> dict | None:
+        return self._one(
+            "SELECT id, content_text, classification_result, classification_source, ticket_id"
+            " FROM raw_messages WHERE chat_id = ? AND telegram_message_id = ?"
+            " ORDER BY created_at DESC LIMIT 1",
+            (chat_id, telegram_message_id),
+        )
+
+    async def update_raw_message(self, raw_message_id: str, **fields: object) -> None:
+        self._update("raw_messages", fields, "id = ?", (raw_message_id,))
+
+    # --- Messages (create ticket_message for new ticket) ---
+
+    async def save_message_as_ticket_message(
+        self,
+        message: Message,
+        ticket_id: str,
+        driver_name: str = "",
+    ) -> None:
+        await self.append_message_to_ticket(ticket_id, message, driver_name)
+
+    async def save_messages_as_ticket_messages(
+        self,
+        messages: list[Message],
+        ticket_id: str,
+        driver_name: str = "",
+    ) -> list[dict]:
+        return await self.append_messages_to_ticket(ticket_id, messages, driver_name)
+
+    async def update_ticket_message_text(self, ticket_id: str, message: Message) -> None:
+        self._update(
+            "ticket_messages",
+            {"content_text": message.text or f"[{content_type(message)}]"},
+            "ticket_id = ? AND telegram_message_id = ? AND direction = 'inbound'",
+            (ticket_id, message.telegram_message_id),
+        )
+
+    # --- Outbound replies (see src/outbound.py) ---
+
+    async def create_outbound_message(
+        self,
+        ticket_id: str,
+        text: str,
+        sender_name: str = "",
+        sender_user_id: str | None = None,
+    ) -> dict:
+        row = outbound_message_row(ticket_id, text, sender_name, sender_user_id)
+        return self._insert("ticket_messages", [row])[0]
+
+    async def get_ticket_message(self, message_id: str) -> dict | None:
+        return self._one("SELECT * FROM ticket_messages WHERE id = ?", (message_id,))
+
+    async def get_last_inbound_telegram_message_id(self, ticket_id: str) -> int | None:
+        row = self._one(
+            "SELECT telegram_message_id FROM ticket_messages"
+            " WHERE ticket_id = ? AND direction = 'inbound' AND telegram_message_id IS NOT NULL"
+            " ORDER BY created_at DESC LIMIT 1",
+            (ticket_id,),
+        )
+        return None if row is None else row["telegram_message_id"]
+
+    async def get_pending_outbound_messages(self, limit: int = 1000) -> list[dict]:
+        return self._all(
+            "SELECT * FROM ticket_messages WHERE direction = 'outbound'"
+            " AND delivery_status = 'pending' AND is_internal_note = 0"
+            " ORDER BY created_at LIMIT ?",
+            (limit,),
+        )
+
+    async def update_ticket_messages_delivery(self, rows: list[dict]) -> None:
+        self._update_by_id("ticket_messages", rows)
+
+    # --- Bulk reads (offline tools) ---
+
+    async def iter_rows_keyset(
+        self,
+        table: str,
+        columns: str = "*",
+        page_size: int = 1000,
+        after: tuple[str, str] | None = None,
+        key_column: str = "created_at",
+    ) -> AsyncIterator[list[dict]]:
+        """Stream a table in (key_column, id) order, one page at a time."""
+        self._check_columns(table, [key_column])
+        select = self._select_list(table, columns)
+        while True:
+            if after is None:
+                rows = self._all(
+                    f"SELECT {select} FROM {table} ORDER BY {key_column}, id LIMIT ?",
+                    (page_size,),
+                )
+            else:
+                key, row_id = after
+                rows = self._all(
+                    f"SELECT {select} FROM {table}"
+                    f" WHERE {key_column} > ? OR ({key_column} = ? AND id > ?)"
+                    f" ORDER BY {key_column}, id LIMIT ?",
+                    (key, key, row_id, page_size),
+                )
+            if not rows:
+                return
+            yield rows
+            if len(rows) < page_size:
+                return
+            after = (rows[-1][key_column], rows[-1]["id"])
+            await asyncio.sleep(0)  # let the bot run between pages
+
+    async def get_tickets_by_ids(self, ticket_ids: list[str], columns: str = "*") -> list[dict]:
+        if not ticket_ids:
+            return []
+        marks = ", ".join("?" * len(ticket_ids))
+        return self._all(
+            f"SELECT {self._select_list('tickets', columns)} FROM tickets WHERE id IN ({marks})",
+            tuple(ticket_ids),
+        )
+
+    async def update_tickets_classification(
+        self, ticket_ids: list[str], category: str, urgency: int
+    ) -> None:
+        if not ticket_ids:
+            return
+        marks = ", ".join("?" * len(ticket_ids))
+        self._update(
+            "tickets", classification_update(category, urgency), f"id IN ({marks})",
+            tuple(ticket_ids),
+        )
+
+    # --- Stats ---
+
+    async def stats(self) -> dict[str, int]:
+        """Exact row counts plus buffer size; COUNT(*) is cheap at single-node sizes."""
+        return {
+            "drivers": self._one("SELECT COUNT(*) AS n FROM drivers")["n"],
+            "tickets": self._one("SELECT COUNT(*) AS n FROM tickets")["n"],
+            "buffered": self.buffered_count(),
+        }
+
+
+# --- CLI ---
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Manage the SQLite storage backend")
+    parser.add_argument("--db", default=settings.sqlite_path)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    group = sub.add_parser("add-group", help="accept messages from a group chat")
+    group.add_argument("chat_id", type=int)
+    group.add_argument("name")
+
+    business = sub.add_parser("add-business", help="accept DMs from a business connection")
+    business.add_argument("business_connection_id")
+    business.add_argument("name")
+
+    sub.add_parser("list", help="list registered connections")
+
+    args = parser.parse_args()
+    store = SQLiteStorage(args.db)
+    if args.command == "add-group":
+        store.add_connection(args.name, chat_id=args.chat_id)
+    elif args.command == "add-business":
+        store.add_connection(args.name, business_connection_id=args.business_connection_id)
+    for row in store._all("SELECT * FROM telegram_connections ORDER BY created_at"):
+        target = row["chat_id"] if row["chat_id"] is not None else row["business_connection_id"]
+        state = "active" if row["is_active"] else "inactive"
+        print(f"{row['connection_type']:<17} {target!s:<24} {state:<9} {row['display_name']}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
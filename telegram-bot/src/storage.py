@@ -0,0 +1,390 @@
+"""Storage backend protocol, shared row builders and the process-wide ``storage``.
+
+Two backends implement StorageBackend:
+
+- SupabaseStorage (src/supabase_storage.py): the production V2 schema over PostgREST.
+- SQLiteStorage (src/sqlite_storage.py): the same tables in a local SQLite file,
+  for single-node deployments, tests and benchmarks. No network hops.
+
+STORAGE_BACKEND picks one at import time. Everything else imports ``storage``
+from here and stays backend-agnostic. The row builders below are the single
+definition of what the bot writes, so the two backends cannot drift apart.
+"""
+
+from __future__ import annotations
+
+from collections.abc import AsyncIterator
+from datetime import datetime, timezone
+from typing import Protocol
+
+from src.config import settings
+from src.metrics import STORAGE_SECONDS, instrument_methods
+from src.models import BufferedMessage, Driver, Message, MessageSource, Ticket
+
+OPEN_STATUSES = ("open", "in_progress", "on_hold")
+
+# One group of audit rows: (messages, classification_result, classification_source, ticket_id)
+AuditGroup = tuple[list[Message], str, str, str | None]
+
+
+class StorageBackend(Protocol):
+    async def prewarm(self) -> None: ...
+
+    # --- Connection Validation ---
+
+    async def validate_business_connection(self, business_connection_id: str) -> bool: ...
+
+    async def validate_group_connection(self, chat_id: int) -> bool: ...
+
+    async def get_connection_display_name(
+        self, business_connection_id: str | None = None, chat_id: int | None = None
+    ) -> str: ...
+
+    async def get_active_connection_name(
+        self, business_connection_id: str | None = None, chat_id: int | None = None
+    ) -> str | None: ...
+
+    # --- Drivers ---
+
+    async def upsert_driver(
+        self, telegram_user_id: int, first_name: str = "", last_name: str = "", username: str = ""
+    ) -> Driver: ...
+
+    async def get_driver(self, driver_id: str) -> Driver | None: ...
+
+    async def get_driver_by_telegram_id(self, telegram_user_id: int) -> Driver | None: ...
+
+    # --- Ticket lookups ---
+
+    async def find_open_ticket_for_driver(
+        self, driver_id: str, source_type: str, source_identifier: int | str, hours: int = 4
+    ) -> dict | None: ...
+
+    async def find_recently_resolved_ticket(
+        self, driver_id: str, hours: int = 24
+    ) -> dict | None: ...
+
+    async def find_ticket_by_message_telegram_id(
+        self, chat_id: int, telegram_message_id: int
+    ) -> dict | None: ...
+
+    # --- Tickets and ticket_messages ---
+
+    async def create_ticket(self, ticket: Ticket) -> str: ...
+
+    async def update_ticket(self, ticket_id: str, **updates: object) -> None: ...
+
+    async def append_message_to_ticket(
+        self, ticket_id: str, message: Message, driver_name: str = ""
+    ) -> None: ...
+
+    async def append_messages_to_ticket(
+        self, ticket_id: str, messages: list[Message], driver_name: str = ""
+    ) -> list[dict]: ...
+
+    async def save_message_as_ticket_message(
+        self, message: Message, ticket_id: str, driver_name: str = ""
+    ) -> None: ...
+
+    async def save_messages_as_ticket_messages(
+        self, messages: list[Message], ticket_id: str, driver_name: str = ""
+    ) -> list[dict]: ...
+
+    async def update_ticket_message_text(self, ticket_id: str, message: Message) -> None: ...
+
+    async def update_ticket_messages_media(self, rows: list[dict]) -> None: ...
+
+    async def upload_media(self, path: str, data: bytes, content_type: str) -> str: ...
+
+    # --- Raw Messages (Audit Trail) ---
+
+    async def log_raw_message(
+        self,
+        message: Message,
+        classification_result: str,
+        classification_source: str,
+        ticket_id: str | None = None,
+        ai_response: dict | None = None,
+    ) -> None: ...
+
+    async def log_raw_messages(
+        self,
+        messages: list[Message],
+        classification_result: str,
+        classification_source: str,
+        ticket_id: str | None = None,
+        ai_response: dict | None = None,
+    ) -> None: ...
+
+    async def log_raw_message_groups(self, groups: list[AuditGroup]) -> None: ...
+
+    async def find_raw_message(
+        self, chat_id: int, telegram_message_id: int
+    ) -> dict | None: ...
+
+    async def update_raw_message(self, raw_message_id: str, **fields: object) -> None: ...
+
+    # --- Outbound replies ---
+
+    async def create_outbound_message(
+        self, ticket_id: str, text: str, sender_name: str = "", sender_user_id: str | None = None
+    ) -> dict: ...
+
+    async def get_ticket_message(self, message_id: str) -> dict | None: ...
+
+    async def get_last_inbound_telegram_message_id(self, ticket_id: str) -> int | None: ...
+
+    async def get_pending_outbound_messages(self, limit: int = 1000) -> list[dict]: ...
+
+    async def update_ticket_messages_delivery(self, rows: list[dict]) -> None: ...
+
+    # --- Buffer ---
+
+    async def buffer_message(self, telegram_user_id: int, entry: BufferedMessage) -> None: ...
+
+    async def get_buffered(self, telegram_user_id: int) -> BufferedMessage | None: ...
+
+    async def pop_buffered(self, telegram_user_id: int) -> BufferedMessage | None: ...
+
+    async def get_expired_buffers(self) -> list[tuple[int, BufferedMessage]]: ...
+
+    def buffered_count(self) -> int: ...
+
+    def export_buffer(self) -> list[tuple[int, BufferedMessage]]: ...
+
+    def restore_buffer(self, entries: list[tuple[int, BufferedMessage]]) -> None: ...
+
+    # --- Bulk reads (offline tools) ---
+
+    def iter_rows_keyset(
+        self,
+        table: str,
+        columns: str = "*",
+        page_size: int = 1000,
+        after: tuple[str, str] | None = None,
+        key_column: str = "created_at",
+    ) -> AsyncIterator[list[dict]]: ...
+
+    async def get_tickets_by_ids(
+        self, ticket_ids: list[str], columns: str = "*"
+    ) -> list[dict]: ...
+
+    async def update_tickets_classification(
+        self, ticket_ids: list[str], category: str, urgency: int
+    ) -> None: ...
+
+    # --- Stats ---
+
+    async def stats(self) -> dict[str, int]: ...
+
+
+# --- Follow-up buffer (shared) ---
+
+
+@instrument_methods(STORAGE_SECONDS)
+class InMemoryBuffer:
+    """Low-confidence messages waiting for a follow-up.
+
+    Kept in memory only; src/snapshot.py carries them across a restart.
+    """
+
+    def __init__(self) -> None:
+        self._buffer: dict[int, BufferedMessage] = {}
+
+    async def buffer_message(
+        self, telegram_user_id: int, entry: BufferedMessage
+    ) -> None:
+        self._buffer[telegram_user_id] = entry
+
+    async def get_buffered(self, telegram_user_id: int) -> BufferedMessage | None:
+        return self._buffer.get(telegram_user_id)
+
+    async def pop_buffered(self, telegram_user_id: int) -> BufferedMessage | None:
+        return self._buffer.pop(telegram_user_id, None)
+
+    async def get_expired_buffers(self) -> list[tuple[int, BufferedMessage]]:
+        now = datetime.now(timezone.utc)
+        expired: list[tuple[int, BufferedMessage]] = []
+        for user_id, entry in list(self._buffer.items()):
+            if entry.expires_at <= now:
+                expired.append((user_id, entry))
+                del self._buffer[user_id]
+        return expired
+
+    def buffered_count(self) -> int:
+        return len(self._buffer)
+
+    def export_buffer(self) -> list[tuple[int, BufferedMessage]]:
+        return list(self._buffer.items())
+
+    def restore_buffer(self, entries: list[tuple[int, BufferedMessage]]) -> None:
+        """Add snapshot entries; one buffered since startup wins over the snapshot's."""
+        for telegram_user_id, entry in entries:
+            self._buffer.setdefault(telegram_user_id, entry)
+
+
+# --- Row builders (shared) ---
+
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds")
+
+
+def content_type(message: Message) -> str:
+    """Map message attachment flags to the ticket_messages/raw_messages content_type."""
+    if message.has_photo:
+        return "photo"
+    if message.has_video:
+        return "video"
+    if message.has_voice:
+        return "voice"
+    if message.has_location:
+        return "location"
+    if message.has_document:
+        return "document"
+    return "text"
+
+
+def _enum_value(value: object) -> object:
+    return value.value if hasattr(value, "value") else value
+
+
+def ticket_row(ticket: Ticket) -> dict:
+    """Insert row for a new ticket; display_id, id and timestamps are left to the backend."""
+    is_urgent = ticket.ai_urgency >= 4
+    ai_category = str(_enum_value(ticket.ai_category))
+    return {
+        "driver_id": ticket.driver_id,
+        "source_type": str(_enum_value(ticket.source_type)),
+        "source_chat_id": ticket.source_chat_id or None,
+        "source_name": ticket.source_name or None,
+        "business_connection_id": ticket.business_connection_id or None,
+        "status": "open",
+        "priority": "urgent" if is_urgent else "normal",
+        "is_urgent": is_urgent,
+        "ai_category": "other" if ai_category == "unclassified" else ai_category,
+        "ai_urgency": ticket.ai_urgency,
+        "ai_summary": ticket.ai_summary or None,
+        "ai_location": ticket.ai_location or None,
+    }
+
+
+_TICKET_FIELD_MAP = {
+    "urgency": "ai_urgency",
+    "category": "ai_category",
+    "location": "ai_location",
+    "summary": "ai_summary",
+    "status": "status",
+}
+
+
+def ticket_update(**updates: object) -> dict:
+    """Column values for update_ticket(urgency=..., category=..., ...). Urgency >= 4 escalates."""
+    data: dict = {}
+    for key, value in updates.items():
+        column = _TICKET_FIELD_MAP.get(key, key)
+        value = _enum_value(value)
+        if column == "ai_category" and value == "unclassified":
+            value = "other"
+        data[column] = value
+    urgency = data.get("ai_urgency")
+    if isinstance(urgency, int) and urgency >= 4:
+        data["is_urgent"] = True
+        data["priority"] = "urgent"
+    data["updated_at"] = now_iso()
+    return data
+
+
+def classification_update(category: str, urgency: int) -> dict:
+    """Column values for update_tickets_classification; a lower urgency keeps priority."""
+    data: dict = {
+        "ai_category": "other" if category == "unclassified" else category,
+        "ai_urgency": urgency,
+        "updated_at": now_iso(),
+    }
+    if urgency >= 4:
+        data["is_urgent"] = True
+        data["priority"] = "urgent"
+    return data
+
+
+def inbound_message_rows(ticket_id: str, messages: list[Message], driver_name: str) -> list[dict]:
+    rows = []
+    for message in messages:
+        kind = content_type(message)
+        rows.append(
+            {
+                "ticket_id": ticket_id,
+                "direction": "inbound",
+                "sender_type": "driver",
+                "sender_name": driver_name,
+                "content_text": message.text or f"[{kind}]",
+                "content_type": kind,
+                "telegram_message_id": message.telegram_message_id,
+                "is_internal_note": False,
+            }
+        )
+    return rows
+
+
+def outbound_message_row(
+    ticket_id: str, text: str, sender_name: str, sender_user_id: str | None
+) -> dict:
+    return {
+        "ticket_id": ticket_id,
+        "direction": "outbound",
+        "sender_type": "operator",
+        "sender_name": sender_name,
+        "sender_user_id": sender_user_id,
+        "content_text": text,
+        "content_type": "text",
+        "is_internal_note": False,
+        "delivery_status": "pending",
+    }
+
+
+def raw_message_rows(
+    messages: list[Message],
+    classification_result: str,
+    classification_source: str,
+    ticket_id: str | None,
+    ai_response: dict | None,
+) -> list[dict]:
+    rows = []
+    for message in messages:
+        kind = content_type(message)
+        rows.append(
+            {
+                "telegram_message_id": message.telegram_message_id,
+                "telegram_user_id": message.telegram_user_id,
+                "chat_id": message.telegram_chat_id,
+                "chat_type": "private" if message.source == MessageSource.DM else "group",
+                "content_text": message.text[:2000] if message.text else None,
+                "content_type": kind,
+                "has_media": kind != "text",
+                "classification_result": classification_result,
+                "classification_source": classification_source,
+                "ticket_id": ticket_id,
+                "ai_raw_response": ai_response,
+            }
+        )
+    return rows
+
+
+# --- Backend selection ---
+
+
+def create_storage() -> StorageBackend:
+    if settings.storage_backend == "sqlite":
+        from src.sqlite_storage import SQLiteStorage
+
+        return SQLiteStorage(settings.sqlite_path)
+    if settings.storage_backend != "supabase":
+        raise ValueError(f"Unknown STORAGE_BACKEND: {settings.storage_backend!r}")
+    from src.supabase_storage import SupabaseStorage
+
+    return SupabaseStorage()
+
+
+# Singleton
+storage: StorageBackend = create_storage()
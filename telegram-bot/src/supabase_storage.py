@@ -24,37 +24,95 @@ V2 schema notes:
 
 from __future__ import annotations
 
+import asyncio
 import logging
+import threading
+from collections.abc import AsyncIterator, Callable
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-
-from supabase import Client, create_client
+from typing import TYPE_CHECKING
 
 from src.config import settings
-from src.models import (
-    BufferedMessage,
-    Driver,
-    Message,
-    MessageSource,
-    Ticket,
-    TicketCategory,
+from src.metrics import MESSAGES_TOTAL, STORAGE_SECONDS, instrument_methods
+from src.models import Driver, Message, Ticket
+from src.storage import (
+    OPEN_STATUSES,
+    AuditGroup,
+    InMemoryBuffer,
+    classification_update,
+    content_type,
+    inbound_message_rows,
+    outbound_message_row,
+    raw_message_rows,
+    ticket_row,
+    ticket_update,
 )
 
+if TYPE_CHECKING:
+    from supabase import Client
+
 logger = logging.getLogger(__name__)
 
+# supabase-py is synchronous. Requests run on this pool so a round trip never
+# stalls the event loop: other updates, and an AI call started alongside a
+# lookup, keep making progress.
+_pool: ThreadPoolExecutor | None = None
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(
+            max_workers=settings.supabase_max_concurrency, thread_name_prefix="supabase"
+        )
+    return _pool
 
-class SupabaseStorage:
+
+@instrument_methods(STORAGE_SECONDS)
+class SupabaseStorage(InMemoryBuffer):
     def __init__(self) -> None:
-        if settings.supabase_url and settings.supabase_service_key:
-            self.client: Client = create_client(
-                settings.supabase_url, settings.supabase_service_key
-            )
-            self._enabled = True
-            logger.info("Supabase storage initialized")
-        else:
-            self._enabled = False
+        super().__init__()
+        self._client: Client | None = None
+        self._client_lock = threading.Lock()
+        self._enabled = bool(settings.supabase_url and settings.supabase_service_key)
+        if not self._enabled:
             logger.warning("Supabase not configured, using in-memory fallback")
 
-        self._buffer: dict[int, BufferedMessage] = {}
+    @property
+    def client(self) -> Client:
+        """The supabase-py client, created on first use (the import alone is ~150 ms)."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import httpx
+                    from supabase import ClientOptions, create_client
+
+                    from src.transport import get_sync_transport
+
+                    http = httpx.Client(
+                        transport=get_sync_transport("supabase"),
+                        timeout=httpx.Timeout(120.0, connect=5.0),  # postgrest-py's default
+                        follow_redirects=True,
+                    )
+                    self._client = create_client(
+                        settings.supabase_url,
+                        settings.supabase_service_key,
+                        options=ClientOptions(httpx_client=http),
+                    )
+                    logger.info("Supabase storage initialized")
+        return self._client
+
+    async def prewarm(self) -> None:
+        """Create the client on the Supabase pool instead of inside the first update."""
+        if self._enabled:
+            await self._offload(lambda: self.client)
+
+    async def _offload(self, func: Callable, *args: object) -> object:
+        return await asyncio.get_running_loop().run_in_executor(_get_pool(), func, *args)
+
+    async def _execute(self, query: object) -> object:
+        """Run a PostgREST request builder on the Supabase pool."""
+        return await self._offload(query.execute)
 
     # --- Connection Validation ---
 
@@ -64,14 +122,13 @@ class SupabaseStorage:
         """Check if a business_connection_id is registered and active."""
         if not self._enabled:
             return False
-        result = (
+        result = await self._execute(
             self.client.table("telegram_connections")
             .select("id")
             .eq("connection_type", "business_account")
             .eq("business_connection_id", business_connection_id)
             .eq("is_active", True)
             .limit(1)
-            .execute()
         )
         return bool(result.data)
 
@@ -79,14 +136,13 @@ class SupabaseStorage:
         """Check if a group chat_id is registered and active."""
         if not self._enabled:
             return False
-        result = (
+        result = await self._execute(
             self.client.table("telegram_connections")
             .select("id")
             .eq("connection_type", "group")
             .eq("chat_id", chat_id)
             .eq("is_active", True)
             .limit(1)
-            .execute()
         )
         return bool(result.data)
 
@@ -107,11 +163,37 @@ class SupabaseStorage:
             query = query.eq("connection_type", "group").eq("chat_id", chat_id)
         else:
             return ""
-        result = query.limit(1).execute()
+        result = await self._execute(query.limit(1))
         if result.data:
             return result.data[0].get("display_name", "")
         return ""
 
+    async def get_active_connection_name(
+        self,
+        business_connection_id: str | None = None,
+        chat_id: int | None = None,
+    ) -> str | None:
+        """Validate and name a connection in one query. None if not registered/active."""
+        if not self._enabled:
+            return None
+        query = (
+            self.client.table("telegram_connections")
+            .select("display_name")
+            .eq("is_active", True)
+        )
+        if business_connection_id:
+            query = query.eq("connection_type", "business_account").eq(
+                "business_connection_id", business_connection_id
+            )
+        elif chat_id is not None:
+            query = query.eq("connection_type", "group").eq("chat_id", chat_id)
+        else:
+            return None
+        result = await self._execute(query.limit(1))
+        if not result.data:
+            return None
+        return result.data[0].get("display_name") or ""
+
     # --- Drivers ---
 
     async def upsert_driver(
@@ -134,12 +216,11 @@ class SupabaseStorage:
 
         now = datetime.now(timezone.utc).isoformat()
 
-        existing = (
+        existing = await self._execute(
             self.client.table("drivers")
             .select("id")
             .eq("telegram_user_id", telegram_user_id)
             .limit(1)
-            .execute()
         )
 
         if existing.data:
@@ -152,9 +233,9 @@ class SupabaseStorage:
             if username:
                 update_data["username"] = username
 
-            self.client.table("drivers").update(update_data).eq(
-                "id", driver_id
-            ).execute()
+            await self._execute(
+                self.client.table("drivers").update(update_data).eq("id", driver_id)
+            )
 
             return Driver(
                 id=driver_id,
@@ -164,7 +245,7 @@ class SupabaseStorage:
                 username=username,
             )
 
-        result = (
+        result = await self._execute(
             self.client.table("drivers")
             .insert(
                 {
@@ -176,7 +257,6 @@ class SupabaseStorage:
                     "last_seen_at": now,
                 }
             )
-            .execute()
         )
 
         driver_id = result.data[0]["id"]
@@ -191,12 +271,11 @@ class SupabaseStorage:
     async def get_driver(self, driver_id: str) -> Driver | None:
         if not self._enabled:
             return None
-        result = (
+        result = await self._execute(
             self.client.table("drivers")
             .select("*")
             .eq("id", driver_id)
             .limit(1)
-            .execute()
         )
         if not result.data:
             return None
@@ -204,9 +283,9 @@ class SupabaseStorage:
         return Driver(
             id=d["id"],
             telegram_user_id=d.get("telegram_user_id") or 0,
-            first_name=d.get("first_name", ""),
-            last_name=d.get("last_name", ""),
-            username=d.get("username", ""),
+            first_name=d.get("first_name") or "",
+            last_name=d.get("last_name") or "",
+            username=d.get("username") or "",
         )
 
     async def get_driver_by_telegram_id(
@@ -214,12 +293,11 @@ class SupabaseStorage:
     ) -> Driver | None:
         if not self._enabled:
             return None
-        result = (
+        result = await self._execute(
             self.client.table("drivers")
             .select("*")
             .eq("telegram_user_id", telegram_user_id)
             .limit(1)
-            .execute()
         )
         if not result.data:
             return None
@@ -227,9 +305,9 @@ class SupabaseStorage:
         return Driver(
             id=d["id"],
             telegram_user_id=d.get("telegram_user_id") or 0,
-            first_name=d.get("first_name", ""),
-            last_name=d.get("last_name", ""),
-            username=d.get("username", ""),
+            first_name=d.get("first_name") or "",
+            last_name=d.get("last_name") or "",
+            username=d.get("username") or "",
         )
 
     # --- Open Ticket Check ---
@@ -247,9 +325,12 @@ class SupabaseStorage:
         cutoff = (datetime.now(timezone.utc) - timedelta(hours=hours)).isoformat()
         query = (
             self.client.table("tickets")
-            .select("id, status, updated_at, source_type, source_chat_id, business_connection_id")
+            .select(
+                "id, status, ai_urgency, updated_at, source_type, source_chat_id,"
+                " business_connection_id"
+            )
             .eq("driver_id", driver_id)
-            .in_("status", ["open", "in_progress", "on_hold"])
+            .in_("status", list(OPEN_STATUSES))
             .gte("updated_at", cutoff)
             .order("updated_at", desc=True)
             .limit(1)
@@ -260,7 +341,7 @@ class SupabaseStorage:
         else:
             query = query.eq("source_chat_id", int(source_identifier))
 
-        result = query.execute()
+        result = await self._execute(query)
         return result.data[0] if result.data else None
 
     async def find_recently_resolved_ticket(
@@ -270,7 +351,7 @@ class SupabaseStorage:
         if not self._enabled:
             return None
         cutoff = (datetime.now(timezone.utc) - timedelta(hours=hours)).isoformat()
-        result = (
+        result = await self._execute(
             self.client.table("tickets")
             .select("id, resolved_at")
             .eq("driver_id", driver_id)
@@ -278,7 +359,6 @@ class SupabaseStorage:
             .gte("resolved_at", cutoff)
             .order("resolved_at", desc=True)
             .limit(1)
-            .execute()
         )
         return result.data[0] if result.data else None
 
@@ -292,24 +372,22 @@ class SupabaseStorage:
         """Find a ticket by looking up a ticket_message with a specific telegram message ID."""
         if not self._enabled:
             return None
-        result = (
+        result = await self._execute(
             self.client.table("ticket_messages")
             .select("ticket_id")
             .eq("telegram_message_id", telegram_message_id)
             .limit(1)
-            .execute()
         )
         if not result.data:
             return None
         ticket_id = result.data[0]["ticket_id"]
-        ticket_result = (
+        ticket_result = await self._execute(
             self.client.table("tickets")
-            .select("id, status")
+            .select("id, status, ai_urgency")
             .eq("id", ticket_id)
             .eq("source_chat_id", chat_id)
-            .in_("status", ["open", "in_progress", "on_hold"])
+            .in_("status", list(OPEN_STATUSES))
             .limit(1)
-            .execute()
         )
         return ticket_result.data[0] if ticket_result.data else None
 
@@ -321,38 +399,7 @@ class SupabaseStorage:
         if not self._enabled:
             return ticket.id
 
-        source_type = (
-            ticket.source_type.value
-            if hasattr(ticket.source_type, "value")
-            else str(ticket.source_type)
-        )
-
-        is_urgent = ticket.ai_urgency >= 4
-        priority = "urgent" if is_urgent else "normal"
-
-        ai_category = (
-            ticket.ai_category.value
-            if hasattr(ticket.ai_category, "value")
-            else str(ticket.ai_category)
-        )
-        if ai_category == "unclassified":
-            ai_category = "other"
-
-        data: dict = {
-            "driver_id": ticket.driver_id,
-            "source_type": source_type,
-            "source_chat_id": ticket.source_chat_id or None,
-            "source_name": ticket.source_name or None,
-            "business_connection_id": ticket.business_connection_id or None,
-            "status": "open",
-            "priority": priority,
-            "is_urgent": is_urgent,
-            "ai_category": ai_category,
-            "ai_urgency": ticket.ai_urgency,
-            "ai_summary": ticket.ai_summary or None,
-        }
-
-        result = self.client.table("tickets").insert(data).execute()
+        result = await self._execute(self.client.table("tickets").insert(ticket_row(ticket)))
         ticket_id = result.data[0]["id"]
         return ticket_id
 
@@ -360,30 +407,9 @@ class SupabaseStorage:
         """Update ticket fields in Supabase."""
         if not self._enabled:
             return
-        update_data: dict = {}
-        field_map = {
-            "urgency": "ai_urgency",
-            "category": "ai_category",
-            "location": "ai_location",
-            "summary": "ai_summary",
-            "status": "status",
-        }
-        for key, value in updates.items():
-            db_field = field_map.get(key, key)
-            if hasattr(value, "value"):
-                value = value.value
-            if db_field == "ai_category" and value == "unclassified":
-                value = "other"
-            update_data[db_field] = value
-
-        if "ai_urgency" in update_data:
-            urgency_val = update_data["ai_urgency"]
-            if isinstance(urgency_val, int) and urgency_val >= 4:
-                update_data["is_urgent"] = True
-                update_data["priority"] = "urgent"
-
-        update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
-        self.client.table("tickets").update(update_data).eq("id", ticket_id).execute()
+        await self._execute(
+            self.client.table("tickets").update(ticket_update(**updates)).eq("id", ticket_id)
+        )
 
     async def append_message_to_ticket(
         self,
@@ -392,36 +418,57 @@ class SupabaseStorage:
         driver_name: str = "",
     ) -> None:
         """Add a driver message to an existing ticket via ticket_messages table."""
-        if not self._enabled:
+        await self.append_messages_to_ticket(ticket_id, [message], driver_name)
+
+    async def append_messages_to_ticket(
+        self,
+        ticket_id: str,
+        messages: list[Message],
+        driver_name: str = "",
+    ) -> list[dict]:
+        """Add several driver messages to a ticket with a single bulk insert.
+
+        Returns the inserted ticket_messages rows.
+        """
+        if not self._enabled or not messages:
+            return []
+        rows = inbound_message_rows(ticket_id, messages, driver_name)
+        result = await self._execute(self.client.table("ticket_messages").insert(rows))
+
+        await self._execute(
+            self.client.table("tickets")
+            .update({"updated_at": datetime.now(timezone.utc).isoformat()})
+            .eq("id", ticket_id)
+        )
+        return result.data or []
+
+    async def update_ticket_messages_media(self, rows: list[dict]) -> None:
+        """Write media stage results back to ticket_messages: each row is an id and its columns.
+
+        PostgREST has no bulk UPDATE, and upserting whole rows captured at insert
+        time would revert edits made since. Each row is PATCHed by id instead, with
+        only the media columns; the requests run concurrently (an album is ten at most).
+        """
+        if not self._enabled or not rows:
             return
-        content_type = "text"
-        if message.has_photo:
-            content_type = "photo"
-        elif message.has_video:
-            content_type = "video"
-        elif message.has_voice:
-            content_type = "voice"
-        elif message.has_location:
-            content_type = "location"
-        elif message.has_document:
-            content_type = "document"
-
-        self.client.table("ticket_messages").insert(
-            {
-                "ticket_id": ticket_id,
-                "direction": "inbound",
-                "sender_type": "driver",
-                "sender_name": driver_name,
-                "content_text": message.text or f"[{content_type}]",
-                "content_type": content_type,
-                "telegram_message_id": message.telegram_message_id,
-                "is_internal_note": False,
-            }
-        ).execute()
-
-        self.client.table("tickets").update(
-            {"updated_at": datetime.now(timezone.utc).isoformat()}
-        ).eq("id", ticket_id).execute()
+        await asyncio.gather(*(self._patch_ticket_message(row) for row in rows))
+
+    async def _patch_ticket_message(self, row: dict) -> None:
+        """PATCH one ticket_messages row by id with the other columns in ``row``."""
+        fields = {column: value for column, value in row.items() if column != "id"}
+        await self._execute(
+            self.client.table("ticket_messages").update(fields).eq("id", row["id"])
+        )
+
+    async def upload_media(self, path: str, data: bytes, content_type: str) -> str:
+        """Upload a media file to Supabase Storage. Returns its public URL."""
+        if not self._enabled:
+            return ""
+        bucket = self.client.storage.from_(settings.media_bucket)
+        await self._offload(
+            bucket.upload, path, data, {"content-type": content_type, "upsert": "true"}
+        )
+        return bucket.get_public_url(path)
 
     # --- Raw Messages (Audit Trail) ---
 
@@ -434,49 +481,73 @@ class SupabaseStorage:
         ai_response: dict | None = None,
     ) -> None:
         """Log a raw message for audit trail."""
-        if not self._enabled:
-            return
-        content_type = "text"
-        has_media = False
-        if message.has_photo:
-            content_type = "photo"
-            has_media = True
-        elif message.has_video:
-            content_type = "video"
-            has_media = True
-        elif message.has_voice:
-            content_type = "voice"
-            has_media = True
-        elif message.has_location:
-            content_type = "location"
-            has_media = True
-        elif message.has_document:
-            content_type = "document"
-            has_media = True
-
-        chat_type = "private" if message.source == MessageSource.DM else "group"
+        await self.log_raw_messages(
+            [message],
+            classification_result=classification_result,
+            classification_source=classification_source,
+            ticket_id=ticket_id,
+            ai_response=ai_response,
+        )
 
+    async def log_raw_messages(
+        self,
+        messages: list[Message],
+        classification_result: str,
+        classification_source: str,
+        ticket_id: str | None = None,
+        ai_response: dict | None = None,
+    ) -> None:
+        """Log several raw messages sharing one outcome with a single bulk insert."""
+        MESSAGES_TOTAL.inc(classification_result, classification_source, amount=len(messages))
+        if not self._enabled or not messages:
+            return
+        rows = raw_message_rows(
+            messages, classification_result, classification_source, ticket_id, ai_response
+        )
         try:
-            self.client.table("raw_messages").insert(
-                {
-                    "telegram_message_id": message.telegram_message_id,
-                    "telegram_user_id": message.telegram_user_id,
-                    "chat_id": message.telegram_chat_id,
-                    "chat_type": chat_type,
-                    "content_text": (
-                        message.text[:2000] if message.text else None
-                    ),
-                    "content_type": content_type,
-                    "has_media": has_media,
-                    "classification_result": classification_result,
-                    "classification_source": classification_source,
-                    "ticket_id": ticket_id,
-                    "ai_raw_response": ai_response,
-                }
-            ).execute()
+            await self._execute(self.client.table("raw_messages").insert(rows))
         except Exception as e:
             logger.error("Failed to log raw message: %s", e)
 
+    async def log_raw_message_groups(self, groups: list[AuditGroup]) -> None:
+        """Audit rows of several outcomes in one insert (batched audit while overloaded)."""
+        rows = []
+        for messages, classification_result, classification_source, ticket_id in groups:
+            MESSAGES_TOTAL.inc(classification_result, classification_source, amount=len(messages))
+            rows.extend(
+                raw_message_rows(
+                    messages, classification_result, classification_source, ticket_id, None
+                )
+            )
+        if not self._enabled or not rows:
+            return
+        try:
+            await self._execute(self.client.table("raw_messages").insert(rows))
+        except Exception as e:
+            logger.error("Failed to log %d raw messages: %s", len(rows), e)
+
+    async def find_raw_message(self, chat_id: int, telegram_message_id: int) -> dict | None:
+        """Latest audit row for a Telegram message; used to reconcile edits."""
+        if not self._enabled:
+            return None
+        result = await self._execute(
+            self.client.table("raw_messages")
+            .select("id, content_text, classification_result, classification_source, ticket_id")
+            .eq("chat_id", chat_id)
+            .eq("telegram_message_id", telegram_message_id)
+            .order("created_at", desc=True)
+            .limit(1)
+        )
+        return result.data[0] if result.data else None
+
+    async def update_raw_message(self, raw_message_id: str, **fields: object) -> None:
+        """Rewrite an audit row in place (edited text, new outcome)."""
+        if not self._enabled:
+            return
+        await self._execute(
+            self.client.table("raw_messages").update(fields).eq("id", raw_message_id)
+        )
+
     # --- Messages (create ticket_message for new ticket) ---
 
     async def save_message_as_ticket_message(
@@ -488,48 +559,174 @@ class SupabaseStorage:
         """Save a message as a ticket_message (for initial ticket creation)."""
         await self.append_message_to_ticket(ticket_id, message, driver_name)
 
-    # --- Buffer (kept in-memory, short-lived) ---
+    async def save_messages_as_ticket_messages(
+        self,
+        messages: list[Message],
+        ticket_id: str,
+        driver_name: str = "",
+    ) -> list[dict]:
+        """Bulk-save the messages that opened a ticket (albums, buffer merges)."""
+        return await self.append_messages_to_ticket(ticket_id, messages, driver_name)
 
-    async def buffer_message(
-        self, telegram_user_id: int, entry: BufferedMessage
-    ) -> None:
-        self._buffer[telegram_user_id] = entry
+    async def update_ticket_message_text(self, ticket_id: str, message: Message) -> None:
+        """Apply a driver's edit to the inbound ticket_messages row in place."""
+        if not self._enabled:
+            return
+        text = message.text or f"[{content_type(message)}]"
+        await self._execute(
+            self.client.table("ticket_messages")
+            .update({"content_text": text})
+            .eq("ticket_id", ticket_id)
+            .eq("telegram_message_id", message.telegram_message_id)
+            .eq("direction", "inbound")
+        )
 
-    async def get_buffered(self, telegram_user_id: int) -> BufferedMessage | None:
-        return self._buffer.get(telegram_user_id)
+    # --- Outbound replies (see src/outbound.py) ---
 
-    async def pop_buffered(self, telegram_user_id: int) -> BufferedMessage | None:
-        return self._buffer.pop(telegram_user_id, None)
+    async def create_outbound_message(
+        self,
+        ticket_id: str,
+        text: str,
+        sender_name: str = "",
+        sender_user_id: str | None = None,
+    ) -> dict:
+        """Insert an operator reply as a pending outbound ticket_message. Returns the row."""
+        row = outbound_message_row(ticket_id, text, sender_name, sender_user_id)
+        if not self._enabled:
+            return {"id": f"local-{datetime.now(timezone.utc).timestamp()}", **row}
+        result = await self._execute(self.client.table("ticket_messages").insert(row))
+        return result.data[0]
 
-    async def get_expired_buffers(self) -> list[tuple[int, BufferedMessage]]:
-        now = datetime.now(timezone.utc)
-        expired: list[tuple[int, BufferedMessage]] = []
-        for user_id, entry in list(self._buffer.items()):
-            if entry.expires_at <= now:
-                expired.append((user_id, entry))
-                del self._buffer[user_id]
-        return expired
+    async def get_ticket_message(self, message_id: str) -> dict | None:
+        if not self._enabled:
+            return None
+        result = await self._execute(
+            self.client.table("ticket_messages").select("*").eq("id", message_id).limit(1)
+        )
+        return result.data[0] if result.data else None
 
-    # --- Stats ---
+    async def get_last_inbound_telegram_message_id(self, ticket_id: str) -> int | None:
+        """The driver's latest message on a ticket, used as the group reply target."""
+        if not self._enabled:
+            return None
+        result = await self._execute(
+            self.client.table("ticket_messages")
+            .select("telegram_message_id")
+            .eq("ticket_id", ticket_id)
+            .eq("direction", "inbound")
+            .not_.is_("telegram_message_id", "null")
+            .order("created_at", desc=True)
+            .limit(1)
+        )
+        return result.data[0]["telegram_message_id"] if result.data else None
 
-    async def stats(self) -> dict[str, int]:
+    async def get_pending_outbound_messages(self, limit: int = 1000) -> list[dict]:
+        """Outbound replies not yet delivered (the durable side of the send queue)."""
         if not self._enabled:
-            return {"drivers": 0, "tickets": 0, "buffered": len(self._buffer)}
-        try:
-            drivers = (
-                self.client.table("drivers").select("id", count="exact").execute()
-            )
-            tickets = (
-                self.client.table("tickets").select("id", count="exact").execute()
+            return []
+        result = await self._execute(
+            self.client.table("ticket_messages")
+            .select("*")
+            .eq("direction", "outbound")
+            .eq("delivery_status", "pending")
+            .eq("is_internal_note", False)
+            .order("created_at")
+            .limit(limit)
+        )
+        return result.data or []
+
+    async def update_ticket_messages_delivery(self, rows: list[dict]) -> None:
+        """Write delivery results: each row is an id and the columns to set.
+
+        PATCHed by id like update_ticket_messages_media, so a status write never
+        reverts columns changed since the reply was queued.
+        """
+        if not self._enabled or not rows:
+            return
+        await asyncio.gather(*(self._patch_ticket_message(row) for row in rows))
+
+    # --- Bulk reads (offline tools) ---
+
+    async def iter_rows_keyset(
+        self,
+        table: str,
+        columns: str = "*",
+        page_size: int = 1000,
+        after: tuple[str, str] | None = None,
+        key_column: str = "created_at",
+    ) -> AsyncIterator[list[dict]]:
+        """Stream a table in (key_column, id) order, one page at a time.
+
+        Keyset pagination keeps every page an index range scan regardless of depth,
+        unlike OFFSET. ``after`` resumes from a (key, id) cursor. The selected
+        columns must include key_column and id.
+        """
+        if not self._enabled:
+            return
+        while True:
+            query = (
+                self.client.table(table)
+                .select(columns)
+                .order(key_column)
+                .order("id")
+                .limit(page_size)
             )
-            return {
-                "drivers": drivers.count or 0,
-                "tickets": tickets.count or 0,
-                "buffered": len(self._buffer),
-            }
-        except Exception:
-            return {"drivers": 0, "tickets": 0, "buffered": len(self._buffer)}
+            if after is not None:
+                key, row_id = after
+                query = query.or_(
+                    f'{key_column}.gt."{key}",and({key_column}.eq."{key}",id.gt.{row_id})'
+                )
+            rows = (await self._execute(query)).data or []
+            if not rows:
+                return
+            yield rows
+            if len(rows) < page_size:
+                return
+            after = (rows[-1][key_column], rows[-1]["id"])
+
+    async def get_tickets_by_ids(self, ticket_ids: list[str], columns: str = "*") -> list[dict]:
+        if not self._enabled or not ticket_ids:
+            return []
+        result = await self._execute(
+            self.client.table("tickets").select(columns).in_("id", ticket_ids)
+        )
+        return result.data or []
 
+    async def update_tickets_classification(
+        self, ticket_ids: list[str], category: str, urgency: int
+    ) -> None:
+        """Set ai_category/ai_urgency on many tickets in one UPDATE (offline re-tagging).
 
-# Singleton
-storage = SupabaseStorage()
+        Like update_ticket, urgency >= 4 marks the ticket urgent; a lower urgency
+        leaves priority as it is.
+        """
+        if not self._enabled or not ticket_ids:
+            return
+        await self._execute(
+            self.client.table("tickets")
+            .update(classification_update(category, urgency))
+            .in_("id", ticket_ids)
+        )
+
+    # --- Stats ---
+
+    async def stats(self) -> dict[str, int]:
+        """Approximate row counts plus buffer size. Raises if Supabase is unreachable.
+
+        Uses count="estimated" with HEAD requests: PostgREST answers from planner
+        statistics (pg_class.reltuples) once a table outgrows max-rows, so the cost
+        stays flat as tables grow, unlike a full count="exact" scan.
+        """
+        if not self._enabled:
+            return {"drivers": 0, "tickets": 0, "buffered": len(self._buffer)}
+        drivers = await self._execute(
+            self.client.table("drivers").select("id", count="estimated", head=True)
+        )
+        tickets = await self._execute(
+            self.client.table("tickets").select("id", count="estimated", head=True)
+        )
+        return {
+            "drivers": drivers.count or 0,
+            "tickets": tickets.count or 0,
+            "buffered": len(self._buffer),
+        }
@@ -0,0 +1,162 @@
+"""Per-update trace spans with slow-update logging.
+
+Each update handled by bot.handle_message (and each coalesced album) runs
+inside ``trace()``. Spans nest through a context variable, so tasks started
+from inside a span keep their parent. That covers asyncio.gather too. The
+stage and SupabaseStorage timers in metrics.py, and the OpenAI helper in
+classifier.py, open spans themselves. The tree therefore covers every await on
+the update path without separate tracing calls.
+
+When a trace takes longer than slow_update_threshold_seconds, its tree is
+logged at WARNING::
+
+    Slow update 8.412s (update_id=1234)
+      +0.000s    8.412s  update
+      +0.001s    0.004s    stage:validate_connection
+      +0.001s    0.002s      storage:validate_group_connection
+      ...
+      +0.190s    8.101s    stage:classify
+      +0.190s    8.100s      openai:classify [error]
+
+A gap between a span and its children, or a span far longer than the sum of
+its children, means time was spent outside any awaited call. That is usually
+a blocked event loop; compare with fleetrelay_event_loop_lag_seconds.
+
+Outside a trace, opening a span is a single context-variable lookup.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import logging
+import time
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    __slots__ = ("name", "start", "end", "children", "error", "trace")
+
+    def __init__(self, name: str, trace: Trace) -> None:
+        self.name = name
+        self.start = time.perf_counter()
+        self.end = 0.0
+        self.children: list[Span] = []
+        self.error = False
+        self.trace = trace
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+
+class Trace:
+    __slots__ = ("root", "description", "span_count", "dropped")
+
+    def __init__(self, name: str, description: str) -> None:
+        self.description = description
+        self.span_count = 1
+        self.dropped = 0
+        self.root = Span(name, self)
+
+    def format(self) -> str:
+        lines = [f"Slow update {self.root.duration:.3f}s ({self.description})"]
+        self._format_span(self.root, 1, lines)
+        if self.dropped:
+            lines.append(f"  ... {self.dropped} more spans not recorded (trace_max_spans)")
+        return "\n".join(lines)
+
+    def _format_span(self, span: Span, depth: int, lines: list[str]) -> None:
+        offset = span.start - self.root.start
+        marker = " [error]" if span.error else ""
+        if not span.end:
+            marker += " [unfinished]"
+        lines.append(
+            f"  +{offset:.3f}s {span.duration:>8.3f}s  {'  ' * (depth - 1)}{span.name}{marker}"
+        )
+        for child in span.children:
+            self._format_span(child, depth + 1, lines)
+
+
+_current_span: contextvars.ContextVar[Span | None] = contextvars.ContextVar(
+    "fleetrelay_span", default=None
+)
+
+
+def start_span(name: str) -> tuple[Span, contextvars.Token] | None:
+    """Open a child of the current span; None (and no work) outside a trace."""
+    parent = _current_span.get()
+    if parent is None:
+        return None
+    trace = parent.trace
+    if trace.root.end:
+        return None  # background work that outlived its update
+    if trace.span_count >= settings.trace_max_spans:
+        trace.dropped += 1
+        return None
+    trace.span_count += 1
+    span = Span(name, trace)
+    parent.children.append(span)
+    return span, _current_span.set(span)
+
+
+def end_span(handle: tuple[Span, contextvars.Token] | None, error: bool = False) -> None:
+    if handle is None:
+        return
+    span, token = handle
+    span.end = time.perf_counter()
+    span.error = error
+    try:
+        _current_span.reset(token)
+    except ValueError:
+        # Ended from a different context (e.g. a task that outlived the trace).
+        pass
+
+
+class _SpanContext:
+    __slots__ = ("_name", "_handle")
+
+    def __init__(self, name: str) -> None:
+        self._name = name
+
+    def __enter__(self) -> None:
+        self._handle = start_span(self._name)
+
+    def __exit__(self, exc_type: object, *exc: object) -> None:
+        end_span(self._handle, error=exc_type is not None)
+
+
+class _TraceContext:
+    __slots__ = ("_trace", "_token")
+
+    def __init__(self, name: str, description: str = "") -> None:
+        self._trace = Trace(name, description)
+
+    def __enter__(self) -> Trace:
+        self._token = _current_span.set(self._trace.root)
+        return self._trace
+
+    def __exit__(self, exc_type: object, *exc: object) -> None:
+        root = self._trace.root
+        root.end = time.perf_counter()
+        root.error = exc_type is not None
+        _current_span.reset(self._token)
+        if root.duration >= settings.slow_update_threshold_seconds:
+            logger.warning("%s", self._trace.format())
+
+
+def span(name: str) -> _SpanContext:
+    """``with span("name"):`` records a child span of the current trace, if any."""
+    return _SpanContext(name)
+
+
+def trace(name: str, description: str = "") -> _TraceContext:
+    """Root span for one update; logs the span tree if it exceeds the slow threshold.
+
+    Background tasks started inside (enrichment, media) inherit the context, but
+    stop recording once the update finishes; if still running at that point
+    they show as [unfinished].
+    """
+    return _TraceContext(name, description)
@@ -0,0 +1,342 @@
+"""Shared outbound HTTP: one tuned connection pool per upstream, used by every client of it.
+
+python-telegram-bot, openai and supabase-py each build their own httpx stack with
+default pools and a 5 s keep-alive, so a burst after a quiet minute pays a fresh
+TLS handshake per request and can queue on a small pool. Instead, each client is
+handed a transport from here:
+
+- ``telegram``: the Bot API client (main.py via bot.py) and media downloads
+  (media.py). Sized by TELEGRAM_MAX_CONNECTIONS.
+- ``openai``: the AsyncOpenAI client (classifier.py). Sized by OPENAI_MAX_CONNECTIONS.
+- ``supabase``: the synchronous supabase-py client, used from the Supabase
+  worker threads. Sized by SUPABASE_MAX_CONCURRENCY, one connection per thread.
+
+Every pool negotiates HTTP/2 when HTTP2 is on and the server offers it. Idle
+connections stay open for HTTP_KEEPALIVE_SECONDS. Host lookups are cached for
+HTTP_DNS_CACHE_SECONDS across all pools. A cached address that refuses a
+connection is dropped, and the next connection resolves again. Each request
+records how long it waited for a connection in
+fleetrelay_http_pool_wait_seconds{upstream}. Whether it opened a connection or
+reused one is counted in fleetrelay_http_connections_total.
+
+Transports outlive the clients that use them: closing a client leaves its
+transport open, and close_transports() closes them all at shutdown.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import ipaddress
+import logging
+import socket
+import threading
+import time
+from collections.abc import Callable, Iterable
+
+import httpcore
+import httpx
+
+from src.config import settings
+from src.metrics import HTTP_CONNECTIONS_TOTAL, HTTP_POOL_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Trace events that mean the request now holds a connection: a new one is being
+# opened, or an existing one is about to carry its headers.
+_NEW_CONNECTION_EVENTS = ("connection.connect_tcp.started",)
+_REUSED_CONNECTION_EVENTS = (
+    "http11.send_request_headers.started",
+    "http2.send_request_headers.started",
+)
+
+
+def _max_connections(upstream: str) -> int:
+    return {
+        "telegram": settings.telegram_max_connections,
+        "openai": settings.openai_max_connections,
+        "supabase": settings.supabase_max_concurrency,
+    }[upstream]
+
+
+def _limits(upstream: str) -> httpx.Limits:
+    size = _max_connections(upstream)
+    return httpx.Limits(
+        max_connections=size,
+        max_keepalive_connections=size,
+        keepalive_expiry=settings.http_keepalive_seconds,
+    )
+
+
+def _http2_enabled() -> bool:
+    if not settings.http2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("HTTP2 is on but h2 is not installed; using HTTP/1.1")
+        return False
+    return True
+
+
+# --- DNS cache ---
+
+
+class _DNSCache:
+    """(host, port) -> resolved addresses, shared by every pool and thread."""
+
+    def __init__(self) -> None:
+        self._entries: dict[tuple[str, int], tuple[float, list[str]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, host: str, port: int) -> list[str] | None:
+        with self._lock:
+            entry = self._entries.get((host, port))
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+    def put(self, host: str, port: int, infos: Iterable[tuple]) -> list[str]:
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        with self._lock:
+            self._entries[(host, port)] = (
+                time.monotonic() + settings.http_dns_cache_seconds,
+                addresses,
+            )
+        return addresses
+
+    def evict(self, host: str, port: int) -> None:
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+
+_dns = _DNSCache()
+
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
+class _AsyncCachingBackend(httpcore.AsyncNetworkBackend):
+    """Resolves through the DNS cache, then connects to the addresses in order."""
+
+    def __init__(self, inner: httpcore.AsyncNetworkBackend) -> None:
+        self._inner = inner
+
+    async def connect_tcp(
+        self,
+        host: str,
+        port: int,
+        timeout: float | None = None,
+        local_address: str | None = None,
+        socket_options: Iterable | None = None,
+    ) -> httpcore.AsyncNetworkStream:
+        if _is_ip(host):
+            return await self._inner.connect_tcp(
+                host, port, timeout, local_address, socket_options
+            )
+        addresses = _dns.get(host, port)
+        if addresses is None:
+            try:
+                infos = await asyncio.get_running_loop().getaddrinfo(
+                    host, port, type=socket.SOCK_STREAM
+                )
+            except OSError as e:
+                raise httpcore.ConnectError(str(e)) from e
+            addresses = _dns.put(host, port, infos)
+        error: Exception | None = None
+        for address in addresses:
+            try:
+                return await self._inner.connect_tcp(
+                    address, port, timeout, local_address, socket_options
+                )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                error = e
+        _dns.evict(host, port)
+        raise error or httpcore.ConnectError(f"No addresses for {host}")
+
+    async def connect_unix_socket(
+        self, path: str, timeout: float | None = None, socket_options: Iterable | None = None
+    ) -> httpcore.AsyncNetworkStream:
+        return await self._inner.connect_unix_socket(path, timeout, socket_options)
+
+    async def sleep(self, seconds: float) -> None:
+        await self._inner.sleep(seconds)
+
+
+class _SyncCachingBackend(httpcore.NetworkBackend):
+    """Thread-side twin of _AsyncCachingBackend, for the supabase-py pool."""
+
+    def __init__(self, inner: httpcore.NetworkBackend) -> None:
+        self._inner = inner
+
+    def connect_tcp(
+        self,
+        host: str,
+        port: int,
+        timeout: float | None = None,
+        local_address: str | None = None,
+        socket_options: Iterable | None = None,
+    ) -> httpcore.NetworkStream:
+        if _is_ip(host):
+            return self._inner.connect_tcp(host, port, timeout, local_address, socket_options)
+        addresses = _dns.get(host, port)
+        if addresses is None:
+            try:
+                infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            except OSError as e:
+                raise httpcore.ConnectError(str(e)) from e
+            addresses = _dns.put(host, port, infos)
+        error: Exception | None = None
+        for address in addresses:
+            try:
+                return self._inner.connect_tcp(
+                    address, port, timeout, local_address, socket_options
+                )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                error = e
+        _dns.evict(host, port)
+        raise error or httpcore.ConnectError(f"No addresses for {host}")
+
+    def connect_unix_socket(
+        self, path: str, timeout: float | None = None, socket_options: Iterable | None = None
+    ) -> httpcore.NetworkStream:
+        return self._inner.connect_unix_socket(path, timeout, socket_options)
+
+    def sleep(self, seconds: float) -> None:
+        self._inner.sleep(seconds)
+
+
+# --- Pool-wait tracing ---
+
+# Supabase requests record from worker threads; metrics.py assumes a single writer.
+_metrics_lock = threading.Lock()
+
+
+def _record_wait(upstream: str, started: float, event: str) -> None:
+    connection = "new" if event in _NEW_CONNECTION_EVENTS else "reused"
+    HTTP_POOL_WAIT_SECONDS.observe(time.perf_counter() - started, upstream)
+    HTTP_CONNECTIONS_TOTAL.inc(upstream, connection)
+
+
+def _acquired(event: str) -> bool:
+    return event in _NEW_CONNECTION_EVENTS or event in _REUSED_CONNECTION_EVENTS
+
+
+def _async_trace(upstream: str, inner: Callable | None) -> Callable:
+    started = time.perf_counter()
+    pending = True
+
+    async def trace(event: str, info: dict) -> None:
+        nonlocal pending
+        if pending and _acquired(event):
+            pending = False
+            _record_wait(upstream, started, event)
+        if inner is not None:
+            await inner(event, info)
+
+    return trace
+
+
+def _sync_trace(upstream: str, inner: Callable | None) -> Callable:
+    started = time.perf_counter()
+    pending = True
+
+    def trace(event: str, info: dict) -> None:
+        nonlocal pending
+        if pending and _acquired(event):
+            pending = False
+            with _metrics_lock:
+                _record_wait(upstream, started, event)
+        if inner is not None:
+            inner(event, info)
+
+    return trace
+
+
+# --- Transports ---
+
+
+class AsyncTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, upstream: str) -> None:
+        super().__init__(http1=True, http2=_http2_enabled(), limits=_limits(upstream))
+        self.upstream = upstream
+        # httpx has no public hook for httpcore's network backend.
+        self._pool._network_backend = _AsyncCachingBackend(self._pool._network_backend)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.extensions["trace"] = _async_trace(
+            self.upstream, request.extensions.get("trace")
+        )
+        return await super().handle_async_request(request)
+
+    async def aclose(self) -> None:
+        """No-op: shared with other clients; see close_transports()."""
+
+    async def close_pool(self) -> None:
+        await super().aclose()
+
+
+class SyncTransport(httpx.HTTPTransport):
+    def __init__(self, upstream: str) -> None:
+        super().__init__(http1=True, http2=_http2_enabled(), limits=_limits(upstream))
+        self.upstream = upstream
+        self._pool._network_backend = _SyncCachingBackend(self._pool._network_backend)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.extensions["trace"] = _sync_trace(self.upstream, request.extensions.get("trace"))
+        return super().handle_request(request)
+
+    def close(self) -> None:
+        """No-op: shared with other clients; see close_transports()."""
+
+    def close_pool(self) -> None:
+        super().close()
+
+
+_async_transports: dict[str, AsyncTransport] = {}
+_sync_transports: dict[str, SyncTransport] = {}
+_lock = threading.Lock()
+
+
+def get_async_transport(upstream: str) -> AsyncTransport:
+    """The shared transport for ``upstream`` ("telegram" or "openai")."""
+    with _lock:
+        if upstream not in _async_transports:
+            _async_transports[upstream] = AsyncTransport(upstream)
+        return _async_transports[upstream]
+
+
+def get_sync_transport(upstream: str) -> SyncTransport:
+    """The shared transport for a synchronous client ("supabase")."""
+    with _lock:
+        if upstream not in _sync_transports:
+            _sync_transports[upstream] = SyncTransport(upstream)
+        return _sync_transports[upstream]
+
+
+def pool_stats() -> dict[str, dict[str, int]]:
+    """Open and idle connections per upstream, for /health."""
+    stats = {}
+    for upstream, transport in {**_async_transports, **_sync_transports}.items():
+        connections = transport._pool.connections
+        stats[upstream] = {
+            "connections": len(connections),
+            "idle": sum(1 for c in connections if c.is_idle()),
+        }
+    return stats
+
+
+async def close_transports() -> None:
+    with _lock:
+        async_transports = list(_async_transports.values())
+        sync_transports = list(_sync_transports.values())
+        _async_transports.clear()
+        _sync_transports.clear()
+    for transport in async_transports:
+        await transport.close_pool()
+    for transport in sync_transports:
+        transport.close_pool()
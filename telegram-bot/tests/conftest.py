@@ -0,0 +1,7 @@
+import os
+
+# src.config.Settings needs these at import time; no test talks to Telegram or OpenAI.
+os.environ.setdefault("BOT_TOKEN", "123456:TEST")
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("SUPABASE_URL", "")
+os.environ.setdefault("SNAPSHOT_PATH", "")
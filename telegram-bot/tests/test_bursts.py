@@ -0,0 +1,69 @@
+import pytest
+
+import src.bot as bot
+from src.models import ClassificationResult, Driver, Message, TicketCategory
+from src.sqlite_storage import SQLiteStorage
+
+
+@pytest.fixture
+def storage(monkeypatch, tmp_path) -> SQLiteStorage:
+    backend = SQLiteStorage(str(tmp_path / "fleetrelay.db"))
+    monkeypatch.setattr(bot, "storage", backend)
+    monkeypatch.setattr(bot, "_enrich_new_ticket", lambda *args, **kwargs: None)
+    return backend
+
+
+def _burst(driver: Driver, *texts: str) -> list[Message]:
+    return [
+        Message(
+            telegram_message_id=i,
+            telegram_chat_id=7,
+            telegram_user_id=driver.telegram_user_id,
+            driver_id=driver.id,
+            text=text,
+        )
+        for i, text in enumerate(texts, start=1)
+    ]
+
+
+def _classification(confidence: int) -> ClassificationResult:
+    return ClassificationResult(
+        is_ticket=True, confidence=confidence, category=TicketCategory.MECHANICAL, layer="ai"
+    )
+
+
+async def _results(storage: SQLiteStorage, messages: list[Message]) -> list[str]:
+    rows = [await storage.find_raw_message(7, m.telegram_message_id) for m in messages]
+    return [row["classification_result"] for row in rows]
+
+
+async def test_unsure_burst_is_buffered(storage: SQLiteStorage) -> None:
+    driver = await storage.upsert_driver(telegram_user_id=42)
+    first, *rest = _burst(driver, "hey", "truck", "idk")
+
+    await bot._route_classified(first, _classification(2), driver, "", extra_messages=rest)
+
+    buffered = await storage.get_buffered(42)
+    assert buffered is not None and buffered.extra_messages == rest
+    assert await _results(storage, [first, *rest]) == ["buffered"] * 3
+
+
+async def test_burst_riders_are_audited_as_appended(storage: SQLiteStorage) -> None:
+    driver = await storage.upsert_driver(telegram_user_id=42)
+    first, *rest = _burst(driver, "hey", "truck", "wont start", "at TA exit 45")
+
+    await bot._route_classified(first, _classification(4), driver, "", extra_messages=rest)
+
+    results = await _results(storage, [first, *rest])
+    assert results == ["appended", "appended", "created", "appended"]
+
+
+async def test_longest_text_is_created_when_layer1_matches_none(
+    storage: SQLiteStorage,
+) -> None:
+    driver = await storage.upsert_driver(telegram_user_id=42)
+    first, *rest = _burst(driver, "hey", "the reefer keeps beeping at me", "?")
+
+    await bot._route_classified(first, _classification(4), driver, "", extra_messages=rest)
+
+    assert await _results(storage, [first, *rest]) == ["appended", "created", "appended"]
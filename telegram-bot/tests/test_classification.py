@@ -0,0 +1,105 @@
+import asyncio
+import threading
+
+import src.bot as bot
+import src.classifier as classifier
+from src.budget import AIBudget
+from src.models import ClassificationResult, Message, TicketCategory
+
+UNDECIDED = "the truck is making a weird noise since this morning"
+
+
+def _message(text: str) -> Message:
+    return Message(
+        telegram_message_id=1, telegram_chat_id=7, telegram_user_id=42, driver_id="d", text=text
+    )
+
+
+def _fake_ai(calls: list[str]):
+    async def classify_ai(message: Message) -> ClassificationResult:
+        calls.append(message.text)
+        return ClassificationResult(
+            is_ticket=True, confidence=4, category=TicketCategory.MECHANICAL, layer="ai"
+        )
+
+    return classify_ai
+
+
+def _budget() -> AIBudget:
+    return AIBudget(driver_per_hour=1, driver_burst=1, chat_per_hour=0, chat_burst=0, overrides={})
+
+
+async def test_speculative_leg_never_calls_ai(monkeypatch) -> None:
+    calls: list[str] = []
+    monkeypatch.setattr(classifier, "classify_ai", _fake_ai(calls))
+    budget = _budget()
+    monkeypatch.setattr(bot, "ai_budget", budget)
+
+    legs = bot._Legs()
+    legs.start("classify", classifier.classify_offline_in_thread(_message(UNDECIDED)))
+    await asyncio.sleep(0.05)
+    legs.cancel()  # the window lookup matched an open ticket
+
+    assert calls == []
+    assert budget.allow(_message(UNDECIDED), 0.0) is None  # the one token is still there
+
+
+async def test_layer2_runs_after_lookups_miss(monkeypatch) -> None:
+    calls: list[str] = []
+    monkeypatch.setattr(classifier, "classify_ai", _fake_ai(calls))
+    monkeypatch.setattr(bot, "ai_budget", _budget())
+
+    legs = bot._Legs()
+    legs.start("classify", classifier.classify_offline_in_thread(_message(UNDECIDED)))
+    result = await bot._classification(_message(UNDECIDED), legs)
+
+    assert calls == [UNDECIDED]
+    assert result.layer == "ai"
+
+
+async def test_over_budget_is_not_a_ticket(monkeypatch) -> None:
+    calls: list[str] = []
+    monkeypatch.setattr(classifier, "classify_ai", _fake_ai(calls))
+    budget = _budget()
+
+    first = await classifier.classify_message(_message(UNDECIDED), budget)
+    second = await classifier.classify_message(_message(UNDECIDED), budget)
+
+    assert first.layer == "ai" and first.is_ticket
+    assert second.layer == "budget" and not second.is_ticket
+    assert calls == [UNDECIDED]
+
+
+async def test_over_budget_edit_keeps_original_outcome(monkeypatch) -> None:
+    monkeypatch.setattr(classifier, "classify_ai", _fake_ai([]))
+    budget = _budget()
+    await classifier.classify_message(_message(UNDECIDED), budget)
+
+    edited = _message("the reefer unit keeps beeping and shows an error code")
+    assert await classifier.reclassify_edit(edited, UNDECIDED, "ai", budget) is None
+
+
+async def test_busy_chat_takes_the_cheap_path(monkeypatch) -> None:
+    calls: list[str] = []
+    monkeypatch.setattr(classifier, "classify_ai", _fake_ai(calls))
+    budget = AIBudget(
+        driver_per_hour=0, driver_burst=0, chat_per_hour=1, chat_burst=1, overrides={}
+    )
+
+    await classifier.classify_message(_message(UNDECIDED), budget)
+    result = await classifier.classify_message(_message(UNDECIDED), budget)
+
+    assert result.layer == "budget" and result.is_ticket
+    assert result.confidence <= 2  # buffered, not created outright
+    assert result.category == TicketCategory.OTHER
+    assert calls == [UNDECIDED]
+
+
+async def test_offline_metrics_are_recorded_on_the_loop(monkeypatch) -> None:
+    threads: list[int] = []
+    monkeypatch.setattr(classifier, "_observe", lambda *args: threads.append(threading.get_ident()))
+
+    result = await classifier.classify_offline_in_thread(_message("truck broke down"))
+
+    assert result is not None
+    assert threads == [threading.get_ident()]
@@ -0,0 +1,26 @@
+from src.image_cache import ImageCache
+from src.metrics import IMAGE_CACHE_LOOKUPS_TOTAL
+from src.models import ImageCategory
+
+
+async def test_hits_and_misses_reach_metrics(tmp_path) -> None:
+    cache = ImageCache(str(tmp_path / "cache.sqlite3"), max_entries=2, max_distance=4)
+    before = {r: IMAGE_CACHE_LOOKUPS_TOTAL.value(r) for r in ("exact_hit", "near_hit", "miss")}
+
+    assert await cache.get_exact("a") is None
+    cache.record_miss()
+    await cache.put("a", 0b1010, ImageCategory.MECHANICAL, "flat tire", 100)
+    assert await cache.get_exact("a") == (ImageCategory.MECHANICAL, "flat tire")
+    assert await cache.get_near(0b1011, 90) == (ImageCategory.MECHANICAL, "flat tire")
+
+    after = {r: IMAGE_CACHE_LOOKUPS_TOTAL.value(r) for r in before}
+    assert {r: after[r] - before[r] for r in before} == {"exact_hit": 1, "near_hit": 1, "miss": 1}
+
+
+async def test_eviction_keeps_the_bound(tmp_path) -> None:
+    cache = ImageCache(str(tmp_path / "cache.sqlite3"), max_entries=2, max_distance=0)
+    for file_id in ("a", "b", "c"):
+        await cache.put(file_id, None, ImageCategory.DOCUMENT, "bol", 10)
+
+    assert len(cache) == 2
+    assert await cache.get_exact("a") is None
@@ -0,0 +1,60 @@
+import src.bot as bot
+from src.incidents import Incident
+from src.models import EnrichmentResult, TicketCategory
+
+
+class _Recorder:
+    def __init__(self) -> None:
+        self.updates: dict[str, dict] = {}
+
+    async def update_ticket(self, ticket_id: str, **fields: object) -> None:
+        self.updates[ticket_id] = fields
+
+
+async def test_clustered_ticket_keeps_its_own_summary(monkeypatch) -> None:
+    recorder = _Recorder()
+    monkeypatch.setattr(bot, "storage", recorder)
+    incident = Incident(now=0.0)
+    incident.enrichment = EnrichmentResult(
+        urgency=4,
+        category=TicketCategory.ELD,
+        summary="First driver's ELD shows no connection at the Flying J in Gary",
+    )
+
+    await bot._apply_incident_enrichment("t2", ["eld   not working", "since 5am"], incident)
+
+    assert recorder.updates["t2"] == {
+        "urgency": 4,
+        "category": TicketCategory.ELD,
+        "summary": "eld not working since 5am",
+    }
+
+
+async def test_clustered_ticket_gets_its_own_location(monkeypatch) -> None:
+    recorder = _Recorder()
+    monkeypatch.setattr(bot, "storage", recorder)
+    calls: list[list[str]] = []
+
+    async def enrich_location(texts: list[str]) -> str:
+        calls.append(texts)
+        return "I-65 mile marker 250"
+
+    monkeypatch.setattr(bot, "enrich_location", enrich_location)
+    spawned = []
+    monkeypatch.setattr(bot, "_spawn", lambda kind, coro: spawned.append(coro))
+    incident = Incident(now=0.0)
+    incident.enrichment = EnrichmentResult(
+        urgency=4, category=TicketCategory.ELD, location="Gary, IN", summary="ELD down"
+    )
+
+    await bot._apply_incident_enrichment("t2", ["eld down at mm 250"], incident, True)
+    for coro in spawned:
+        await coro
+
+    assert calls == [["eld down at mm 250"]]
+    assert recorder.updates["t2"]["location"] == "I-65 mile marker 250"
+
+
+def test_own_summary_is_cut_at_a_word() -> None:
+    summary = bot._own_summary(["word " * 100])
+    assert len(summary) <= 201 and summary.endswith("word…")
@@ -0,0 +1,101 @@
+import pytest
+
+from src.classifier import classify_deterministic, detect_urgent
+from src.models import Message, TicketCategory
+
+
+def _message(text: str) -> Message:
+    return Message(telegram_message_id=1, telegram_chat_id=1, driver_id="d", text=text)
+
+
+def _classify(text: str):
+    return classify_deterministic(_message(text))
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "the sun is shining today",  # шина -> "shin"
+        "nice shiny truck",
+        "my shin hurts lol",
+        "sending my resume to the motorway guys",  # мотор -> "motor"
+        "я на заводе не могу говорить",  # "at the factory", not "won't start"
+    ],
+)
+def test_no_multilingual_false_positives(text: str) -> None:
+    result = _classify(text)
+    assert result is None or not result.is_ticket
+
+
+@pytest.mark.parametrize(
+    ("text", "category"),
+    [
+        ("двигатель не заводится", TicketCategory.MECHANICAL),
+        ("машина не заводится", TicketCategory.MECHANICAL),
+        ("шина лопнула", TicketCategory.TIRE),
+        ("пробил колесо на трассе", TicketCategory.TIRE),
+        ("попал в аварию", TicketCategory.ACCIDENT),
+        ("мотор ишламаяпти", TicketCategory.MECHANICAL),
+        ("motor ishlamayapti", TicketCategory.MECHANICAL),
+        ("ёқилғи тугади", TicketCategory.FUEL),
+    ],
+)
+def test_russian_and_uzbek_keywords(text: str, category: TicketCategory) -> None:
+    result = _classify(text)
+    assert result is not None and result.is_ticket
+    assert result.category == category
+
+
+def _urgent(text: str):
+    return detect_urgent(_message(text))
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "we are stuck in traffic lol",
+        "stranded at the airport, flight delayed",
+        "this playlist is fire",
+        "emergency meeting at 5",
+    ],
+)
+def test_urgent_only_words_alone_are_not_urgent(text: str) -> None:
+    assert _urgent(text) is None
+
+
+def test_urgent_only_words_raise_a_ticket_keyword() -> None:
+    result = _urgent("flat tire, stuck on the shoulder")
+    assert result is not None and result.urgency >= 4
+
+
+@pytest.mark.parametrize(
+    "text", ["the truck is on fire", "stranded on I-80", "emergency, trailer came loose"]
+)
+def test_urgent_only_words_with_a_vehicle_fast_path(text: str) -> None:
+    result = _urgent(text)
+    assert result is not None and result.urgency >= 4
+
+
+def test_stuck_with_a_vehicle_is_still_chatter() -> None:
+    assert _urgent("truck stuck in traffic lol") is None
+
+
+@pytest.mark.parametrize(
+    ("text", "category"),
+    [
+        ("avariya", TicketCategory.ACCIDENT),
+        ("tormoz", TicketCategory.MECHANICAL),
+        ("akkumulyator", TicketCategory.ELECTRICAL),
+        ("solyarka tugadi", TicketCategory.FUEL),
+        ("pritsep", TicketCategory.MECHANICAL),
+        ("balon", TicketCategory.TIRE),
+    ],
+)
+def test_latin_uzbek_keywords(text: str, category: TicketCategory) -> None:
+    result = _classify(text)
+    assert result is not None and result.is_ticket and result.category == category
+
+
+def test_latin_uzbek_accident_fast_paths() -> None:
+    result = _urgent("avariya bo'ldi I-80 da")
+    assert result is not None and result.urgency == 5
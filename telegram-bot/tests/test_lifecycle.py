@@ -0,0 +1,16 @@
+import asyncio
+
+import src.main as main
+
+
+async def test_shutdown_cancels_background_loops() -> None:
+    async def loop() -> None:
+        while True:
+            await asyncio.sleep(1)
+
+    task = main._spawn(loop())
+    await asyncio.sleep(0)
+    await main._cancel_background()
+
+    assert task.cancelled()
+    assert main._background == []
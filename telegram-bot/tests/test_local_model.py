@@ -0,0 +1,50 @@
+import pytest
+
+from src.local_model import LocalModel, load_training_samples, np, split_by_time, train
+from src.models import Message
+from src.sqlite_storage import SQLiteStorage
+
+pytestmark = pytest.mark.skipif(np is None, reason="NumPy (the ml extra) is not installed")
+
+
+def _sample(created_at: str) -> tuple[str, str, int, str]:
+    return ("truck wont start", "mechanical", 3, created_at)
+
+
+def test_holdout_is_strictly_newer_than_training() -> None:
+    samples = [_sample(f"2026-01-{day:02d}T00:00:00+00:00") for day in (5, 1, 3, 3, 2, 4)]
+
+    train_set, holdout = split_by_time(samples, 50)
+
+    assert max(s[3] for s in train_set) < min(s[3] for s in holdout)
+    assert len(train_set) + len(holdout) == len(samples)
+
+
+def test_training_cutoff_survives_save(tmp_path) -> None:
+    model = train([("truck wont start", "mechanical", 3), ("thanks", "not_ticket", 1)], dim=64)
+    model.trained_until = "2026-01-04T00:00:00+00:00"
+    path = str(tmp_path / "model.npz")
+    model.save(path)
+
+    assert LocalModel.load(path).trained_until == "2026-01-04T00:00:00+00:00"
+
+
+async def test_only_classifier_dismissals_are_negatives(monkeypatch, tmp_path) -> None:
+    import src.storage
+
+    backend = SQLiteStorage(str(tmp_path / "fleetrelay.db"))
+    monkeypatch.setattr(src.storage, "storage", backend)
+    driver = await backend.upsert_driver(telegram_user_id=42)
+    for i, source in enumerate(("ai", "deterministic", "budget", "shed", "local_model")):
+        message = Message(
+            telegram_message_id=i,
+            telegram_chat_id=7,
+            telegram_user_id=42,
+            driver_id=driver.id,
+            text=f"message from {source}",
+        )
+        await backend.log_raw_message(message, "dismissed", source)
+
+    samples = await load_training_samples()
+
+    assert sorted(s[0] for s in samples) == ["message from ai", "message from deterministic"]
@@ -0,0 +1,65 @@
+import pytest
+
+from src.location import (
+    KIND_CITY,
+    KIND_MILE_MARKER,
+    GeoIndex,
+    build_geo_index,
+    extract_text_location,
+)
+
+
+@pytest.mark.parametrize(
+    ("text", "location"),
+    [
+        ("I-40 mile marker 212", "I-40 MM 212"),
+        ("exit 87 on I-81", "I-81 Exit 87"),
+        ("broke down on I40 eastbound near mm 118", "I-40 EB MM 118"),
+        ("stuck at 212 mm on Interstate 10", "I-10 MM 212"),
+    ],
+)
+def test_text_locations_are_normalized(text: str, location: str) -> None:
+    assert extract_text_location(text) == location
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "I 5 min away",  # bare "I 5" is a pronoun, not I-5
+        "mile 212",  # a mile number alone names no road
+        "drove 300 miles today",
+    ],
+)
+def test_ambiguous_text_has_no_location(text: str) -> None:
+    assert extract_text_location(text) == ""
+
+
+def _index(tmp_path, cell_deg: float) -> GeoIndex:
+    points = [
+        (KIND_CITY, "Amarillo, TX", 35.222, -101.831),
+        (KIND_CITY, "Albuquerque, NM", 35.084, -106.650),
+        (KIND_MILE_MARKER, "I-40 MM 71", 35.193, -101.750),
+    ]
+    path = str(tmp_path / "geo_index.bin")
+    assert build_geo_index(points, path, cell_deg=cell_deg) == 3
+    return GeoIndex(path)
+
+
+def test_geo_index_round_trip(tmp_path) -> None:
+    index = _index(tmp_path, cell_deg=1.0)
+
+    marker = index.nearest(35.19, -101.76, KIND_MILE_MARKER, max_km=3)
+    city = index.nearest(35.19, -101.76, KIND_CITY, max_km=50)
+
+    assert marker is not None and marker[0] == "I-40 MM 71"
+    assert city is not None and city[0] == "Amarillo, TX" and city[1] < 10
+    assert index.nearest(35.19, -101.76, KIND_CITY, max_km=1) is None
+
+
+def test_small_cells_still_find_cities_within_max_km(tmp_path) -> None:
+    # 0.1-degree cells are ~11 km; Amarillo is ~40 km away, several cells over
+    index = _index(tmp_path, cell_deg=0.1)
+
+    city = index.nearest(35.5, -101.6, KIND_CITY, max_km=50)
+
+    assert city is not None and city[0] == "Amarillo, TX"
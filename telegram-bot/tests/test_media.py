@@ -0,0 +1,85 @@
+import time
+
+import httpx
+import pytest
+
+from src.config import settings
+from src.main import app
+from src.media import media_proxy_url
+from src.signed_urls import signature_valid
+
+
+@pytest.fixture(autouse=True)
+def signing_key(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "media_signing_key", "k")
+    monkeypatch.setattr(settings, "webhook_url", "https://bot.example")
+
+
+def _query(url: str) -> tuple[int, str]:
+    params = httpx.URL(url).params
+    return int(params["exp"]), params["sig"]
+
+
+def test_signed_link_round_trips() -> None:
+    exp, sig = _query(media_proxy_url("AgAD"))
+    assert signature_valid("/media/AgAD", exp, sig, time.time())
+    assert not signature_valid("/media/AgAE", exp, sig, time.time())  # another file
+    assert not signature_valid("/media/AgAD", exp, sig, exp + 1)  # expired
+
+
+async def test_media_needs_a_signature_or_token() -> None:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        assert (await client.get("/media/AgAD")).status_code == 401
+        assert (await client.get("/media/AgAD?exp=9999999999&sig=00")).status_code == 401
+
+
+async def test_sqlite_upload_is_served_from_files(monkeypatch, tmp_path) -> None:
+    from src.sqlite_storage import SQLiteStorage
+
+    monkeypatch.setattr(settings, "storage_backend", "sqlite")
+    monkeypatch.setattr(settings, "sqlite_media_dir", str(tmp_path / "media"))
+    backend = SQLiteStorage(str(tmp_path / "fleetrelay.db"))
+    url = await backend.upload_media("thumbnails/v1.jpg", b"jpeg", "image/jpeg")
+
+    assert url.startswith("https://bot.example/files/thumbnails/v1.jpg?")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        served = await client.get(url.removeprefix("https://bot.example"))
+        assert served.status_code == 200 and served.content == b"jpeg"
+        assert (await client.get("/files/thumbnails/v1.jpg")).status_code == 401
+
+
+async def test_media_results_keep_a_later_edit(monkeypatch, tmp_path) -> None:
+    import src.media as media
+    from src.models import Message, Ticket
+    from src.sqlite_storage import SQLiteStorage
+
+    backend = SQLiteStorage(str(tmp_path / "fleetrelay.db"))
+    monkeypatch.setattr(media, "storage", backend)
+    monkeypatch.setattr(media, "_bot", object())
+
+    async def process_message_media(bot, message):
+        return {"media_url": "/media/AgAD"}, None
+
+    monkeypatch.setattr(media, "_process_message_media", process_message_media)
+    driver = await backend.upsert_driver(telegram_user_id=42)
+    ticket_id = await backend.create_ticket(Ticket(driver_id=driver.id))
+    message = Message(
+        telegram_message_id=1,
+        telegram_chat_id=7,
+        telegram_user_id=42,
+        driver_id=driver.id,
+        text="tire blew",
+        raw_data={"photo": []},
+    )
+    rows = await backend.append_messages_to_ticket(ticket_id, [message])
+
+    # The driver edits the caption while the photo is still being classified
+    edited = message.model_copy(update={"text": "tire blew out on I-40"})
+    await backend.update_ticket_message_text(ticket_id, edited)
+    await media.process_ticket_media(ticket_id, [message], rows)
+
+    stored = await backend.get_ticket_message(rows[0]["id"])
+    assert stored["content_text"] == "tire blew out on I-40"
+    assert stored["media_url"] == "/media/AgAD"
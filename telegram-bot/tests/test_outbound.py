@@ -0,0 +1,124 @@
+import asyncio
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from telegram.error import BadRequest, NetworkError, RetryAfter
+
+import src.outbound as outbound
+from src.config import settings
+from src.outbound import OutboundDispatcher, OutboundJob
+
+# Slack for float error on the loop clock
+EPS = 1e-3
+
+
+class _FakeBot:
+    """send_message stand-in: records (chat_id, text, loop time) and raises queued errors."""
+
+    def __init__(self, errors: dict[int, list[Exception]] | None = None) -> None:
+        self.errors = errors or {}
+        self.attempts: list[tuple[int, str, float]] = []
+        self.sent: list[tuple[int, str, float]] = []
+
+    async def send_message(self, chat_id: int, text: str, **kwargs: object) -> object:
+        now = asyncio.get_running_loop().time()
+        self.attempts.append((chat_id, text, now))
+        if self.errors.get(chat_id):
+            raise self.errors[chat_id].pop(0)
+        self.sent.append((chat_id, text, now))
+        return SimpleNamespace(message_id=100 + len(self.sent))
+
+
+class _Recorder:
+    def __init__(self) -> None:
+        self.rows: list[dict] = []
+
+    async def update_ticket_messages_delivery(self, rows: list[dict]) -> None:
+        self.rows.extend(rows)
+
+
+@pytest.fixture
+def recorder(monkeypatch) -> _Recorder:
+    monkeypatch.setattr(settings, "outbound_private_per_second", 20.0)
+    monkeypatch.setattr(settings, "outbound_global_per_second", 1000.0)
+    monkeypatch.setattr(settings, "outbound_max_attempts", 3)
+    monkeypatch.setattr(outbound, "_RETRY_BASE_SECONDS", 0.02)
+    backend = _Recorder()
+    monkeypatch.setattr(outbound, "storage", backend)
+    return backend
+
+
+def _job(chat_id: int, text: str) -> OutboundJob:
+    return OutboundJob(
+        row={"id": text, "content_text": text, "ticket_id": "t"}, chat_id=chat_id, text=text
+    )
+
+
+async def _dispatch(bot: _FakeBot, jobs: list[OutboundJob], done) -> OutboundDispatcher:
+    dispatcher = OutboundDispatcher(bot)
+    task = asyncio.create_task(dispatcher.run())
+    await asyncio.sleep(0)
+    try:
+        for job in jobs:
+            dispatcher.enqueue(job)
+        async with asyncio.timeout(3):
+            while not done():
+                await asyncio.sleep(0.005)
+        await asyncio.sleep(0.01)  # let the last send record its result
+    finally:
+        task.cancel()
+    return dispatcher
+
+
+async def test_chat_keeps_order_at_its_bucket_rate(recorder: _Recorder) -> None:
+    bot = _FakeBot()
+    await _dispatch(bot, [_job(1, "a"), _job(1, "b"), _job(1, "c")], lambda: len(bot.sent) == 3)
+
+    assert [text for _, text, _ in bot.sent] == ["a", "b", "c"]
+    times = [t for _, _, t in bot.sent]
+    assert all(later - earlier >= 1 / 20 - EPS for earlier, later in zip(times, times[1:]))
+
+
+async def test_global_bucket_spaces_sends_across_chats(monkeypatch, recorder: _Recorder) -> None:
+    monkeypatch.setattr(settings, "outbound_global_per_second", 20.0)  # burst of 4
+    bot = _FakeBot()
+    await _dispatch(bot, [_job(chat, str(chat)) for chat in range(8)], lambda: len(bot.sent) == 8)
+
+    times = sorted(t for _, _, t in bot.sent)
+    assert times[-1] - times[0] >= 4 / 20 - EPS
+
+
+async def test_429_pauses_only_that_chat(recorder: _Recorder) -> None:
+    bot = _FakeBot({1: [RetryAfter(timedelta(milliseconds=200))]})
+    jobs = [_job(1, "a1"), _job(1, "a2"), _job(2, "b1")]
+    await _dispatch(bot, jobs, lambda: len(bot.sent) == 3)
+
+    assert [text for _, text, _ in bot.sent] == ["b1", "a1", "a2"]
+    first_try = bot.attempts[0][2]
+    assert bot.sent[1][2] - first_try >= 0.2 - EPS
+    assert jobs[0].attempts == 0  # a 429 is not a failed attempt
+
+
+async def test_network_errors_back_off_then_fail(recorder: _Recorder) -> None:
+    bot = _FakeBot({1: [NetworkError("reset")] * 3})
+    dispatcher = await _dispatch(bot, [_job(1, "a")], lambda: len(bot.attempts) == 3)
+    await dispatcher.flush()
+
+    times = [t for _, _, t in bot.attempts]
+    assert times[1] - times[0] >= 0.02 - EPS
+    assert times[2] - times[1] >= 0.04 - EPS
+    assert recorder.rows == [{"id": "a", "delivery_status": "failed"}]
+
+
+async def test_status_writes_touch_only_delivery_columns(recorder: _Recorder) -> None:
+    bot = _FakeBot({2: [BadRequest("chat not found")]})
+    dispatcher = await _dispatch(
+        bot, [_job(1, "a"), _job(2, "b")], lambda: len(bot.attempts) == 2
+    )
+    await dispatcher.flush()
+
+    assert sorted(recorder.rows, key=lambda row: row["id"]) == [
+        {"id": "a", "delivery_status": "sent", "telegram_message_id": 101},
+        {"id": "b", "delivery_status": "failed"},
+    ]